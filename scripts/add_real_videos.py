@@ -25,6 +25,7 @@ def add_videos_interactive():
     print()
     
     added_count = 0
+    rows = []
     
     while True:
         url = input("🔗 Enter TikTok URL (or press Enter to finish): ").strip()
@@ -57,13 +58,18 @@ def add_videos_interactive():
         
         if manager.add_video(url, description, manual_data if manual_data else None):
             added_count += 1
+            rows.append(dict(manual_data, url=url, description=description))
             print(f"✅ Added video #{added_count}")
         
         print()
     
     if added_count > 0:
-        manager.save_videos()
-        manager.generate_html()
+        # Re-apply the additions on top of anything other processes saved
+        # while we were prompting, then publish under the catalog lock
+        with manager.locked():
+            manager.add_many(rows)
+            manager.save_videos()
+            manager.generate_html()
         print(f"🎉 Successfully added {added_count} videos!")
         print(f"📄 JSON file: {manager.output_file}")
         print(f"🌐 HTML file: {manager.html_file}")
@@ -78,9 +84,13 @@ def add_sample_videos():
     
     print("🎬 Adding sample videos for demonstration...")
     
-    if manager.add_sample_videos():
-        manager.save_videos()
-        manager.generate_html()
+    with manager.locked():
+        added = manager.add_sample_videos()
+        if added:
+            manager.save_videos()
+            manager.generate_html()
+
+    if added:
         print("✅ Sample videos added successfully!")
         print(f"📄 JSON file: {manager.output_file}")
         print(f"🌐 HTML file: {manager.html_file}")
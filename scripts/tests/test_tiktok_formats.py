@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+🧪 Round-trip tests for the TikTok Video Manager's encoded formats
+VLQ search postings, the snapshot cache, journal replay, engagement history
+segments and engagement counts
+
+Run with: python -m pytest scripts/tests  (or python -m unittest discover scripts/tests)
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_catalog import load_snapshot_cache, save_snapshot_cache, stream_snapshot_cache  # noqa: E402
+from tiktok_history import EngagementHistory  # noqa: E402
+from tiktok_manager import TikTokManager  # noqa: E402
+from tiktok_search import build_search_index, decode_postings, encode_postings, video_terms  # noqa: E402
+from tiktok_video import Video, format_count, parse_count  # noqa: E402
+
+
+def sample_videos(count: int = 3000):
+    """Videos covering every field shape: no date, unknown keys, hashtags, huge counts"""
+    rng = random.Random(count)
+    words = ['ghana', 'school', 'debate', 'science', 'quiz', 'music', 'art']
+    videos = []
+    for i in range(count):
+        text = ' '.join(rng.sample(words, 3))
+        videos.append(Video(
+            id=str(7_000_000_000_000_000_000 + i), url=f"https://www.tiktok.com/@user{i % 7}/video/{i}",
+            username=f"user{i % 7}", description=f"{text} #{words[i % len(words)]}",
+            date=date(2024, 1 + i % 12, 1 + i % 28) if i % 5 else None,
+            likes=rng.randrange(10 ** rng.randrange(1, 12)), comments=rng.randrange(1000),
+            shares=rng.randrange(100), verified=bool(i % 2), added_date=f"2024-06-01T12:00:{i % 60:02d}",
+            hashtags=(words[i % len(words)],), extra={"source": "import", "rank": i} if i % 3 == 0 else None))
+    return videos
+
+
+class WorkingDirectoryTest(unittest.TestCase):
+    """Runs each test in a fresh directory: the manager's paths are relative"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+
+class PostingsTest(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(13)
+        for _ in range(200):
+            positions = sorted(rng.sample(range(rng.choice((10, 1000, 10 ** 7))), rng.randrange(0, 10)))
+            self.assertEqual(decode_postings(encode_postings(positions)), positions)
+
+    def test_edge_positions(self):
+        for positions in ([], [0], [31], [32], [1023, 1024], [0, 1, 2, 3], [2 ** 40]):
+            self.assertEqual(decode_postings(encode_postings(positions)), positions)
+
+    def test_consecutive_positions_cost_one_digit(self):
+        self.assertEqual(len(encode_postings(list(range(500)))), 500)
+
+    def test_search_index_postings(self):
+        videos = sample_videos(500)
+        index = json.loads(build_search_index(videos))
+        self.assertEqual(index['count'], len(videos))
+        terms = index['terms'].split('\n')
+        postings = index['postings'].split(' ')
+        self.assertEqual(len(terms), len(postings))
+        for term, encoded in zip(terms, postings):
+            expected = [i for i, video in enumerate(videos) if term in set(video_terms(video))]
+            self.assertEqual(decode_postings(encoded), expected, term)
+
+
+class SnapshotCacheTest(WorkingDirectoryTest):
+    def test_round_trip(self):
+        videos = sample_videos()
+        save_snapshot_cache("cache.bin", (1, 2), "digest", videos)
+        self.assertEqual(load_snapshot_cache("cache.bin", (1, 2), lambda: "unused"), videos)
+        self.assertEqual(list(stream_snapshot_cache("cache.bin", (1, 2))), videos)
+
+    def test_empty(self):
+        save_snapshot_cache("cache.bin", (1, 2), "digest", [])
+        self.assertEqual(load_snapshot_cache("cache.bin", (1, 2), lambda: "digest"), [])
+
+    def test_stale_source(self):
+        save_snapshot_cache("cache.bin", (1, 2), "digest", sample_videos(10))
+        # A different size is always stale; a new mtime only if the content changed
+        self.assertIsNone(load_snapshot_cache("cache.bin", (1, 3), lambda: "digest"))
+        self.assertIsNone(load_snapshot_cache("cache.bin", (5, 2), lambda: "other"))
+        self.assertIsNone(stream_snapshot_cache("cache.bin", (5, 2)))
+        self.assertEqual(len(load_snapshot_cache("cache.bin", (5, 2), lambda: "digest")), 10)
+        # The touched source was recorded, so streaming matches it now
+        self.assertEqual(len(list(stream_snapshot_cache("cache.bin", (5, 2)))), 10)
+
+    def test_truncated(self):
+        save_snapshot_cache("cache.bin", (1, 2), "digest", sample_videos())
+        with open("cache.bin", 'r+b') as f:
+            f.truncate(os.path.getsize("cache.bin") - 100)
+        self.assertIsNone(load_snapshot_cache("cache.bin", (1, 2), lambda: "digest"))
+        with self.assertRaises(ValueError):
+            list(stream_snapshot_cache("cache.bin", (1, 2)))
+
+
+class JournalReplayTest(WorkingDirectoryTest):
+    def manager(self) -> TikTokManager:
+        return TikTokManager(storage='journal')
+
+    def test_replay_matches_catalog(self):
+        # A hand-edited entry whose unknown keys must survive replay and compaction
+        os.makedirs("public")
+        with open("public/tiktok-videos.json", 'w', encoding='utf-8') as f:
+            json.dump({"videos": [{"id": "7000000000000000001",
+                                   "url": "https://www.tiktok.com/@a/video/7000000000000000001",
+                                   "username": "a", "description": "", "date": "soon", "likes": "89",
+                                   "comments": "0", "shares": "0", "verified": False,
+                                   "added_date": "2024-01-01T00:00:00", "source": "manual"}]}, f)
+        with redirect_stdout(io.StringIO()):
+            manager = self.manager()
+            rows = [{"url": f"https://www.tiktok.com/@user{i}/video/{7_100_000_000_000_000_000 + i}",
+                     "description": f"video {i} #ghana", "date": "2024-05-01", "likes": "2.1K",
+                     "verified": "yes"} for i in range(20)]
+            manager.add_many(rows)
+            manager.remove_video(str(7_100_000_000_000_000_003))
+            manager.update_engagement([{"id": str(7_100_000_000_000_000_005), "likes": "1.5M"}])
+            manager.save_videos()
+            expected = manager.videos
+
+            self.assertTrue(os.path.exists(manager.journal_file))
+            replayed = self.manager().videos
+            self.assertEqual(replayed, expected)
+            self.assertEqual(replayed[0].extra, {"source": "manual", "date": "soon"})
+            self.assertEqual(len(replayed), 20)
+
+            self.manager().compact()
+            self.assertFalse(os.path.exists(manager.journal_file))
+            self.assertEqual(self.manager().videos, expected)
+            with open("public/tiktok-videos.json", encoding='utf-8') as f:
+                first = json.load(f)["videos"][0]
+            self.assertEqual((first["source"], first["date"]), ("manual", "soon"))
+
+    def test_incomplete_last_entry_is_skipped(self):
+        with redirect_stdout(io.StringIO()):
+            manager = self.manager()
+            manager.add_video("https://www.tiktok.com/@user/video/7200000000000000001")
+            manager.save_videos()
+            with open(manager.journal_file, 'a', encoding='utf-8') as f:
+                f.write('{"op": "remove", "id": "72000')
+            self.assertEqual([video.id for video in self.manager().videos], ["7200000000000000001"])
+
+
+class EngagementHistoryTest(WorkingDirectoryTest):
+    def test_segments_round_trip(self):
+        videos = sample_videos(400)
+        days = [date(2024, 7, day) for day in (1, 2, 5)]
+        rng = random.Random(5)
+        readings = []
+        history = EngagementHistory("history")
+        for day in days:
+            history.record(videos, day)
+            readings.append({v.id: (v.likes, v.comments, v.shares) for v in videos})
+            # Some counts grow, a few shrink (deleted comments), one jumps past 32 bits
+            videos = [v.replace(likes=v.likes + rng.choice((0, 0, 1, 300, 2 ** 33)),
+                                comments=max(0, v.comments + rng.choice((0, -1, 2))))
+                      for v in videos]
+        history.close()
+
+        reopened = EngagementHistory("history")
+        self.assertEqual(reopened.days, days)
+        for day, counts in zip(days, readings):
+            totals = reopened.totals(day)
+            for slot, video_id in enumerate(reopened.ids):
+                self.assertEqual(tuple(int(column[slot]) for column in totals), counts[video_id])
+        gains = reopened.gains(since=days[0])
+        for slot, video_id in enumerate(reopened.ids):
+            self.assertEqual(tuple(int(column[slot]) for column in gains),
+                             tuple(b - a for a, b in zip(readings[0][video_id], readings[-1][video_id])))
+        reopened.close()
+
+    def test_unchanged_snapshot_stores_nothing(self):
+        videos = sample_videos(50)
+        history = EngagementHistory("history")
+        self.assertEqual(history.record(videos, date(2024, 7, 1)), 50)
+        self.assertEqual(history.record(videos, date(2024, 7, 2)), 0)
+        history.close()
+
+
+class CountTest(unittest.TestCase):
+    def test_round_trip(self):
+        numbers = list(range(0, 20_000)) + [999_999, 1_000_000, 1_050_000, 1_234_567, 2_100_000_000,
+                                            10 ** 12, 10 ** 15 + 1]
+        for number in numbers:
+            self.assertEqual(parse_count(format_count(number)), number)
+
+    def test_abbreviations(self):
+        self.assertEqual(format_count(2100), "2.1K")
+        self.assertEqual(format_count(2150), "2150")
+        self.assertEqual(format_count(1_500_000), "1.5M")
+        self.assertEqual(format_count(3_000_000_000), "3B")
+        self.assertEqual(parse_count("2.1k"), 2100)
+        self.assertEqual(parse_count("1,234"), 1234)
+        self.assertEqual(parse_count(" 3M "), 3_000_000)
+        self.assertEqual(parse_count(""), 0)
+
+    def test_invalid(self):
+        for value in ("abc", "1.2.3K", "inf", "nan", float('nan')):
+            with self.assertRaises(ValueError):
+                parse_count(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
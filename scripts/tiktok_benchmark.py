@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+⏱️ TikTok Manager Benchmarks for St. Louis Demo JHS
+Times the manager's hot paths and feed rendering on synthetic catalogs,
+reports peak memory, and saves JSON results to compare between commits
+"""
+
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Add scripts directory to path so we can import the TikTok modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from tiktok_feed import WRITE_BUFFER_SIZE, write_feed
+from tiktok_manager import TikTokManager
+from tiktok_video import Video
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# Bump when phases are added, renamed or measured differently
+RESULTS_VERSION = 2
+
+# Vocabulary of the synthetic descriptions
+WORDS = ("st", "louis", "demo", "jhs", "students", "school", "ghana", "accra", "class",
+         "science", "math", "football", "dance", "music", "choir", "debate", "project",
+         "teacher", "week", "today", "our", "the", "and", "with", "best", "new", "fun")
+HASHTAGS = ("education", "ghana", "stlouisdemo", "jhs", "students", "science", "sports",
+            "music", "culture", "throwback")
+
+
+def synthetic_records(count: int, seed: int = 42, usernames: int = 500,
+                      description_words: int = 8) -> List[Dict]:
+    """Build a deterministic catalog of fake videos in the JSON schema.
+
+    ``usernames`` is the number of distinct creators and
+    ``description_words`` the number of words per description, which also
+    carries two or three hashtags.
+    """
+    rng = random.Random(seed)
+    videos = []
+    for i in range(count):
+        username = f"user{rng.randrange(usernames)}"
+        video_id = str(7_000_000_000_000_000_000 + i)
+        words = ' '.join(rng.choices(WORDS, k=description_words))
+        tags = ' '.join(f"#{tag}" for tag in rng.sample(HASHTAGS, rng.randint(2, 3)))
+        videos.append({
+            "id": video_id,
+            "url": f"https://www.tiktok.com/@{username}/video/{video_id}",
+            "username": username,
+            "description": f"{words} {tags}",
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "likes": str(rng.randrange(5000)),
+            "comments": str(rng.randrange(300)),
+            "shares": str(rng.randrange(100)),
+            "verified": rng.random() < 0.1,
+            "added_date": "2025-06-09T16:35:32.873958"
+        })
+    return videos
+
+
+def synthetic_videos(count: int, seed: int = 42, **options) -> List[Video]:
+    """Build a deterministic catalog of fake Video records"""
+    return [Video.from_dict(record) for record in synthetic_records(count, seed, **options)]
+
+
+def bench_memory(count: int) -> Dict:
+    """Bytes retained by ``count`` catalog entries loaded from the JSON
+    snapshot: the parsed dicts as json.load returns them vs Video records
+    built from them (the dicts are dropped once converted)"""
+    text = json.dumps({"videos": synthetic_records(count)})
+    results = {"videos": count}
+    for name, build in (("dict_bytes", lambda: json.loads(text)["videos"]),
+                        ("video_bytes", lambda: [Video.from_dict(r) for r in json.loads(text)["videos"]])):
+        tracemalloc.start()
+        built = build()
+        results[name], _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del built
+    return results
+
+
+def bench_render(count: int) -> Dict:
+    """Render a feed of ``count`` videos to a temp file; returns timings and peak memory"""
+    videos = synthetic_videos(count)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tiktok-videos.html")
+        tracemalloc.start()
+        started = time.perf_counter()
+        with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+            write_feed(f, videos)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = os.path.getsize(path)
+    return {"videos": count, "seconds": elapsed, "peak_bytes": peak, "output_bytes": size}
+
+
+@contextmanager
+def working_directory(path: str) -> Iterator[None]:
+    """Run the body with ``path`` as the current directory (the manager's paths are relative)"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(phase: Callable[[], object], trace_memory: bool = False) -> Dict:
+    """Wall time of ``phase()``, or with ``trace_memory`` the peak bytes it
+    allocated (tracing slows it down too much to time it). Its output is
+    swallowed."""
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        phase()
+    elapsed = time.perf_counter() - started
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {"peak_bytes": peak}
+    return {"seconds": elapsed}
+
+
+def bench_manager(count: int, storage: str = 'json', seed: int = 42, usernames: int = 500,
+                  description_words: int = 8, trace_memory: bool = True,
+                  repeat: int = 1) -> Dict[str, Dict]:
+    """Time TikTokManager's hot paths on a synthetic catalog of ``count`` videos.
+
+    Returns {phase: {"seconds", "ops", "peak_bytes"}}. Single-video phases
+    repeat the call ``ops`` times, so seconds / ops is the cost per call.
+    The run is done ``repeat`` times and the best time of each phase kept.
+    With ``trace_memory`` it is done once more under tracemalloc for the
+    peaks, so the timings always come from untraced runs.
+    """
+    results = run_manager_phases(count, storage, seed, usernames, description_words)
+    for _ in range(repeat - 1):
+        for phase, result in run_manager_phases(count, storage, seed, usernames, description_words).items():
+            results[phase]["seconds"] = min(results[phase]["seconds"], result["seconds"])
+    if trace_memory:
+        traced = run_manager_phases(count, storage, seed, usernames, description_words, True)
+        for phase, result in traced.items():
+            results[phase]["peak_bytes"] = result["peak_bytes"]
+    return results
+
+
+def run_manager_phases(count: int, storage: str, seed: int, usernames: int, description_words: int,
+                       trace_memory: bool = False) -> Dict[str, Dict]:
+    """One pass of bench_manager() in a scratch directory holding only the
+    synthetic JSON snapshot"""
+    records = synthetic_records(count, seed, usernames, description_words)
+    batch = max(1, min(1_000, count // 10))
+    base_id = 7_100_000_000_000_000_000
+    singles = [f"https://www.tiktok.com/@newcomer/video/{base_id + i}" for i in range(batch)]
+    bulk = [{"url": f"https://www.tiktok.com/@bulk{i % 50}/video/{base_id + batch + i}",
+             "description": "bulk import #education"} for i in range(count // 10 or 1)]
+    urls = [record["url"] for record in records]
+    username = records[0]["username"]
+    results: Dict[str, Dict] = {}
+
+    with tempfile.TemporaryDirectory() as directory, working_directory(directory):
+        os.makedirs("public")
+        with open("public/tiktok-videos.json", 'w', encoding='utf-8') as f:
+            json.dump({"last_updated": "2025-06-09T16:35:32.873958", "total_videos": count,
+                       "videos": records}, f, indent=2, ensure_ascii=False)
+        del records
+
+        manager = TikTokManager(storage=storage)
+
+        def run(phase: str, body: Callable[[], object], ops: int = 1):
+            results[phase] = {**measure(body, trace_memory), "ops": ops}
+
+        run("load_videos (json)", manager.load_videos)
+        run("load_videos (cached)", manager.load_videos)
+        len(manager.catalog)
+        run("add_video", lambda: [manager.add_video(url) for url in singles], len(singles))
+        run("add_many", lambda: manager.add_many(bulk), len(bulk))
+        run("remove_video", lambda: [manager.remove_video(url.rsplit('/', 1)[1]) for url in singles],
+            len(singles))
+        run("save_videos", manager.save_videos)
+        run("extract_video_id", lambda: [manager.extract_video_id(url) for url in urls], len(urls))
+        run("list_videos (user)", lambda: manager.list_videos(username))
+        run("list_videos (all)", manager.list_videos)
+        run("generate_html", manager.generate_html)
+        run("generate_html (unchanged)", manager.generate_html)
+        manager.catalog.close()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """Commit the benchmark runs against, if this is a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous: Dict, current: Dict):
+    """Print each manager phase's time relative to an earlier results file"""
+    print(f"📈 Compared with {previous.get('revision') or 'previous run'} ({previous.get('timestamp', '?')})")
+    print(f"{'videos':>10} {'phase':<28} {'before':>10} {'after':>10} {'change':>8}")
+    for size, phases in current["manager"].items():
+        for phase, result in phases.items():
+            before = previous.get("manager", {}).get(size, {}).get(phase)
+            if not before or not before["seconds"]:
+                continue
+            change = result["seconds"] / before["seconds"] - 1
+            flag = " ⚠️" if change > 0.1 else ""
+            print(f"{int(size):>10,} {phase:<28} {before['seconds']:>10.4f} "
+                  f"{result['seconds']:>10.4f} {change:>+8.0%}{flag}")
+    if previous.get("options") != current["options"] or previous.get("python") != current["python"]:
+        print("⚠️ The runs used different options or Python versions")
+
+
+def main():
+    """Run the benchmarks for the sizes given on the command line"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the TikTok manager on synthetic catalogs")
+    parser.add_argument("sizes", nargs='*', type=int, default=DEFAULT_SIZES,
+                        help="catalog sizes to benchmark (default: 1000 10000 100000)")
+    parser.add_argument("--suite", choices=('all', 'manager', 'render', 'memory'), default='all')
+    parser.add_argument("--storage", choices=('json', 'journal', 'sqlite'), default='json',
+                        help="manager storage mode to benchmark")
+    parser.add_argument("--usernames", type=int, default=500, help="distinct creators in the catalog")
+    parser.add_argument("--description-words", type=int, default=8, help="words per description")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="run the manager phases N times and keep the best time of each")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second, traced run that measures peak memory")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    options = parser.parse_args()
+
+    results = {
+        "version": RESULTS_VERSION,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {"storage": options.storage, "usernames": options.usernames,
+                    "description_words": options.description_words, "seed": options.seed},
+    }
+
+    if options.suite in ('all', 'manager'):
+        results["manager"] = {}
+        for count in options.sizes:
+            phases = bench_manager(count, options.storage, options.seed, options.usernames,
+                                   options.description_words, not options.no_memory, options.repeat)
+            results["manager"][str(count)] = phases
+            print(f"⏱️ Manager benchmark: {count:,} videos ({options.storage})")
+            print(f"{'phase':<28} {'seconds':>10} {'ops':>8} {'µs/op':>10} {'peak MB':>10}")
+            for phase, result in phases.items():
+                peak = result.get("peak_bytes")
+                print(f"{phase:<28} {result['seconds']:>10.4f} {result['ops']:>8,} "
+                      f"{result['seconds'] / result['ops'] * 1e6:>10.1f} "
+                      f"{'-' if peak is None else f'{peak / 1e6:.2f}':>10}")
+            print()
+
+    if options.suite in ('all', 'render'):
+        results["render"] = []
+        print("⏱️ Feed render benchmark")
+        print(f"{'videos':>10} {'seconds':>10} {'peak MB':>10} {'output MB':>10}")
+        for count in options.sizes:
+            result = bench_render(count)
+            results["render"].append(result)
+            print(f"{result['videos']:>10,} {result['seconds']:>10.3f} "
+                  f"{result['peak_bytes'] / 1e6:>10.2f} {result['output_bytes'] / 1e6:>10.1f}")
+        print()
+
+    if options.suite in ('all', 'memory'):
+        results["memory"] = []
+        print("🧠 Catalog memory (dict vs Video)")
+        print(f"{'videos':>10} {'dict MB':>10} {'Video MB':>10} {'saved':>8}")
+        for count in options.sizes:
+            result = bench_memory(count)
+            results["memory"].append(result)
+            saved = 1 - result['video_bytes'] / result['dict_bytes']
+            print(f"{result['videos']:>10,} {result['dict_bytes'] / 1e6:>10.2f} "
+                  f"{result['video_bytes'] / 1e6:>10.2f} {saved:>8.0%}")
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved results to {options.output}")
+
+    if options.compare and "manager" in results:
+        with open(options.compare, encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
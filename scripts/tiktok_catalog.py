@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+🗂️ Catalog backends for the TikTok Video Manager
+Where the manager keeps its videos and how it looks them up
+"""
+
+import marshal
+import re
+import struct
+from itertools import islice
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from tiktok_storage import atomic_write
+from tiktok_video import Date, Video, parse_date
+
+TERM_RE = re.compile(r'\w+')
+
+# Bump when the snapshot cache row layout changes
+SNAPSHOT_CACHE_VERSION = 3
+
+# Rows per length-prefixed chunk of the snapshot cache: big enough that
+# marshal.loads dominates, small enough that `list --limit` stops early
+SNAPSHOT_CACHE_CHUNK = 1024
+CHUNK_HEADER = struct.Struct('<I')
+
+
+def search_terms(text: str) -> List[str]:
+    """Split a search query into lowercase word terms (every one must match)"""
+    return TERM_RE.findall(text.lower())
+
+
+def match_videos(videos: Iterable[Video], username: Optional[str] = None,
+                 date: Union[str, Date, None] = None, text: Optional[str] = None,
+                 hashtag: Optional[str] = None, since: Union[str, Date, None] = None,
+                 grep: Optional[str] = None) -> Iterator[Video]:
+    """The videos of a stream that match every given filter, with the
+    meaning Catalog.find() gives them, checked one video at a time"""
+    matches = iter(videos)
+    if username is not None:
+        matches = (v for v in matches if v.username == username)
+    if date is not None:
+        date = parse_date(date)
+        if date is None:
+            return iter(())
+        matches = (v for v in matches if v.date == date)
+    if since is not None:
+        since = parse_date(since)
+        if since is None:
+            return iter(())
+        matches = (v for v in matches if v.date is not None and v.date >= since)
+    if hashtag:
+        tag = hashtag.lstrip('#').lower()
+        matches = (v for v in matches if tag in v.hashtags)
+    if text:
+        terms = set(search_terms(text))
+        matches = (v for v in matches if terms.issubset(search_terms(v.description)))
+    if grep:
+        needle = grep.casefold()
+        matches = (v for v in matches if needle in v.description.casefold())
+    return matches
+
+
+class Catalog:
+    """Storage backend interface. Videos keep insertion order; a video that is
+    removed and added again moves to the end.
+
+    Mutations may be buffered until commit(); the manager calls it from
+    save_videos() before publishing the JSON snapshot, and whenever it
+    releases the catalog lock or changes the catalog outside one.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[Video]:
+        """All videos in insertion order"""
+        raise NotImplementedError
+
+    def __contains__(self, video_id: str) -> bool:
+        return self.get(video_id) is not None
+
+    def get(self, video_id: str) -> Optional[Video]:
+        """Look up a video by ID"""
+        raise NotImplementedError
+
+    def add(self, video: Video):
+        """Insert a video (replacing any video with the same ID)"""
+        raise NotImplementedError
+
+    def remove(self, video_id: str) -> Optional[Video]:
+        """Delete a video by ID; returns it, or None if it was not stored"""
+        raise NotImplementedError
+
+    def update_counts(self, video_id: str, likes: int, comments: int, shares: int) -> Optional[Video]:
+        """Set a video's engagement counts in place (it keeps its position);
+        returns the updated video, or None if it is not stored"""
+        raise NotImplementedError
+
+    def replace(self, videos: Iterable[Video]):
+        """Swap the whole catalog for ``videos``"""
+        raise NotImplementedError
+
+    def find(self, username: Optional[str] = None, date: Union[str, Date, None] = None,
+             text: Optional[str] = None, limit: Optional[int] = None, offset: int = 0,
+             hashtag: Optional[str] = None, since: Union[str, Date, None] = None,
+             grep: Optional[str] = None) -> Iterator[Video]:
+        """Videos matching every given filter, in insertion order, produced
+        lazily. ``text`` matches descriptions containing all of its words,
+        ``grep`` descriptions containing it as a case-insensitive substring;
+        ``since`` keeps videos posted on or after that date."""
+        raise NotImplementedError
+
+    def hashtag_counts(self) -> Dict[str, int]:
+        """Number of videos per hashtag"""
+        raise NotImplementedError
+
+    def commit(self):
+        """Make buffered mutations durable"""
+
+    def rollback(self):
+        """Discard buffered mutations not yet committed"""
+
+    def close(self):
+        """Release the backend's resources"""
+
+
+class MemoryCatalog(Catalog):
+    """Whole catalog held in dicts, with username, date and hashtag indexes
+    mapping to ordered sets of IDs. Backs the JSON snapshot and journal
+    storage modes."""
+
+    def __init__(self, videos: Iterable[Video] = ()):
+        self.by_id: Dict[str, Video] = {}
+        self.by_username: Dict[str, Dict[str, None]] = {}
+        self.by_date: Dict[Optional[Date], Dict[str, None]] = {}
+        self.by_hashtag: Dict[str, Dict[str, None]] = {}
+        add = self.add
+        for video in videos:
+            add(video)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __iter__(self) -> Iterator[Video]:
+        return iter(self.by_id.values())
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self.by_id
+
+    def get(self, video_id: str) -> Optional[Video]:
+        return self.by_id.get(video_id)
+
+    def add(self, video: Video):
+        # Inlined bucket updates: this runs once per video on every load
+        video_id = video.id
+        if video_id in self.by_id:
+            self.remove(video_id)
+        self.by_id[video_id] = video
+        bucket = self.by_username.get(video.username)
+        if bucket is None:
+            bucket = self.by_username[video.username] = {}
+        bucket[video_id] = None
+        bucket = self.by_date.get(video.date)
+        if bucket is None:
+            bucket = self.by_date[video.date] = {}
+        bucket[video_id] = None
+        for tag in video.hashtags:
+            bucket = self.by_hashtag.get(tag)
+            if bucket is None:
+                bucket = self.by_hashtag[tag] = {}
+            bucket[video_id] = None
+
+    def remove(self, video_id: str) -> Optional[Video]:
+        video = self.by_id.pop(video_id, None)
+        if video is None:
+            return None
+        entries = [(self.by_username, video.username), (self.by_date, video.date)]
+        entries += [(self.by_hashtag, tag) for tag in video.hashtags]
+        for index, key in entries:
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(video_id, None)
+                if not bucket:
+                    del index[key]
+        return video
+
+    def update_counts(self, video_id: str, likes: int, comments: int, shares: int) -> Optional[Video]:
+        video = self.by_id.get(video_id)
+        if video is None:
+            return None
+        # Counts are not indexed, so only the record itself changes
+        video = self.by_id[video_id] = video.replace(likes=likes, comments=comments, shares=shares)
+        return video
+
+    def replace(self, videos: Iterable[Video]):
+        self.__init__(videos)
+
+    def find(self, username: Optional[str] = None, date: Union[str, Date, None] = None,
+             text: Optional[str] = None, limit: Optional[int] = None, offset: int = 0,
+             hashtag: Optional[str] = None, since: Union[str, Date, None] = None,
+             grep: Optional[str] = None) -> Iterator[Video]:
+        if date is not None:
+            date = parse_date(date)
+            if date is None:
+                return iter(())
+
+        # Walk the smallest matching bucket and check membership in the others
+        buckets = sorted((index.get(key, {}) for index, key in
+                          ((self.by_username, username), (self.by_date, date),
+                           (self.by_hashtag, hashtag and hashtag.lstrip('#').lower()))
+                          if key is not None), key=len)
+        if buckets:
+            smallest, others = buckets[0], buckets[1:]
+            matches = (self.by_id[i] for i in smallest if all(i in b for b in others))
+        else:
+            matches = iter(self.by_id.values())
+
+        matches = match_videos(matches, text=text, since=since, grep=grep)
+        return islice(matches, offset, None if limit is None else offset + limit)
+
+    def hashtag_counts(self) -> Dict[str, int]:
+        return {tag: len(ids) for tag, ids in self.by_hashtag.items()}
+
+
+def _open_snapshot_cache(path: str, source: Tuple[int, int],
+                         source_digest: Optional[Callable[[], str]] = None) -> Optional[Tuple[IO, Dict, bool]]:
+    """Open the snapshot cache and check its header against ``source``;
+    returns (file positioned at the rows, header, whether only the mtime
+    differs) or None"""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        header = marshal.load(f)
+        if not isinstance(header, dict) or header.get('version') != SNAPSHOT_CACHE_VERSION:
+            f.close()
+            return None
+        touched = tuple(header['source']) != tuple(source)
+        if touched and (source_digest is None or header['source'][1] != source[1]
+                        or header['sha256'] != source_digest()):
+            f.close()
+            return None
+    except (OSError, EOFError, ValueError, TypeError, KeyError, IndexError):
+        f.close()
+        return None
+    return f, header, touched
+
+
+def _cached_videos(f: IO, count: int) -> Iterator[Video]:
+    """Build the videos of the cache's row chunks as they are read; closes
+    ``f`` when done. Raises ValueError if the rows are cut short or corrupt."""
+    from_ordinal = Date.fromordinal
+    read = 0
+    with f:
+        while True:
+            size = f.read(CHUNK_HEADER.size)
+            if not size:
+                break
+            if len(size) != CHUNK_HEADER.size:
+                raise ValueError("truncated chunk header")
+            length, = CHUNK_HEADER.unpack(size)
+            data = f.read(length)
+            if len(data) != length:
+                raise ValueError("truncated chunk")
+            rows = marshal.loads(data)
+            read += len(rows)
+            yield from [Video(video_id, url, username, description, from_ordinal(day) if day else None,
+                              likes, comments, shares, verified, added_date, hashtags, extra)
+                        for (video_id, url, username, description, day,
+                             likes, comments, shares, verified, added_date, hashtags, extra) in rows]
+    if read != count:
+        raise ValueError(f"expected {count} cached videos, found {read}")
+
+
+def load_snapshot_cache(path: str, source: Tuple[int, int],
+                        source_digest: Callable[[], str]) -> Optional[List[Video]]:
+    """Load the videos cached for the JSON snapshot whose (mtime_ns, size) is
+    ``source``; None if the cache is missing, stale or unreadable.
+
+    When only the mtime differs (the file was touched or copied) the cache
+    is still used if ``source_digest()`` matches the cached SHA-256.
+    """
+    opened = _open_snapshot_cache(path, source, source_digest)
+    if opened is None:
+        return None
+    f, header, touched = opened
+    try:
+        videos = list(_cached_videos(f, header['count']))
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        return None
+
+    if touched:
+        # Same content under a new mtime: record it so the next load skips hashing
+        save_snapshot_cache(path, source, header['sha256'], videos)
+    return videos
+
+
+def stream_snapshot_cache(path: str, source: Tuple[int, int]) -> Optional[Iterator[Video]]:
+    """Videos cached for the JSON snapshot whose (mtime_ns, size) is
+    ``source``, built chunk by chunk as they are consumed, so a reader that
+    stops early never decodes the rest; None unless the cache matches exactly.
+
+    The iterator raises ValueError if the cache turns out to be corrupt.
+    """
+    opened = _open_snapshot_cache(path, source)
+    if opened is None or opened[2]:
+        if opened is not None:
+            opened[0].close()
+        return None
+    f, header, _ = opened
+    return _cached_videos(f, header['count'])
+
+
+def save_snapshot_cache(path: str, source: Tuple[int, int], source_digest: str, videos: Iterable[Video]):
+    """Write the snapshot cache read by load_snapshot_cache(): a small header,
+    then the videos as marshalled tuples (dates as ordinals), in
+    length-prefixed chunks of SNAPSHOT_CACHE_CHUNK rows"""
+    rows = tuple((v.id, v.url, v.username, v.description, v.date.toordinal() if v.date else 0,
+                  v.likes, v.comments, v.shares, v.verified, v.added_date, v.hashtags, v.extra)
+                 for v in videos)
+    with atomic_write(path, 'wb') as f:
+        marshal.dump({"version": SNAPSHOT_CACHE_VERSION, "source": tuple(source),
+                      "sha256": source_digest, "count": len(rows)}, f)
+        for start in range(0, len(rows), SNAPSHOT_CACHE_CHUNK):
+            data = marshal.dumps(rows[start:start + SNAPSHOT_CACHE_CHUNK])
+            f.write(CHUNK_HEADER.pack(len(data)))
+            f.write(data)
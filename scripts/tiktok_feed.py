@@ -0,0 +1,1451 @@
+#!/usr/bin/env python3
+"""
+🌐 TikTok Feed Renderer for St. Louis Demo JHS
+Streams the standalone TikTok feed page chunk by chunk instead of building it in memory
+"""
+
+import hashlib
+import heapq
+import json
+import marshal
+import os
+import re
+from html import escape
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from tiktok_storage import atomic_write, write_if_changed
+from tiktok_video import Date, Video
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+SHARD_FORMATS = ('json', 'html')
+
+# How videos are rendered: TikTok embeds hydrated by embed.js, or static
+# posters that only become embeds when tapped or scrolled into view
+RENDER_MODES = ('embed', 'facade')
+
+# Feed orderings: as added, or ranked (see rank_videos())
+FEED_ORDERS = ('insertion', 'trending', 'recent', 'likes')
+
+# Trending score: engagement / (age in days + 2) ** gravity, so a video's
+# score halves within days unless it keeps gaining engagement
+TRENDING_GRAVITY = 1.5
+COMMENT_WEIGHT = 2
+SHARE_WEIGHT = 3
+
+# Write buffer for generated pages; chunks are small, so batch them up
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class FeedOptions:
+    """How the feed is built. Fields are keyword-only, so two options can
+    never be swapped silently; a plain slotted class like Video."""
+    __slots__ = ('page_size', 'shard_format', 'hashtags', 'precompress', 'assets',
+                 'render_mode', 'virtual_window', 'order', 'top')
+
+    def __init__(self, *, page_size: Optional[int] = None, shard_format: str = 'json',
+                 hashtags: bool = False, precompress: bool = False, assets: bool = False,
+                 render_mode: str = 'embed', virtual_window: Optional[int] = None,
+                 order: str = 'insertion', top: Optional[int] = None):
+        for name, value in (('page size', page_size), ('virtual window', virtual_window), ('top', top)):
+            if value is not None and (not isinstance(value, int) or value < 0):
+                raise ValueError(f"The {name} must be a whole number that is not negative (got {value!r})")
+        for name, value, choices in (('shard format', shard_format, SHARD_FORMATS),
+                                     ('render mode', render_mode, RENDER_MODES),
+                                     ('feed order', order, FEED_ORDERS)):
+            if value not in choices:
+                raise ValueError(f"Unknown {name} {value!r} (expected one of {', '.join(choices)})")
+
+        # Videos per page; the rest are split into shards listed in a manifest
+        self.page_size = page_size or None
+        self.shard_format = shard_format
+        # A feed per hashtag in public/tiktok-tags/
+        self.hashtags = bool(hashtags)
+        # .gz/.br siblings of every published file, plus an ETag manifest
+        self.precompress = bool(precompress)
+        # Content-hashed tiktok-feed.<hash>.css/.js files instead of inline CSS and JS
+        self.assets = bool(assets)
+        # 'facade': posters that load their embed when tapped or in view
+        self.render_mode = render_mode
+        # Only the current video and this many ahead stay mounted
+        self.virtual_window = virtual_window or None
+        # As added, or ranked; with top only the best that many are published
+        self.order = order
+        self.top = top or None
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={value!r}" for name, value in self.to_dict().items())
+        return f"FeedOptions({fields})"
+
+    def replace(self, **changes) -> 'FeedOptions':
+        """Copy of these options with some changed (and validated)"""
+        return FeedOptions(**{**self.to_dict(), **changes})
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'FeedOptions':
+        """Options saved by to_dict(); unknown keys (from newer versions) are ignored"""
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+# Injects TikTok's embed script as early as possible
+EMBED_LOADER_JS = """        // Preload TikTok embed script for blazing fast loading
+        const script = document.createElement('script');
+        script.src = 'https://www.tiktok.com/embed.js';
+        script.async = true;
+        document.head.appendChild(script);
+"""
+
+FEED_CSS = """        * {
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }
+
+        body {
+            font-family: 'Proxima Nova', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            background: #000000;
+            color: #ffffff;
+            overflow-x: hidden;
+            -webkit-font-smoothing: antialiased;
+            -moz-osx-font-smoothing: grayscale;
+        }
+
+        /* TikTok Official Colors */
+        :root {
+            --tiktok-red: #FE2C55;
+            --tiktok-blue: #25F4EE;
+            --tiktok-black: #000000;
+            --tiktok-dark-gray: #161823;
+            --tiktok-gray: #2F2F2F;
+            --tiktok-light-gray: #8A8A8A;
+            --tiktok-white: #FFFFFF;
+        }
+
+        /* Cute Small Header */
+        .header {
+            position: sticky;
+            top: 0;
+            z-index: 1000;
+            background: linear-gradient(135deg, var(--tiktok-red), var(--tiktok-blue));
+            padding: 8px 16px;
+            text-align: center;
+            box-shadow: 0 2px 10px rgba(254, 44, 85, 0.3);
+            backdrop-filter: blur(10px);
+        }
+
+        .header h1 {
+            font-size: 1.2rem;
+            font-weight: 700;
+            color: var(--tiktok-white);
+            text-shadow: 0 1px 3px rgba(0,0,0,0.3);
+            letter-spacing: 0.5px;
+        }
+
+        .header .school-name {
+            font-size: 0.9rem;
+            opacity: 0.9;
+            margin-top: 2px;
+        }
+
+        /* Native TikTok-like Container */
+        .tiktok-container {
+            height: calc(100vh - 60px);
+            overflow-y: auto;
+            scroll-snap-type: y mandatory;
+            -webkit-overflow-scrolling: touch;
+            scrollbar-width: none;
+            -ms-overflow-style: none;
+        }
+
+        .tiktok-container::-webkit-scrollbar {
+            display: none;
+        }
+
+        /* Video Items - Native TikTok Style */
+        .video-item {
+            height: calc(100vh - 60px);
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            scroll-snap-align: start;
+            position: relative;
+            background: var(--tiktok-black);
+        }
+
+        /* Silver Shimmer Loading Effect */
+        .video-placeholder {
+            width: 100%;
+            max-width: 325px;
+            height: 578px;
+            background: linear-gradient(
+                90deg,
+                #2a2a2a 25%,
+                #3a3a3a 50%,
+                #2a2a2a 75%
+            );
+            background-size: 200% 100%;
+            animation: shimmer 1.5s infinite;
+            border-radius: 12px;
+            position: relative;
+            overflow: hidden;
+        }
+
+        @keyframes shimmer {
+            0% {
+                background-position: -200% 0;
+            }
+            100% {
+                background-position: 200% 0;
+            }
+        }
+
+        .video-placeholder::before {
+            content: '';
+            position: absolute;
+            top: 50%;
+            left: 50%;
+            transform: translate(-50%, -50%);
+            width: 60px;
+            height: 60px;
+            border: 3px solid var(--tiktok-red);
+            border-top: 3px solid transparent;
+            border-radius: 50%;
+            animation: spin 1s linear infinite;
+        }
+
+        @keyframes spin {
+            0% { transform: translate(-50%, -50%) rotate(0deg); }
+            100% { transform: translate(-50%, -50%) rotate(360deg); }
+        }
+
+        /* Facade mode: static poster until the embed is tapped or in view */
+        .video-facade {
+            width: 100%;
+            max-width: 325px;
+            height: 578px;
+            display: flex;
+            flex-direction: column;
+            justify-content: center;
+            align-items: center;
+            gap: 16px;
+            border-radius: 12px;
+            background: linear-gradient(160deg, var(--tiktok-dark-gray), #2a2a2a);
+            color: var(--tiktok-white);
+            text-decoration: none;
+        }
+
+        .facade-play {
+            width: 72px;
+            height: 72px;
+            border-radius: 50%;
+            background: var(--tiktok-red);
+            position: relative;
+        }
+
+        .facade-play::before {
+            content: '';
+            position: absolute;
+            top: 50%;
+            left: 54%;
+            transform: translate(-50%, -50%);
+            border-style: solid;
+            border-width: 14px 0 14px 24px;
+            border-color: transparent transparent transparent var(--tiktok-white);
+        }
+
+        .facade-user {
+            font-weight: 600;
+            color: var(--tiktok-light-gray);
+        }
+
+        /* TikTok Embed Styling */
+        .tiktok-embed {
+            max-width: 325px !important;
+            min-height: 578px !important;
+            margin: 0 auto;
+            border-radius: 12px;
+            overflow: hidden;
+            box-shadow: 0 8px 32px rgba(254, 44, 85, 0.2);
+            transition: transform 0.3s ease, box-shadow 0.3s ease;
+        }
+
+        .tiktok-embed:hover {
+            transform: scale(1.02);
+            box-shadow: 0 12px 48px rgba(254, 44, 85, 0.3);
+        }
+
+        /* Loading States */
+        .video-item.loading .tiktok-embed {
+            display: none;
+        }
+
+        .video-item.loaded .video-placeholder {
+            display: none;
+        }
+
+        /* Mobile Optimizations */
+        @media (max-width: 768px) {
+            .header h1 {
+                font-size: 1rem;
+            }
+
+            .header .school-name {
+                font-size: 0.8rem;
+            }
+
+            .tiktok-embed {
+                max-width: 100vw !important;
+                width: 100% !important;
+            }
+
+            .video-placeholder {
+                max-width: 100vw;
+                width: 100%;
+            }
+        }
+
+        @media (max-width: 480px) {
+            .header {
+                padding: 6px 12px;
+            }
+
+            .tiktok-container {
+                height: calc(100vh - 50px);
+            }
+
+            .video-item {
+                height: calc(100vh - 50px);
+            }
+        }
+
+        /* Smooth Scrolling Enhancement */
+        html {
+            scroll-behavior: smooth;
+        }
+
+        /* Performance Optimizations */
+        .video-item {
+            will-change: transform;
+            contain: layout style paint;
+        }
+
+        /* Loading Animation for Better UX */
+        .fade-in {
+            animation: fadeIn 0.5s ease-in-out;
+        }
+
+        @keyframes fadeIn {
+            from { opacity: 0; transform: translateY(20px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
+
+        /* Search */
+        .feed-search {
+            position: absolute;
+            right: 12px;
+            top: 50%;
+            transform: translateY(-50%);
+            width: 30%;
+            max-width: 220px;
+            padding: 6px 10px;
+            border: none;
+            border-radius: 16px;
+            background: rgba(0, 0, 0, 0.35);
+            color: var(--tiktok-white);
+            font-size: 0.85rem;
+        }
+
+        .feed-search::placeholder {
+            color: rgba(255, 255, 255, 0.7);
+        }
+
+        .search-status {
+            padding: 24px 16px;
+            text-align: center;
+            color: var(--tiktok-light-gray);
+        }
+"""
+
+FEED_JS = """        // Enhanced TikTok Loading with Performance Optimizations
+        document.addEventListener('DOMContentLoaded', function() {
+            // Preload and optimize TikTok embeds
+            const videoItems = document.querySelectorAll('.video-item');
+            const container = document.querySelector('.tiktok-container');
+
+            // Facade mode: items start as static posters and only become
+            // embeds (loading embed.js on the first one) when tapped or
+            // actually in view; with Save-Data on, only when tapped
+            const facadeMode = container.dataset.mode === 'facade';
+            const saveData = !!(navigator.connection && navigator.connection.saveData);
+
+            // Intersection Observer for lazy loading
+            const observer = new IntersectionObserver((entries) => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        loadVideo(entry.target);
+                        observer.unobserve(entry.target);
+                    }
+                });
+            }, facadeMode ? { threshold: 0.6 } : {
+                rootMargin: '50px',
+                threshold: 0.1
+            });
+
+            // Observe all video items
+            videoItems.forEach(item => {
+                observer.observe(item);
+            });
+
+            function loadVideo(videoItem) {
+                let embed = videoItem.querySelector('.tiktok-embed');
+                if (!embed && !saveData) {
+                    embed = activate(videoItem);
+                }
+                if (embed) {
+                    showEmbed(videoItem, embed);
+                }
+            }
+
+            function showEmbed(videoItem, embed) {
+                videoItem.classList.remove('loading');
+                videoItem.classList.add('loaded');
+
+                // Trigger TikTok embed refresh
+                if (window.tiktokEmbed) {
+                    window.tiktokEmbed.lib.render(embed);
+                }
+            }
+
+            // Swap a facade for the real embed; returns the embed, or null
+            // if the item has no facade
+            function activate(videoItem) {
+                const facade = videoItem.querySelector('.video-facade');
+                if (!facade) {
+                    return null;
+                }
+                const embed = renderEmbed({
+                    id: facade.dataset.videoId,
+                    url: facade.href,
+                    username: facade.dataset.uniqueId
+                });
+                facade.replaceWith(embed);
+                videoItem.classList.remove('facade');
+                loadEmbedScript();
+                return embed;
+            }
+
+            // embed.js renders every embed on the page once it has loaded,
+            // so later activations only need lib.render()
+            function loadEmbedScript() {
+                if (window.tiktokEmbed || document.getElementById('tiktok-embed-js')) {
+                    return;
+                }
+                const script = document.createElement('script');
+                script.id = 'tiktok-embed-js';
+                script.src = 'https://www.tiktok.com/embed.js';
+                script.async = true;
+                document.head.appendChild(script);
+            }
+
+            // A tapped poster plays in place instead of opening TikTok (the
+            // poster is a plain link there without JavaScript)
+            container.addEventListener('click', (e) => {
+                const facade = e.target.closest('.video-facade');
+                if (!facade) {
+                    return;
+                }
+                e.preventDefault();
+                const videoItem = facade.closest('.video-item');
+                observer.unobserve(videoItem);
+                showEmbed(videoItem, activate(videoItem));
+            });
+
+            // Enhanced scroll behavior for native TikTok feel
+            let isScrolling = false;
+            let lastScrollTop = container.scrollTop;
+            let direction = 1; // 1 scrolling down, -1 scrolling up
+
+            container.addEventListener('scroll', () => {
+                if (!isScrolling) {
+                    window.requestAnimationFrame(() => {
+                        const scrollTop = container.scrollTop;
+                        if (scrollTop !== lastScrollTop) {
+                            direction = scrollTop > lastScrollTop ? 1 : -1;
+                            lastScrollTop = scrollTop;
+                        }
+                        isScrolling = false;
+                    });
+                    isScrolling = true;
+                }
+            });
+
+            // Keyboard navigation (up/down arrows)
+            document.addEventListener('keydown', (e) => {
+                if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+                    e.preventDefault();
+                    const currentVideo = getCurrentVideo();
+                    const nextVideo = e.key === 'ArrowDown' ?
+                        currentVideo?.nextElementSibling :
+                        currentVideo?.previousElementSibling;
+
+                    if (nextVideo) {
+                        nextVideo.scrollIntoView({ behavior: 'smooth', block: 'start' });
+                    }
+                }
+            });
+
+            function getCurrentVideo() {
+                const videos = Array.from(container.querySelectorAll('.video-item'));
+                const containerRect = container.getBoundingClientRect();
+
+                return videos.find(video => {
+                    const rect = video.getBoundingClientRect();
+                    return rect.top >= containerRect.top && rect.top < containerRect.bottom;
+                });
+            }
+
+            // Virtualized feed (data-window="N"): only the current video, the
+            // N after it in the scroll direction and the one just passed keep
+            // their content. The others are emptied to fixed-height shells,
+            // which tears their iframes down, and rebuilt when the viewer
+            // comes back near them.
+            const windowSize = parseInt(container.dataset.window, 10) || 0;
+            const feedItems = container.getElementsByClassName('video-item');
+            const positions = new WeakMap();
+            const mounted = new Set();
+            let watchedCount = 0;
+            let current = 0;
+
+            function register(item) {
+                // Keep what is needed to rebuild the item once its content is gone
+                const source = item.querySelector('.tiktok-embed, .video-facade');
+                if (source && !item.dataset.url) {
+                    item.dataset.url = source.getAttribute('cite') || source.getAttribute('href');
+                    item.dataset.username = source.dataset.uniqueId;
+                }
+                if (!windowSize || item.parentNode !== container) {
+                    return;
+                }
+                const position = watchedCount++;
+                positions.set(item, position);
+                if (inWindow(position)) {
+                    mounted.add(item);
+                } else {
+                    unmount(item);
+                }
+            }
+
+            function inWindow(position) {
+                const offset = position - current;
+                return direction > 0 ? offset >= -1 && offset <= windowSize
+                                     : offset <= 1 && offset >= -windowSize;
+            }
+
+            function unmount(item) {
+                mounted.delete(item);
+                if (item.classList.contains('unmounted')) {
+                    return;
+                }
+                item.replaceChildren();
+                item.className = 'video-item unmounted';
+                observer.unobserve(item);
+            }
+
+            function mount(item) {
+                mounted.add(item);
+                if (!item.classList.contains('unmounted')) {
+                    return;
+                }
+                const fresh = renderItem({
+                    id: item.id.slice('video-'.length),
+                    url: item.dataset.url,
+                    username: item.dataset.username
+                });
+                item.className = fresh.className;
+                item.replaceChildren(...fresh.childNodes);
+                // Embeds ahead are prefetched now; posters keep waiting to be in view
+                if (facadeMode) {
+                    observer.observe(item);
+                } else {
+                    loadVideo(item);
+                }
+            }
+
+            function updateWindow() {
+                mounted.forEach(item => {
+                    if (!inWindow(positions.get(item))) {
+                        unmount(item);
+                    }
+                });
+                const first = Math.max(current - (direction > 0 ? 1 : windowSize), 0);
+                const last = Math.min(current + (direction > 0 ? windowSize : 1), feedItems.length - 1);
+                for (let i = first; i <= last; i++) {
+                    mount(feedItems[i]);
+                }
+            }
+
+            // Rebuild an item from scratch, dropping its iframe
+            function reset(item) {
+                if (item.classList.contains('unmounted')) {
+                    return;
+                }
+                item.replaceChildren();
+                item.className = 'video-item unmounted';
+                mount(item);
+            }
+
+            // Clicking into an embed moves focus to its iframe and blurs the
+            // page, so that item may now be playing
+            window.addEventListener('blur', () => {
+                const active = document.activeElement;
+                if (active && active.tagName === 'IFRAME') {
+                    const item = active.closest('.video-item');
+                    if (item) {
+                        item.classList.add('played');
+                    }
+                }
+            });
+
+            // Performance: Pause videos not in view. The embed iframe has no
+            // pause API, so a video that was played is reset when it leaves
+            const pauseObserver = new IntersectionObserver((entries) => {
+                entries.forEach(entry => {
+                    const item = entry.target;
+                    if (entry.isIntersecting) {
+                        if (windowSize && positions.has(item)) {
+                            current = positions.get(item);
+                            updateWindow();
+                        }
+                    } else if (item.classList.contains('played')) {
+                        item.classList.remove('played');
+                        reset(item);
+                    }
+                });
+            }, { threshold: 0.5 });
+
+            videoItems.forEach(item => {
+                register(item);
+                pauseObserver.observe(item);
+            });
+
+            // Same markup as render_video() / render_facade() in tiktok_feed.py
+            function renderItem(video) {
+                const item = document.createElement('div');
+                item.id = 'video-' + video.id;
+
+                if (facadeMode) {
+                    item.className = 'video-item facade fade-in';
+                    const facade = document.createElement('a');
+                    facade.className = 'video-facade';
+                    facade.href = video.url;
+                    facade.target = '_blank';
+                    facade.rel = 'noopener';
+                    facade.dataset.videoId = video.id;
+                    facade.dataset.uniqueId = video.username;
+                    facade.setAttribute('aria-label', 'Play video by @' + video.username);
+
+                    const play = document.createElement('span');
+                    play.className = 'facade-play';
+                    const user = document.createElement('span');
+                    user.className = 'facade-user';
+                    user.textContent = '@' + video.username;
+                    facade.append(play, user);
+
+                    item.appendChild(facade);
+                    return item;
+                }
+
+                item.className = 'video-item loading fade-in';
+                const placeholder = document.createElement('div');
+                placeholder.className = 'video-placeholder';
+                item.append(placeholder, renderEmbed(video));
+                return item;
+            }
+
+            function renderEmbed(video) {
+                const embed = document.createElement('blockquote');
+                embed.className = 'tiktok-embed';
+                embed.cite = video.url;
+                embed.dataset.videoId = video.id;
+                embed.dataset.uniqueId = video.username;
+                embed.style.cssText = 'max-width: 325px; min-height: 578px;';
+
+                const section = document.createElement('section');
+                const link = document.createElement('a');
+                link.target = '_blank';
+                link.title = '@' + video.username;
+                link.href = video.url;
+                link.textContent = '@' + video.username + ' on TikTok';
+                section.appendChild(link);
+                embed.appendChild(section);
+                return embed;
+            }
+
+            // Let items added after page load (e.g. from feed shards or search
+            // results) join the observers
+            window.tiktokFeed = {
+                render: renderItem,
+                watch(item) {
+                    observer.observe(item);
+                    register(item);
+                    pauseObserver.observe(item);
+                }
+            };
+        });
+
+        // TikTok embed callback for when script loads
+        window.addEventListener('load', () => {
+            if (window.tiktokEmbed) {
+                // Force render all embeds
+                document.querySelectorAll('.tiktok-embed').forEach(embed => {
+                    window.tiktokEmbed.lib.render(embed);
+                });
+            }
+        });
+"""
+
+# Paginated feeds: fetch the next shard listed in the manifest as the viewer nears the end
+PAGINATION_JS = """
+        // Paginated feed: load the next shard before the viewer reaches the end
+        document.addEventListener('DOMContentLoaded', function() {
+            const container = document.querySelector('.tiktok-container');
+            const manifestUrl = container.dataset.manifest;
+            if (!manifestUrl) {
+                return;
+            }
+
+            const sentinel = document.createElement('div');
+            sentinel.className = 'feed-sentinel';
+            container.appendChild(sentinel);
+
+            let manifest = null;
+            let nextPage = 1; // pages[0] is already inlined in this document
+            let loading = false;
+            let watchedCount = container.querySelectorAll('.video-item').length;
+
+            function nearEnd() {
+                const containerRect = container.getBoundingClientRect();
+                return sentinel.getBoundingClientRect().top < containerRect.bottom + containerRect.height * 2;
+            }
+
+            async function loadNextPage() {
+                if (loading) {
+                    return;
+                }
+                loading = true;
+                try {
+                    if (!manifest) {
+                        manifest = await (await fetch(manifestUrl)).json();
+                    }
+                    if (nextPage >= manifest.pages.length) {
+                        sentinelObserver.disconnect();
+                        return;
+                    }
+
+                    const response = await fetch(manifest.pages[nextPage]);
+                    if (manifest.format === 'html') {
+                        sentinel.insertAdjacentHTML('beforebegin', await response.text());
+                    } else {
+                        const shard = await response.json();
+                        const fragment = document.createDocumentFragment();
+                        shard.videos.forEach(video => fragment.appendChild(window.tiktokFeed.render(video)));
+                        container.insertBefore(fragment, sentinel);
+                    }
+                    nextPage++;
+
+                    const items = container.querySelectorAll('.video-item');
+                    for (let i = watchedCount; i < items.length; i++) {
+                        window.tiktokFeed.watch(items[i]);
+                    }
+                    watchedCount = items.length;
+                } catch (error) {
+                    console.error('Could not load more videos', error);
+                    return;
+                } finally {
+                    loading = false;
+                }
+
+                // Short shards may leave the sentinel in view; keep going
+                if (nearEnd()) {
+                    loadNextPage();
+                }
+            }
+
+            const sentinelObserver = new IntersectionObserver((entries) => {
+                if (entries[0].isIntersecting) {
+                    loadNextPage();
+                }
+            }, {
+                root: container,
+                rootMargin: '0px 0px 200% 0px'
+            });
+            sentinelObserver.observe(sentinel);
+        });
+"""
+
+# Search box: fetches the prebuilt index (see tiktok_search.py) on first use,
+# prefix-matches every query word and shows the hits in a results container
+SEARCH_JS = """
+        // Search: look words up in the prebuilt index and list the matching videos
+        document.addEventListener('DOMContentLoaded', function() {
+            const input = document.querySelector('.feed-search');
+            if (!input) {
+                return;
+            }
+            const container = document.querySelector('.tiktok-container');
+            const results = document.createElement('div');
+            results.className = 'tiktok-container search-results';
+            results.hidden = true;
+            container.after(results);
+
+            const RESULT_LIMIT = 50;
+            const DIGITS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/';
+            const digitValues = new Int8Array(128).fill(-1);
+            for (let i = 0; i < DIGITS.length; i++) {
+                digitValues[DIGITS.charCodeAt(i)] = i;
+            }
+
+            let indexPromise = null;
+            let manifestPromise = null;
+            const shards = new Map();
+            const decoded = new Map();
+            let searchId = 0;
+
+            function loadIndex() {
+                if (!indexPromise) {
+                    indexPromise = fetch(input.dataset.index)
+                        .then(response => response.json())
+                        .then(data => ({
+                            count: data.count,
+                            terms: data.terms ? data.terms.split('\\n') : [],
+                            postings: data.postings ? data.postings.split(' ') : []
+                        }));
+                }
+                return indexPromise;
+            }
+
+            // Positions of one term: VLQ base64 gaps, see encode_postings()
+            function postingsOf(index, termIndex) {
+                let positions = decoded.get(termIndex);
+                if (!positions) {
+                    const text = index.postings[termIndex];
+                    positions = [];
+                    let previous = -1, value = 0, shift = 0;
+                    for (let i = 0; i < text.length; i++) {
+                        const digit = digitValues[text.charCodeAt(i)];
+                        value += (digit & 31) * Math.pow(2, shift);
+                        if (digit & 32) {
+                            shift += 5;
+                        } else {
+                            previous += value + 1;
+                            positions.push(previous);
+                            value = 0;
+                            shift = 0;
+                        }
+                    }
+                    decoded.set(termIndex, positions);
+                }
+                return positions;
+            }
+
+            // Every word must prefix-match some term; returns matching positions in feed order
+            function search(index, query) {
+                const words = query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || [];
+                if (!words.length) {
+                    return null;
+                }
+                const hits = new Uint16Array(index.count);
+                words.forEach((word, w) => {
+                    // Binary search for the first term >= word, then walk the prefix range
+                    let low = 0, high = index.terms.length;
+                    while (low < high) {
+                        const mid = (low + high) >> 1;
+                        if (index.terms[mid] < word) {
+                            low = mid + 1;
+                        } else {
+                            high = mid;
+                        }
+                    }
+                    for (let t = low; t < index.terms.length && index.terms[t].startsWith(word); t++) {
+                        for (const position of postingsOf(index, t)) {
+                            if (hits[position] === w) {
+                                hits[position] = w + 1;
+                            }
+                        }
+                    }
+                });
+                const matches = [];
+                for (let i = 0; i < hits.length; i++) {
+                    if (hits[i] === words.length) {
+                        matches.push(i);
+                    }
+                }
+                return matches;
+            }
+
+            // Works for embeds, facade posters (render_facade()) and the empty
+            // shells of a virtualized feed
+            function videoFromItem(item) {
+                if (item.dataset.url) {
+                    return {
+                        id: item.id.slice('video-'.length),
+                        url: item.dataset.url,
+                        username: item.dataset.username
+                    };
+                }
+                const embed = item.querySelector('.tiktok-embed, .video-facade');
+                return {
+                    id: item.id.slice('video-'.length),
+                    url: embed.getAttribute('cite') || embed.getAttribute('href'),
+                    username: embed.dataset.uniqueId
+                };
+            }
+
+            // The video at a feed position: from this page, or from the shard holding it
+            async function videoAt(position) {
+                if (!container.dataset.manifest) {
+                    return videoFromItem(container.querySelectorAll('.video-item')[position]);
+                }
+                if (!manifestPromise) {
+                    manifestPromise = fetch(container.dataset.manifest).then(response => response.json());
+                }
+                const manifest = await manifestPromise;
+                const page = Math.floor(position / manifest.page_size);
+                if (!shards.has(page)) {
+                    shards.set(page, fetch(manifest.pages[page]).then(async response => {
+                        if (manifest.format === 'html') {
+                            const template = document.createElement('template');
+                            template.innerHTML = await response.text();
+                            return Array.from(template.content.querySelectorAll('.video-item'), videoFromItem);
+                        }
+                        return (await response.json()).videos;
+                    }));
+                }
+                return (await shards.get(page))[position - page * manifest.page_size];
+            }
+
+            function showStatus(text) {
+                const status = document.createElement('div');
+                status.className = 'search-status';
+                status.textContent = text;
+                results.replaceChildren(status);
+            }
+
+            async function runSearch() {
+                const id = ++searchId;
+                const query = input.value.trim();
+                if (!query) {
+                    results.hidden = true;
+                    container.hidden = false;
+                    return;
+                }
+
+                const index = await loadIndex();
+                const matches = search(index, query);
+                if (id !== searchId || matches === null) {
+                    return;
+                }
+                container.hidden = true;
+                results.hidden = false;
+                if (!matches.length) {
+                    showStatus('No videos match "' + query + '"');
+                    return;
+                }
+
+                const videos = await Promise.all(matches.slice(0, RESULT_LIMIT).map(videoAt));
+                if (id !== searchId) {
+                    return;
+                }
+                showStatus(matches.length + (matches.length === 1 ? ' video' : ' videos'));
+                videos.forEach(video => {
+                    const item = window.tiktokFeed.render(video);
+                    results.appendChild(item);
+                    window.tiktokFeed.watch(item);
+                });
+                results.scrollTop = 0;
+            }
+
+            let timer = null;
+            input.addEventListener('focus', loadIndex, { once: true });
+            input.addEventListener('input', () => {
+                clearTimeout(timer);
+                timer = setTimeout(() => runSearch().catch(error => {
+                    console.error('Search failed', error);
+                }), 120);
+            });
+        });
+"""
+
+PAGE_TITLE = "St. Louis Demo JHS on TikTok"
+PAGE_SUBTITLE = "St. Louis Demonstration JHS"
+
+# The page head is split around the <title> and the header subtitle, which
+# differ between the main feed and hashtag feeds
+PAGE_START = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0, user-scalable=no">
+    <title>"""
+
+PAGE_LINKS = """</title>
+    <link rel="preconnect" href="https://www.tiktok.com">
+    <link rel="dns-prefetch" href="https://www.tiktok.com">
+"""
+
+# Facade pages leave this out: embed.js is injected on the first activation
+PAGE_EMBED_LOADER = """    <script>
+""" + EMBED_LOADER_JS + """    </script>
+"""
+
+PAGE_PRELUDE = PAGE_LINKS + PAGE_EMBED_LOADER
+
+PAGE_BODY = """</head>
+<body>
+    <div class="header">
+        <h1>🎵 TikTok</h1>
+        <div class="school-name">"""
+
+PAGE_HEAD = PAGE_PRELUDE + """    <style>
+""" + FEED_CSS + """    </style>
+""" + PAGE_BODY
+
+PAGE_HEADER_END = """</div>
+"""
+
+PAGE_SCRIPTS = """
+    </div>
+
+    <script>
+""" + FEED_JS
+
+PAGE_END = """    </script>
+</body>
+</html>"""
+
+# Asset mode: the full stylesheet and every script live in content-hashed
+# files shared by all feed pages, and only the critical CSS stays inline
+ASSET_PAGE_STYLE = """    <style>
+{critical_css}    </style>
+    <link rel="preload" href="{css_url}" as="style" onload="this.onload=null;this.rel='stylesheet'">
+    <noscript><link rel="stylesheet" href="{css_url}"></noscript>
+"""
+
+ASSET_PAGE_END = """
+    </div>
+
+    <script src="{js_url}" defer></script>
+</body>
+</html>"""
+
+# Rules styling the header, the container and the first video's placeholder,
+# inlined in asset mode so the page renders before the stylesheet arrives
+CRITICAL_SELECTORS = frozenset((
+    '*', 'body', ':root', '.header', '.header h1', '.header .school-name', '.feed-search',
+    '.tiktok-container', '.video-item', '.video-placeholder',
+))
+
+ASSET_RE = re.compile(r'tiktok-feed\.[0-9a-f]{12}\.(?:css|js)')
+
+
+def css_rules(css: str) -> Iterator[Tuple[str, str]]:
+    """Split a stylesheet into top-level (selector, rule text) pairs; the
+    text keeps the comments and whitespace before the rule"""
+    depth = start = 0
+    for position, char in enumerate(css):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                text = css[start:position + 1]
+                head = re.sub(r'/\*.*?\*/', '', text[:text.index('{')], flags=re.S)
+                yield ' '.join(head.split()), text
+                start = position + 1
+
+
+def critical_css(css: str, selectors: Iterable[str]) -> str:
+    """The rules of a stylesheet whose selector is one of ``selectors``, with
+    @media blocks cut down to those rules, minified"""
+    selectors = frozenset(selectors)
+    kept = []
+    for selector, text in css_rules(css):
+        if selector.startswith('@media'):
+            inner = critical_css(text[text.index('{') + 1:text.rindex('}')], selectors)
+            if inner:
+                kept.append(f"{selector}{{{inner}}}")
+        elif selector in selectors:
+            kept.append(text)
+    css = ' '.join(re.sub(r'/\*.*?\*/', '', ''.join(kept), flags=re.S).split())
+    return re.sub(r'\s*([{};,])\s*', r'\1', css).replace(': ', ':').replace(';}', '}')
+
+
+CRITICAL_CSS = '        ' + critical_css(FEED_CSS, CRITICAL_SELECTORS) + '\n'
+
+# Bump when render_video(), render_facade() or the shard layout changes;
+# together with the templates and critical CSS above it invalidates every cached build output
+RENDER_VERSION = 2
+TEMPLATE_DIGEST = hashlib.sha1(
+    f"{RENDER_VERSION}{PAGE_START}{PAGE_HEAD}{PAGE_HEADER_END}{PAGE_SCRIPTS}{PAGINATION_JS}{SEARCH_JS}{PAGE_END}"
+    f"{ASSET_PAGE_STYLE}{CRITICAL_CSS}{ASSET_PAGE_END}".encode('utf-8')).hexdigest()
+
+
+# Everything the pages load from the shared asset files
+ASSET_CSS = FEED_CSS
+ASSET_JS = FEED_JS + PAGINATION_JS + SEARCH_JS
+
+
+def asset_files() -> Dict[str, str]:
+    """Content-hashed file names of the shared stylesheet and script, mapped to
+    their content; the names change whenever the content does, so they can
+    be cached forever"""
+    return {f"tiktok-feed.{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}.{kind}": content
+            for kind, content in (('css', ASSET_CSS), ('js', ASSET_JS))}
+
+
+def is_asset_filename(filename: str) -> bool:
+    """True for any hashed asset file, current or left over from older templates"""
+    return ASSET_RE.fullmatch(filename) is not None
+
+
+def render_video(video: Video) -> str:
+    """Render the markup for one video item (independent of its position,
+    so the build cache can reuse it when videos move between pages)"""
+    url = escape(video.url)
+    username = escape(video.username)
+    return f"""
+        <div class="video-item loading fade-in" id="video-{escape(video.id)}">
+            <!-- Silver Shimmer Loading Placeholder -->
+            <div class="video-placeholder"></div>
+
+            <!-- TikTok Embed -->
+            <blockquote class="tiktok-embed"
+                       cite="{url}"
+                       data-video-id="{escape(video.id)}"
+                       data-unique-id="{username}"
+                       style="max-width: 325px; min-height: 578px;">
+                <section>
+                    <a target="_blank"
+                       title="@{username}"
+                       href="{url}">
+                        @{username} on TikTok
+                    </a>
+                </section>
+            </blockquote>
+        </div>
+"""
+
+
+def render_facade(video: Video) -> str:
+    """Render one video as a static poster; the page's script swaps it for
+    the render_video() embed when it is tapped or in view. Without
+    JavaScript it is a plain link to the video."""
+    username = escape(video.username)
+    return f"""
+        <div class="video-item facade fade-in" id="video-{escape(video.id)}">
+            <a class="video-facade" href="{escape(video.url)}" target="_blank" rel="noopener"
+               data-video-id="{escape(video.id)}" data-unique-id="{username}"
+               aria-label="Play video by @{username}">
+                <span class="facade-play"></span>
+                <span class="facade-user">@{username}</span>
+            </a>
+        </div>
+"""
+
+
+RENDERERS: Dict[str, Callable[[Video], str]] = {'embed': render_video, 'facade': render_facade}
+
+
+def iter_feed_html(videos: Iterable[Video], manifest_url: Optional[str] = None,
+                   render: Callable[[Video], str] = render_video,
+                   hashtag: Optional[str] = None, search_url: Optional[str] = None,
+                   assets: Optional[Tuple[str, str]] = None, mode: str = 'embed',
+                   window: Optional[int] = None) -> Iterator[str]:
+    """Yield the feed page in chunks: head, one chunk per video, scripts.
+
+    With ``manifest_url`` the page only holds the first page of videos and
+    fetches the remaining shards listed in that manifest while scrolling.
+    ``hashtag`` titles the page as that hashtag's feed. ``search_url`` adds a
+    search box backed by that prebuilt index (see tiktok_search.py).
+    ``assets`` is the (stylesheet URL, script URL) of the asset_files(); the
+    page then inlines only the critical CSS and links the rest. In 'facade'
+    ``mode`` the head does not load embed.js (pass render_facade() blocks).
+    With a ``window`` the page is virtualized: only the current video and
+    ``window`` videos ahead keep their content, the rest become empty shells.
+    """
+    yield PAGE_START
+    yield f"#{escape(hashtag)} · {PAGE_TITLE}" if hashtag else PAGE_TITLE
+    if assets or mode == 'facade':
+        yield PAGE_LINKS if mode == 'facade' else PAGE_PRELUDE
+        if assets:
+            css_url, js_url = map(escape, assets)
+            yield ASSET_PAGE_STYLE.format(critical_css=CRITICAL_CSS, css_url=css_url)
+        else:
+            yield '    <style>\n' + FEED_CSS + '    </style>\n'
+        yield PAGE_BODY
+    else:
+        yield PAGE_HEAD
+    yield f"#{escape(hashtag)} · {PAGE_SUBTITLE}" if hashtag else PAGE_SUBTITLE
+    yield PAGE_HEADER_END
+    if search_url:
+        yield (f'        <input type="search" class="feed-search" placeholder="Search videos" '
+               f'aria-label="Search videos" data-index="{escape(search_url)}">\n')
+    yield '    </div>\n'
+    mode_attr = f' data-mode="{mode}"' if mode != 'embed' else ''
+    if window:
+        mode_attr += f' data-window="{int(window)}"'
+    if manifest_url:
+        yield f'    <div class="tiktok-container"{mode_attr} data-manifest="{escape(manifest_url)}">\n'
+    else:
+        yield f'    <div class="tiktok-container"{mode_attr}>\n'
+    for video in videos:
+        yield render(video)
+    if assets:
+        yield ASSET_PAGE_END.format(js_url=js_url)
+        return
+    yield PAGE_SCRIPTS
+    if manifest_url:
+        yield PAGINATION_JS
+    if search_url:
+        yield SEARCH_JS
+    yield PAGE_END
+
+
+def write_feed(f: TextIO, videos: Iterable[Video], manifest_url: Optional[str] = None):
+    """Stream the feed page into an open (buffered) file"""
+    f.writelines(iter_feed_html(videos, manifest_url))
+
+
+def paginate(videos: Iterable[Video], page_size: int) -> Iterator[List[Video]]:
+    """Split videos into consecutive pages of at most ``page_size``"""
+    iterator = iter(videos)
+    while True:
+        page = list(islice(iterator, page_size))
+        if not page:
+            return
+        yield page
+
+
+def rank_videos(videos: Iterable[Video], order: str, top: Optional[int] = None,
+                today: Optional[Date] = None) -> List[Video]:
+    """Videos in feed ``order``, best first; ties keep insertion order.
+
+    With ``top`` only the best ``top`` are kept, picked with a heap in
+    O(n log top) instead of sorting the whole catalog.
+    """
+    if order == 'insertion':
+        return list(islice(videos, top))
+    if order == 'trending':
+        today_ordinal = (today or Date.today()).toordinal()
+
+        def key(v: Video) -> float:
+            engagement = v.likes + COMMENT_WEIGHT * v.comments + SHARE_WEIGHT * v.shares
+            # Undated videos count as posted today rather than sinking
+            age = max(today_ordinal - v.date.toordinal(), 0) if v.date else 0
+            return engagement / (age + 2) ** TRENDING_GRAVITY
+    elif order == 'recent':
+        def key(v: Video) -> int:
+            return v.date.toordinal() if v.date else 0
+    elif order == 'likes':
+        def key(v: Video) -> int:
+            return v.likes
+    else:
+        raise ValueError(f"Unknown feed order {order!r} (expected one of {', '.join(FEED_ORDERS)})")
+
+    if top is not None:
+        return heapq.nlargest(top, videos, key=key)
+    return sorted(videos, key=key, reverse=True)
+
+
+def shard_filename(base: str, page: int, shard_format: str) -> str:
+    """File name of a feed shard, e.g. tiktok-videos-2.json or tiktok-videos-page-2.html"""
+    if shard_format == 'html':
+        return f"{base}-page-{page}.html"
+    return f"{base}-{page}.json"
+
+
+def is_shard_filename(base: str, filename: str) -> bool:
+    """True for any shard file (either format) belonging to ``base``"""
+    return re.fullmatch(re.escape(base) + r'-(?:page-\d+\.html|\d+\.json)', filename) is not None
+
+
+def iter_shard(page: List[Video], start: int, shard_format: str,
+               render: Callable[[Video], str] = render_video) -> Iterator[str]:
+    """Yield one page of videos as an HTML fragment or a compact JSON shard"""
+    if shard_format == 'html':
+        yield from map(render, page)
+    else:
+        shard = {
+            "start": start,
+            "videos": [{"id": v.id, "url": v.url, "username": v.username} for v in page]
+        }
+        yield json.dumps(shard, ensure_ascii=False, separators=(',', ':'))
+
+
+# (id, url, username): everything a page renders of a video, and all that is
+# sent to a render worker
+VideoRow = Tuple[str, str, str]
+
+
+def video_rows(videos: Iterable[Video]) -> List[VideoRow]:
+    """Compact rows of the videos, for shipping a page to a worker process"""
+    return [(v.id, v.url, v.username) for v in videos]
+
+
+def _row_videos(rows: Sequence[VideoRow]) -> List[Video]:
+    return [Video(video_id, url, username, '', None, 0, 0, 0, False, '') for video_id, url, username in rows]
+
+
+def render_shard(rows: Sequence[VideoRow], start: int, shard_format: str, mode: str = 'embed') -> str:
+    """iter_shard() in a worker process"""
+    return ''.join(iter_shard(_row_videos(rows), start, shard_format, RENDERERS[mode]))
+
+
+def render_feed(rows: Sequence[VideoRow], manifest_url: Optional[str], hashtag: Optional[str],
+                search_url: Optional[str], assets: Optional[Tuple[str, str]], mode: str = 'embed',
+                window: Optional[int] = None) -> str:
+    """iter_feed_html() in a worker process"""
+    return ''.join(iter_feed_html(_row_videos(rows), manifest_url, RENDERERS[mode], hashtag, search_url,
+                                  assets, mode, window))
+
+
+class BuildCache:
+    """Content hashes and rendered video blocks from previous feed builds.
+
+    Each output file is recorded with a hash of everything it was rendered
+    from. When that input hash is unchanged the file is skipped without
+    rendering; otherwise it is re-rendered from cached video blocks and only
+    replaced on disk if its bytes actually differ, so unchanged files keep
+    their mtime for the CDN.
+
+    With a process ``pool``, outputs given a ``job`` are rendered in parallel
+    by the workers, and nothing is written until finish() has every output.
+    """
+
+    def __init__(self, path: str, pool: Optional['Executor'] = None):
+        self.path = path
+        # Rendered blocks are much bigger than the file records, so they live
+        # in their own file and are only loaded once something is re-rendered
+        self.blocks_path = os.path.splitext(path)[0] + '-blocks.bin'
+        self.files: Dict[str, Dict] = self._load(path) or {}
+        self.blocks: Optional[Dict[Tuple[str, str, str, str], str]] = None
+        self.written = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.bytes_written = 0
+        self.pool = pool
+        self._pending: List[Tuple[str, str, object]] = []
+
+    @staticmethod
+    def _load(path: str):
+        """Read one marshalled cache file; None if missing, corrupt or stale"""
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if isinstance(data, dict) and data.get('version') == TEMPLATE_DIGEST:
+            return data['entries']
+        return None
+
+    @staticmethod
+    def _dump(path: str, entries: Dict):
+        with atomic_write(path, 'wb') as f:
+            marshal.dump({"version": TEMPLATE_DIGEST, "entries": entries}, f)
+
+    def renderer(self, mode: str = 'embed') -> Callable[[Video], str]:
+        """The ``mode`` renderer, reusing the cached block for unchanged videos"""
+        render = RENDERERS[mode]
+
+        def render_cached(video: Video) -> str:
+            if self.blocks is None:
+                self.blocks = self._load(self.blocks_path) or {}
+            key = (video.id, video.url, video.username, mode)
+            block = self.blocks.get(key)
+            if block is None:
+                block = self.blocks[key] = render(video)
+            return block
+        return render_cached
+
+    @staticmethod
+    def input_key(kind: str, videos: Iterable[Video], *extra: str) -> str:
+        """Hash of the templates, output kind, extra parameters and every
+        video field that ends up in the output"""
+        digest = hashlib.sha1('\0'.join((TEMPLATE_DIGEST, kind) + extra).encode('utf-8'))
+        for v in videos:
+            digest.update(f"\0{v.id}\0{v.url}\0{v.username}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def publish(self, path: str, key: str, render: Callable[[], Iterable[str]],
+                job: Optional[Tuple[Callable[..., str], tuple]] = None) -> bool:
+        """Write ``path`` from ``render()`` unless its inputs or bytes are unchanged;
+        returns True when the file on disk was replaced.
+
+        With a pool the output is queued instead (and False returned): a
+        ``job``, a picklable (function, args) pair returning the content, is
+        rendered by a worker, anything else by ``render()`` right away.
+        """
+        entry = self.files.get(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+
+        if entry and entry['key'] == key and entry['size'] == size:
+            self.skipped += 1
+            return False
+
+        if self.pool is not None:
+            function, args = job or (None, None)
+            self._pending.append((path, key, self.pool.submit(function, *args) if job else ''.join(render())))
+            return False
+        return self._store(path, key, render())
+
+    def finish(self):
+        """Wait for every queued output, then write them in the order they were
+        published; if any fails to render, none is written"""
+        pending, self._pending = self._pending, []
+        contents = [content if isinstance(content, str) else content.result() for _, _, content in pending]
+        for (path, key, _), content in zip(pending, contents):
+            self._store(path, key, [content])
+
+    def _store(self, path: str, key: str, chunks: Iterable[str]) -> bool:
+        entry = self.files.get(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        # The recorded digest only describes the file if it still has the
+        # recorded size; otherwise it was changed behind the cache's back,
+        # so compare with (a hash of) what is actually on disk
+        previous = entry['digest'] if entry and entry['size'] == size else None
+        changed, digest = write_if_changed(path, chunks, previous, buffering=WRITE_BUFFER_SIZE)
+        self.files[path] = {"key": key, "digest": digest, "size": os.path.getsize(path)}
+        if changed:
+            self.written += 1
+            self.bytes_written += self.files[path]["size"]
+        else:
+            self.unchanged += 1
+        return changed
+
+    def forget(self, path: str):
+        """Drop the record of an output file that was deleted"""
+        self.files.pop(path, None)
+
+    def save(self, videos: Iterable[Video]):
+        """Persist the cache, keeping only blocks for videos still in the catalog"""
+        self._dump(self.path, self.files)
+        if self.blocks is not None:
+            current = {(v.id, v.url, v.username) for v in videos}
+            self._dump(self.blocks_path, {k: b for k, b in self.blocks.items() if k[:3] in current})
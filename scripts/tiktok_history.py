@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+📉 Engagement history for the TikTok Video Manager
+Daily likes/comments/shares readings in a compact, delta-encoded columnar
+store, with growth, rising and per-creator queries over it
+"""
+
+import marshal
+import mmap
+import os
+import sys
+from array import array
+from heapq import nlargest
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tiktok_storage import atomic_write
+from tiktok_video import Date, Video
+
+try:
+    import numpy
+except ImportError:  # optional: queries fall back to plain Python loops
+    numpy = None
+
+# Bump when the index layout or the segment encoding changes
+HISTORY_VERSION = 1
+
+# Counts a reading holds, in column order
+HISTORY_METRICS = ('likes', 'comments', 'shares')
+
+# Weights of the combined "engagement" metric, as in the trending feed order
+METRIC_WEIGHTS = {'likes': (1, 0, 0), 'comments': (0, 1, 0), 'shares': (0, 0, 1),
+                  'engagement': (1, 2, 3)}
+
+# Narrowest array typecode first; columns are stored little-endian
+SIGNED_CODES = ('b', 'h', 'i', 'q')
+UNSIGNED_CODES = ('B', 'H', 'I', 'Q')
+
+# Segments start on 8-byte boundaries so every column can be mapped in place
+ALIGNMENT = 8
+
+Columns = Tuple[list, list, list]
+
+
+def narrowest(values: Iterable[int], codes: Tuple[str, ...]) -> str:
+    """Smallest typecode of ``codes`` that holds every value"""
+    values = list(values)
+    low, high = min(values, default=0), max(values, default=0)
+    for code in codes:
+        bits = array(code).itemsize * 8
+        limits = (-(1 << bits - 1), (1 << bits - 1) - 1) if code.islower() else (0, (1 << bits) - 1)
+        if limits[0] <= low and high <= limits[1]:
+            return code
+    raise OverflowError(f"values {low}..{high} do not fit in 64 bits")
+
+
+def _column_bytes(code: str, values: List[int]) -> bytes:
+    column = array(code, values)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column.tobytes()
+
+
+class EngagementHistory:
+    """Append-only engagement readings, one segment per snapshot.
+
+    Every video gets a slot the first time it is recorded. A snapshot only
+    stores the videos whose counts changed since their previous reading:
+    the slots as gaps from the previous changed slot, and the change of each
+    count, every column in the narrowest fixed-width type that fits. Counts
+    change slowly and most videos not at all, so a year of daily snapshots
+    of a large catalog stays small.
+
+    ``engagement.bin`` holds the segments and is memory-mapped for queries.
+    ``engagement-index.bin`` (marshal) lists the slots' video IDs and
+    creators, the segments and the latest counts; it is replaced atomically
+    after a segment is appended, so an interrupted snapshot leaves no trace.
+    """
+
+    def __init__(self, directory: str):
+        self.data_file = os.path.join(directory, "engagement.bin")
+        self.index_file = os.path.join(directory, "engagement-index.bin")
+        self.ids: List[str] = []
+        self.usernames: List[str] = []
+        self.owners = array('I')
+        # (day ordinal, byte offset, changed videos, typecodes of the 4 columns)
+        self.segments: List[Tuple[int, int, int, str]] = []
+        self.latest = tuple(array('q') for _ in HISTORY_METRICS)
+        self._slots: Optional[Dict[str, int]] = None
+        self._map: Optional[mmap.mmap] = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'rb') as f:
+                index = marshal.loads(f.read())
+        except FileNotFoundError:
+            return
+        except (OSError, EOFError, ValueError, TypeError) as e:
+            raise ValueError(f"Cannot read {self.index_file}: {e}") from e
+        if not isinstance(index, dict) or index.get('version') != HISTORY_VERSION:
+            raise ValueError(f"Unsupported engagement history in {self.index_file}")
+        self.ids = list(index['ids'])
+        self.usernames = list(index['usernames'])
+        self.owners = array('I', index['owners'])
+        self.segments = [tuple(segment) for segment in index['segments']]
+        self.latest = tuple(array('q', column) for column in index['latest'])
+        if sys.byteorder != 'little':
+            for column in (self.owners, *self.latest):
+                column.byteswap()
+
+    def __len__(self) -> int:
+        """Number of videos ever recorded"""
+        return len(self.ids)
+
+    @property
+    def days(self) -> List[Date]:
+        """Day of every snapshot, oldest first"""
+        return [Date.fromordinal(segment[0]) for segment in self.segments]
+
+    def size(self) -> int:
+        """Bytes on disk"""
+        return sum(os.path.getsize(path) for path in (self.data_file, self.index_file)
+                   if os.path.exists(path))
+
+    def check_day(self, day: Date):
+        """Raise ValueError unless a snapshot can be recorded for ``day``"""
+        if self.segments and day.toordinal() < self.segments[-1][0]:
+            raise ValueError(f"{day} is before the last snapshot ({self.days[-1]})")
+
+    def record(self, videos: Iterable[Video], day: Date) -> int:
+        """Append a snapshot of the videos' current counts, taken on ``day``;
+        returns how many readings changed"""
+        self.check_day(day)
+        if self._slots is None:
+            self._slots = {video_id: slot for slot, video_id in enumerate(self.ids)}
+        slots, latest = self._slots, self.latest
+        users = {name: code for code, name in enumerate(self.usernames)}
+
+        changed = []
+        for video in videos:
+            slot = slots.get(video.id)
+            if slot is None:
+                slot = slots[video.id] = len(self.ids)
+                self.ids.append(video.id)
+                owner = users.get(video.username)
+                if owner is None:
+                    owner = users[video.username] = len(self.usernames)
+                    self.usernames.append(video.username)
+                self.owners.append(owner)
+                for column in latest:
+                    column.append(0)
+            counts = (video.likes, video.comments, video.shares)
+            deltas = tuple(count - column[slot] for count, column in zip(counts, latest))
+            if any(deltas):
+                changed.append((slot, deltas))
+                for count, column in zip(counts, latest):
+                    column[slot] = count
+        changed.sort()
+
+        gaps, previous = [], -1
+        for slot, _ in changed:
+            gaps.append(slot - previous)
+            previous = slot
+        columns = [gaps] + [[deltas[i] for _, deltas in changed] for i in range(len(HISTORY_METRICS))]
+        codes = narrowest(gaps, UNSIGNED_CODES) + ''.join(narrowest(c, SIGNED_CODES) for c in columns[1:])
+
+        # Anything past the last indexed segment is an append cut short
+        end = self._end()
+        os.makedirs(os.path.dirname(self.data_file) or '.', exist_ok=True)
+        with open(self.data_file, 'ab') as f:
+            f.truncate(end)
+            for code, values in zip(codes, columns):
+                data = _column_bytes(code, values)
+                f.write(data + b'\0' * (-len(data) % ALIGNMENT))
+            f.flush()
+            os.fsync(f.fileno())
+        self.segments.append((day.toordinal(), end, len(changed), codes))
+        self._save()
+        self._close_map()
+        return len(changed)
+
+    def _end(self) -> int:
+        """Byte offset just past the last segment"""
+        if not self.segments:
+            return 0
+        _, offset, count, codes = self.segments[-1]
+        return offset + sum(_padded(array(code).itemsize * count) for code in codes)
+
+    def _save(self):
+        columns = [array('I', self.owners), *(array('q', column) for column in self.latest)]
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+        with atomic_write(self.index_file, 'wb') as f:
+            marshal.dump({"version": HISTORY_VERSION, "ids": self.ids, "usernames": self.usernames,
+                          "owners": columns[0].tobytes(), "segments": self.segments,
+                          "latest": [column.tobytes() for column in columns[1:]]}, f)
+
+    def _segment(self, index: int):
+        """(slots, likes, comments, shares) changes of one segment, as numpy
+        arrays viewing the mapped file or, without numpy, lists"""
+        if self._map is None:
+            with open(self.data_file, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, offset, count, codes = self.segments[index]
+        columns = []
+        for code in codes:
+            size = array(code).itemsize
+            if numpy is not None:
+                columns.append(numpy.frombuffer(self._map, numpy.dtype(code).newbyteorder('<'),
+                                                count, offset))
+            else:
+                column = array(code, self._map[offset:offset + size * count])
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                columns.append(column)
+            offset += _padded(size * count)
+        gaps, *deltas = columns
+        if numpy is not None:
+            return (numpy.cumsum(gaps, dtype=numpy.int64) - 1, *deltas)
+        return (list(accumulate(gaps, initial=-1))[1:], *deltas)
+
+    def gains(self, since: Optional[Date] = None, until: Optional[Date] = None) -> Columns:
+        """Change of each slot's counts from the end of ``since`` to the end of
+        ``until`` (from nothing / to the latest snapshot when omitted)"""
+        first = since.toordinal() if since else -1
+        last = until.toordinal() if until else sys.maxsize
+        selected = [i for i, (day, _, count, _) in enumerate(self.segments)
+                    if first < day <= last and count]
+        if numpy is not None:
+            totals = tuple(numpy.zeros(len(self.ids), numpy.int64) for _ in HISTORY_METRICS)
+            for i in selected:
+                slots, *deltas = self._segment(i)
+                for total, delta in zip(totals, deltas):
+                    # Slots are unique within a segment, so this adds every delta
+                    total[slots] += delta
+            return totals
+        totals = tuple([0] * len(self.ids) for _ in HISTORY_METRICS)
+        for i in selected:
+            slots, *deltas = self._segment(i)
+            for total, delta in zip(totals, deltas):
+                for slot, change in zip(slots, delta):
+                    total[slot] += change
+        return totals
+
+    def totals(self, day: Optional[Date] = None, gains: Optional[Columns] = None) -> Columns:
+        """Each slot's counts at the end of ``day`` (the latest by default).
+
+        Whichever end of the history is closer is replayed: the changes up
+        to ``day``, or the latest counts minus the changes after it (which
+        may be passed in as ``gains`` when the caller has them already).
+        """
+        if day is not None and gains is None:
+            ordinal = day.toordinal()
+            if sum(segment[0] <= ordinal for segment in self.segments) * 2 < len(self.segments):
+                return self.gains(until=day)
+            gains = self.gains(since=day)
+        if numpy is not None:
+            latest = tuple(numpy.array(column, numpy.int64) for column in self.latest)
+            if day is None:
+                return latest
+            return tuple(now - gain for now, gain in zip(latest, gains))
+        if day is None:
+            return tuple(list(column) for column in self.latest)
+        return tuple([now - gain for now, gain in zip(column, gain_column)]
+                     for column, gain_column in zip(self.latest, gains))
+
+    def rising(self, since: Date, metric: str = 'engagement', top: int = 10) -> List[Tuple[str, str, int, int]]:
+        """Videos gaining the most since ``since``: (id, username, gain, count
+        at ``since``), biggest gain first"""
+        columns = self.gains(since=since)
+        gains = _weighted(columns, metric)
+        start = _weighted(self.totals(since, columns), metric)
+        return [(self.ids[slot], self.usernames[self.owners[slot]], int(gains[slot]), int(start[slot]))
+                for slot in _top(gains, top) if gains[slot] > 0]
+
+    def growth(self, since: Date, until: Optional[Date] = None, metric: str = 'engagement',
+               top: int = 10) -> List[Tuple[str, str, float, int, int]]:
+        """Videos growing fastest between ``since`` and ``until``: (id,
+        username, growth rate, count at ``since``, count at ``until``).
+        Videos first recorded after ``since`` have no rate and are left out."""
+        start = _weighted(self.totals(since), metric)
+        end = _weighted(self.totals(until), metric)
+        if numpy is not None:
+            rates = numpy.where(start > 0, (end - start) / numpy.maximum(start, 1), 0.0)
+        else:
+            rates = [(e - s) / s if s > 0 else 0.0 for s, e in zip(start, end)]
+        return [(self.ids[slot], self.usernames[self.owners[slot]], float(rates[slot]),
+                 int(start[slot]), int(end[slot]))
+                for slot in _top(rates, top) if rates[slot] > 0]
+
+    def user_totals(self, day: Optional[Date] = None,
+                    metric: str = 'engagement') -> Dict[str, Tuple[int, int, int]]:
+        """Likes, comments and shares of every creator's videos at the end of
+        ``day`` (the latest by default), highest ``metric`` first"""
+        columns = self.totals(day)
+        if numpy is not None:
+            owners = numpy.array(self.owners, numpy.uint32)
+            sums = [numpy.bincount(owners, weights=column, minlength=len(self.usernames)).astype(numpy.int64)
+                    for column in columns]
+            rows = zip(*(column.tolist() for column in sums))
+        else:
+            sums = [[0] * len(self.usernames) for _ in columns]
+            for total, column in zip(sums, columns):
+                for owner, count in zip(self.owners, column):
+                    total[owner] += count
+            rows = zip(*sums)
+        weights = METRIC_WEIGHTS[metric]
+        totals = dict(zip(self.usernames, rows))
+        return dict(sorted(totals.items(), reverse=True,
+                           key=lambda item: sum(w * count for w, count in zip(weights, item[1]))))
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self):
+        """Unmap the data file"""
+        try:
+            self._close_map()
+        except BufferError:  # arrays returned by a query still view it
+            self._map = None
+
+
+def _padded(size: int) -> int:
+    return size + (-size % ALIGNMENT)
+
+
+def _weighted(columns: Columns, metric: str):
+    """One count per slot: a single metric or the weighted engagement"""
+    weights = METRIC_WEIGHTS[metric]
+    if numpy is not None:
+        return sum(weight * column for weight, column in zip(weights, columns) if weight)
+    return [sum(weight * count for weight, count in zip(weights, counts) if weight)
+            for counts in zip(*columns)]
+
+
+def _top(values, k: int) -> List[int]:
+    """Slots of the ``k`` largest values, largest first"""
+    if k <= 0:
+        return []
+    if numpy is not None:
+        if k < len(values):
+            candidates = numpy.argpartition(values, -k)[-k:]
+        else:
+            candidates = numpy.arange(len(values))
+        return candidates[numpy.argsort(-values[candidates], kind='stable')].tolist()
+    return nlargest(k, range(len(values)), key=values.__getitem__)
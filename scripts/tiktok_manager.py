@@ -4,533 +4,1088 @@
 Simple system to manage TikTok videos without external APIs
 """
 
+import csv
+import hashlib
+import io
+import itertools
 import json
 import os
-import re
+import sys
 from datetime import datetime
-from typing import List, Dict, Optional
+from contextlib import ExitStack, contextmanager, nullcontext, suppress
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from tiktok_catalog import (Catalog, MemoryCatalog, load_snapshot_cache, match_videos, save_snapshot_cache,
+                            stream_snapshot_cache)
+from tiktok_feed import (FEED_ORDERS, RENDER_MODES, SHARD_FORMATS, BuildCache, FeedOptions, asset_files,
+                         is_asset_filename, is_shard_filename, iter_feed_html, iter_shard, paginate, rank_videos, render_feed, render_shard,
+                         shard_filename, video_rows)
+from tiktok_history import HISTORY_METRICS, EngagementHistory
+from tiktok_metrics import METRICS, JsonLinesOutput, print_report, profiling, timed
+from tiktok_search import build_search_index, search_index_key
+from tiktok_urls import match_video_url, parse_video_url
+from tiktok_storage import CatalogError, atomic_write, file_digest, file_lock
+from tiktok_video import Date, Video, extract_hashtags, format_count, parse_count, parse_date, parse_flag
+
+IMPORT_FORMATS = ('urls', 'csv', 'jsonl')
+
+# list output: readable blocks, one line per video, or catalog fields for other tools
+LIST_FORMATS = ('text', 'table', 'jsonl', 'csv')
+LIST_FIELDS = ('id', 'url', 'username', 'description', 'date', 'likes', 'comments', 'shares',
+               'verified', 'added_date', 'hashtags')
+
+# Bulk command output is written through one buffer of this size
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Longest a watch rebuild waits for a steady stream of changes to settle
+WATCH_MAX_DELAY = 30.0
+
+# Where the catalog lives: the JSON snapshot alone, the snapshot plus an
+# append-only journal, or an indexed SQLite database exported to the snapshot
+STORAGE_MODES = ('json', 'journal', 'sqlite')
+
+
+def detect_import_format(path: str, first_line: str) -> str:
+    """Guess the import format from the file extension, falling back to the first line"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension == '.txt':
+        return 'urls'
+
+    line = first_line.strip()
+    if line.startswith('{'):
+        return 'jsonl'
+    if ',' in line and 'url' in line.lower().split(','):
+        return 'csv'
+    return 'urls'
+
+
+def iter_import_rows(stream: TextIO, fmt: str) -> Iterator[Union[str, Dict]]:
+    """Yield add_many() rows from newline-delimited URLs, CSV (with a 'url'
+    header) or JSONL. Malformed JSONL lines are passed through as empty rows
+    so they are reported as invalid instead of aborting the import."""
+    if fmt == 'csv':
+        for record in csv.DictReader(stream):
+            record = {k.strip().lower(): (v or '').strip() for k, v in record.items() if k}
+            if 'verified' in record:
+                record['verified'] = parse_flag(record['verified'])
+            yield record
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {"url": line}
+            yield record if isinstance(record, dict) else {"url": str(record)}
+    else:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+# Short links resolved between saves of the short-link table, so an
+# interrupted resolve keeps most of its work
+RESOLVE_SAVE_EVERY = 100
+
+# Feed options that can be set from the environment: (option, variable, parser)
+FEED_ENVIRONMENT = (
+    ('page_size', 'TIKTOK_PAGE_SIZE', int),
+    ('shard_format', 'TIKTOK_SHARD_FORMAT', str),
+    ('hashtags', 'TIKTOK_HASHTAG_FEEDS', lambda value: value != '0'),
+    ('precompress', 'TIKTOK_PRECOMPRESS', lambda value: value != '0'),
+    ('assets', 'TIKTOK_ASSETS', lambda value: value != '0'),
+    ('render_mode', 'TIKTOK_RENDER_MODE', str),
+    ('virtual_window', 'TIKTOK_VIRTUALIZE', int),
+    ('order', 'TIKTOK_FEED_ORDER', str),
+    ('top', 'TIKTOK_FEED_TOP', int),
+)
+
+# Journal size past which save_videos() folds it back into the snapshot
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
 
 class TikTokManager:
-    def __init__(self):
+    def __init__(self, storage: str = 'json', compact_threshold: int = JOURNAL_COMPACT_BYTES,
+                 feed: Optional[Dict] = None, jobs: int = 1):
         self.output_file = "public/tiktok-videos.json"
         self.html_file = "public/tiktok-videos.html"
-        
-        # Ensure public directory exists
-        os.makedirs("public", exist_ok=True)
-        
-        # Load existing videos
-        self.videos = self.load_videos()
-    
-    def load_videos(self) -> List[Dict]:
-        """Load existing videos from JSON file"""
-        if os.path.exists(self.output_file):
+
+        # How generate_html() builds the feed by default (see FeedOptions):
+        # the options of the last build, saved here, with ``feed`` on top
+        self.build_options_file = ".tiktok/build-options.json"
+        self._feed_overrides = dict(feed or {})
+        FeedOptions(**self._feed_overrides)
+        self._feed: Optional[FeedOptions] = None
+        self._saved_feed: Optional[Tuple[Tuple[int, int], Optional[FeedOptions]]] = None
+
+        # Paginated feed: the HTML only carries the first page and the rest is
+        # split into shards listed in the manifest
+        self.manifest_file = "public/tiktok-videos-manifest.json"
+
+        # Prebuilt index behind the feed page's search box
+        self.search_file = "public/tiktok-videos-search.json"
+
+        # Per-hashtag feeds, built from the catalog's hashtag index
+        self.hashtag_dir = "public/tiktok-tags"
+
+        # Precompressed .gz/.br siblings of every published file, plus their
+        # content hashes as ETags, so the CDN never compresses on the fly
+        self.etag_manifest_file = "public/tiktok-etags.json"
+
+        # Render worker processes for feed pages and shards (0: one per core)
+        self.jobs = jobs
+
+        # Short-link code -> full URL table for dedup (see link_short_url)
+        self.short_links_file = ".tiktok/short-links.json"
+        self._short_links: Optional[Dict[str, str]] = None
+
+        # Engagement readings of every snapshot, as compact delta-encoded columns
+        self.history_dir = ".tiktok/history"
+
+        # Content hashes of the last build, so unchanged outputs are not rewritten
+        self.build_cache_file = ".tiktok/feed-cache.bin"
+
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode {storage!r} (expected one of {', '.join(STORAGE_MODES)})")
+        self.storage = storage
+
+        # Journal mode: mutations are appended to a JSONL journal kept out of
+        # public/, and only compaction rewrites the published snapshot
+        self.journal = storage == 'journal'
+        self.journal_file = ".tiktok/tiktok-videos.journal.jsonl"
+        self.compact_threshold = compact_threshold
+        self._pending_ops: List[Dict] = []
+
+        # SQLite mode: the database is the catalog and queries run in it; the
+        # JSON snapshot is still written on every save as the published copy
+        self.database_file = ".tiktok/tiktok-videos.db"
+
+        # Binary copy of the parsed JSON snapshot, much faster to load than
+        # json.load + Video.from_dict; only trusted while the JSON is unchanged
+        self.snapshot_cache_file = ".tiktok/snapshot-cache.bin"
+
+        # Advisory lock shared by every manager process working on this catalog
+        self.lock_file = ".tiktok/tiktok-videos.lock"
+        self._lock_depth = 0
+        self._loaded_signature = None
+
+        # Video records with username/date (and, in SQLite, full-text) lookups.
+        # Nothing is read until a command first needs the catalog
+        self._catalog: Optional[Catalog] = None
+
+    @property
+    def catalog(self) -> Catalog:
+        """The video catalog, loaded on first use"""
+        if self._catalog is None:
+            if self._lock_depth:
+                self._refresh()
+            else:
+                with file_lock(self.lock_file, shared=True):
+                    self._refresh()
+        return self._catalog
+
+    @property
+    def feed(self) -> FeedOptions:
+        """Default feed build options: the last build's, with the constructor's
+        overrides applied; read on first use"""
+        if self._feed is None:
+            self._feed = self.saved_feed_options().replace(**self._feed_overrides)
+        return self._feed
+
+    def saved_feed_options(self) -> FeedOptions:
+        """The options the feed was last built with (defaults before any build)"""
+        return self._read_feed_options() or FeedOptions()
+
+    def _read_feed_options(self) -> Optional[FeedOptions]:
+        """The saved build options; None when missing or unreadable. The file
+        is only read again once its (mtime_ns, size) changes."""
+        try:
+            stat = os.stat(self.build_options_file)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if self._saved_feed is None or self._saved_feed[0] != signature:
             try:
-                with open(self.output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # Handle both old format (array) and new format (object with videos array)
-                    if isinstance(data, list):
-                        return data
-                    elif isinstance(data, dict) and 'videos' in data:
-                        return data['videos']
-                    else:
-                        return []
-            except:
-                pass
-        return []
-    
+                with open(self.build_options_file, 'r', encoding='utf-8') as f:
+                    options = FeedOptions.from_dict(json.load(f))
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                print(f"⚠️ Ignoring unreadable {self.build_options_file}: {e}")
+                options = None
+            self._saved_feed = (signature, options)
+        return self._saved_feed[1]
+
+    @property
+    def videos(self) -> List[Video]:
+        """All videos in insertion order"""
+        return list(self.catalog)
+
+    @videos.setter
+    def videos(self, videos: Iterable[Video]):
+        self.catalog.replace(videos)
+        self._record(None)
+
+    def get_video(self, video_id: str) -> Optional[Video]:
+        """Look up a video by ID"""
+        return self.catalog.get(video_id)
+
+    def find_videos(self, username: Optional[str] = None, date: Union[str, Date, None] = None,
+                    text: Optional[str] = None, hashtag: Optional[str] = None) -> List[Video]:
+        """Return videos matching username, date, search text and/or hashtag using the catalog indexes"""
+        return list(self.catalog.find(username, date, text, hashtag=hashtag))
+
+    @contextmanager
+    def locked(self, shared: bool = False, reload: bool = True):
+        """Hold the catalog lock, first reloading any changes other processes
+        saved since this manager last read the catalog (unless reload=False).
+
+        Wrap each read-modify-save cycle in an exclusive lock; readers that
+        render from the catalog take a shared lock so they never see a
+        snapshot and journal from different moments.
+        """
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield self
+            finally:
+                self._lock_depth -= 1
+            return
+
+        with file_lock(self.lock_file, shared=shared):
+            self._lock_depth = 1
+            try:
+                # A catalog that was never loaded is read fresh on first use anyway
+                if reload and self._catalog is not None:
+                    self._refresh()
+                yield self
+            except BaseException:
+                # Never leave a half-applied change in the database
+                if self._catalog is not None:
+                    self._catalog.rollback()
+                raise
+            else:
+                # Changes not saved yet are kept, but no write transaction
+                # may outlive the lock or it blocks every other process
+                if self._catalog is not None:
+                    self._catalog.commit()
+            finally:
+                self._lock_depth = 0
+
+    @timed("load_catalog")
+    def _refresh(self):
+        """Load the catalog, or pick up changes saved to disk since this manager
+        last read it"""
+        if self.storage == 'sqlite':
+            if self._catalog is None:
+                from tiktok_sqlite import SQLiteCatalog
+                self._catalog = SQLiteCatalog(self.database_file)
+            self._sync_database()
+        elif self._catalog is None or self._catalog_signature() != self._loaded_signature:
+            self._catalog = MemoryCatalog(self.load_videos())
+
+    @timed("sync_database")
+    def _sync_database(self):
+        """Import the JSON snapshot into the database when it changed outside
+        SQLite mode (first run, hand edits, other storage modes)"""
+        signature = json.dumps(self._catalog_signature()[0])
+        if signature == 'null' or self.catalog.get_meta('snapshot_signature') == signature:
+            return
+
+        self.catalog.replace(self._parse_records(self._load_snapshot()))
+        METRICS.count(videos=len(self.catalog))
+        self.catalog.set_meta('snapshot_signature', signature)
+        self.catalog.commit()
+        print(f"🗄️ Imported {len(self.catalog)} videos from {self.output_file} into {self.database_file}")
+
+    def _catalog_signature(self) -> Tuple:
+        """Cheap fingerprint of the snapshot and journal files on disk"""
+        signature = []
+        for path in (self.output_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @timed("load_videos")
+    def load_videos(self) -> List[Video]:
+        """Load existing videos from the JSON snapshot and replay the journal"""
+        self._pending_ops = []
+        self._loaded_signature = self._catalog_signature()
+        videos = self._load_snapshot_videos(self._loaded_signature[0])
+        if os.path.exists(self.journal_file):
+            by_id = {v.id: v for v in videos}
+            for op in self._read_journal():
+                METRICS.count(journal_ops=1)
+                if op.get('op') == 'add':
+                    video, = self._parse_records([op['video']])
+                    by_id[video.id] = video
+                elif op.get('op') == 'remove':
+                    by_id.pop(op['id'], None)
+                elif op.get('op') == 'counts' and op['id'] in by_id:
+                    by_id[op['id']] = by_id[op['id']].replace(
+                        likes=op['likes'], comments=op['comments'], shares=op['shares'])
+            videos = list(by_id.values())
+        METRICS.count(videos=len(videos))
+        return videos
+
+    def _load_snapshot_videos(self, signature: Optional[Tuple[int, int]]) -> List[Video]:
+        """Videos of the JSON snapshot, from the binary snapshot cache when it
+        matches the snapshot's (mtime_ns, size) signature"""
+        if signature is None:
+            return []
+        videos = load_snapshot_cache(self.snapshot_cache_file, signature,
+                                     lambda: file_digest(self.output_file))
+        if videos is not None:
+            METRICS.count(snapshot_cache_hits=1)
+            return videos
+
+        with METRICS.phase("parse_snapshot", bytes_read=signature[1]):
+            videos = self._parse_records(self._load_snapshot())
+        save_snapshot_cache(self.snapshot_cache_file, signature, file_digest(self.output_file), videos)
+        return videos
+
+    def _scan_videos(self) -> Optional[Iterator[Video]]:
+        """Stream the catalog straight from the snapshot cache, without
+        building the indexed catalog, for read-only commands that only walk
+        it once; None when that is not possible (SQLite storage, catalog
+        already loaded, pending journal changes or no fresh cache)"""
+        if self.storage == 'sqlite' or self._catalog is not None:
+            return None
+        # The open cache file stays readable even if a writer replaces it later
+        with nullcontext() if self._lock_depth else file_lock(self.lock_file, shared=True):
+            snapshot, journal = self._catalog_signature()
+            if snapshot is None or journal is not None:
+                return None
+            videos = stream_snapshot_cache(self.snapshot_cache_file, snapshot)
+        if videos is None:
+            return None
+        METRICS.count(snapshot_cache_hits=1)
+        return self._checked_scan(videos)
+
+    def _checked_scan(self, videos: Iterator[Video]) -> Iterator[Video]:
+        """Pass a snapshot cache stream through; if the cache turns out to be
+        corrupt midway, drop it and carry on from the catalog loaded from the
+        JSON snapshot (same order, as no journal is pending)"""
+        read = 0
+        try:
+            for video in videos:
+                yield video
+                read += 1
+        except (EOFError, ValueError, TypeError) as e:
+            print(f"⚠️ Ignoring corrupt snapshot cache {self.snapshot_cache_file}: {e}", file=sys.stderr)
+            with suppress(OSError):
+                os.remove(self.snapshot_cache_file)
+            yield from itertools.islice(self.catalog, read, None)
+
+    def _parse_records(self, records: Iterable[Dict]) -> List[Video]:
+        """Convert catalog JSON objects to Video records"""
+        records = records if isinstance(records, list) else list(records)
+        try:
+            return [Video.from_dict(record) for record in records]
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            # Find the entry to blame only once a conversion failed: the
+            # comprehension is the fast path for every load
+            video_id = None
+            for record in records:
+                try:
+                    Video.from_dict(record)
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    video_id = record.get('id') if isinstance(record, dict) else None
+                    break
+            raise CatalogError(f"Malformed video entry {video_id!r} in {self.output_file}: {e}") from e
+
+    def _load_snapshot(self) -> List[Dict]:
+        """Load the published JSON snapshot"""
+        try:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            # Never fall back to an empty catalog: the next save would wipe it
+            raise CatalogError(f"Cannot read {self.output_file}: {e}") from e
+
+        # Handle both old format (array) and new format (object with videos array)
+        if isinstance(data, list):
+            return data
+        elif isinstance(data, dict) and 'videos' in data:
+            return data['videos']
+        raise CatalogError(f"Unexpected JSON layout in {self.output_file}")
+
+    def _read_journal(self) -> Iterator[Dict]:
+        """Yield journal operations in the order they were appended.
+
+        A final line without a newline is an append cut short by a crash and
+        is skipped; any other unreadable line is an error.
+        """
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    if not line.endswith('\n'):
+                        print(f"⚠️ Ignoring incomplete last entry in {self.journal_file}")
+                        return
+                    raise CatalogError(f"Corrupt entry on line {line_number} of {self.journal_file}: {e}") from e
+
+    def _record(self, op: Optional[Dict]):
+        """Queue a mutation for the journal (journal mode only). Outside the
+        catalog lock the catalog commits it at once, so a manager that waits
+        (e.g. for input) never holds SQLite's write lock."""
+        if self.journal and op is not None:
+            self._pending_ops.append(op)
+        if not self._lock_depth:
+            self.catalog.commit()
+
+    @timed("save_videos")
     def save_videos(self):
-        """Save videos to JSON file"""
-        data = {
-            "last_updated": datetime.now().isoformat(),
-            "total_videos": len(self.videos),
-            "videos": self.videos
-        }
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        print(f"💾 Saved {len(self.videos)} videos to {self.output_file}")
+        """Save videos to JSON file, or append pending changes to the journal in journal mode.
+        In SQLite mode the database transaction is committed and then exported."""
+        if not self.journal:
+            with self.locked(reload=False):
+                self.catalog.commit()
+                self._write_snapshot()
+            return
+
+        with self.locked(reload=False):
+            if self._pending_ops:
+                os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+                with open(self.journal_file, 'a', encoding='utf-8') as f:
+                    entries = ''.join(json.dumps(op, ensure_ascii=False) + '\n' for op in self._pending_ops)
+                    f.write(entries)
+                    f.flush()
+                    os.fsync(f.fileno())
+                METRICS.count(journal_ops=len(self._pending_ops), bytes_written=len(entries.encode('utf-8')))
+                print(f"📝 Journaled {len(self._pending_ops)} changes to {self.journal_file}")
+                self._pending_ops = []
+                self._loaded_signature = self._catalog_signature()
+
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) >= self.compact_threshold:
+                self.compact()
+
+    @timed("compact")
+    def compact(self):
+        """Fold the journal into the published snapshot and start a fresh journal"""
+        with self.locked(reload=False):
+            self._pending_ops = []
+            self._write_snapshot()
+
+    @timed("write_snapshot")
+    def _write_snapshot(self):
+        """Write the full catalog to the JSON snapshot and drop the replayed journal"""
+        with self.locked(reload=False):
+            videos = self.videos
+            data = {
+                "last_updated": datetime.now().isoformat(),
+                "total_videos": len(videos),
+                "videos": [video.to_dict() for video in videos]
+            }
+            # One dumps() call: json.dump() with indent makes millions of tiny
+            # writes, and the bytes are needed anyway for the cache's digest
+            content = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+            with atomic_write(self.output_file, 'wb') as f:
+                f.write(content)
+            METRICS.count(videos=len(videos), bytes_written=len(content))
+            print(f"💾 Saved {len(videos)} videos to {self.output_file}")
+
+            # Everything the journal held is now in the snapshot
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._loaded_signature = self._catalog_signature()
+            if self.feed.precompress:
+                self._precompress([self.output_file])
+            if self.storage != 'sqlite':
+                save_snapshot_cache(self.snapshot_cache_file, self._loaded_signature[0],
+                                    hashlib.sha256(content).hexdigest(), videos)
+            if self.storage == 'sqlite':
+                # The snapshot now matches the database; don't import it back
+                self.catalog.set_meta('snapshot_signature', json.dumps(self._loaded_signature[0]))
+                self.catalog.commit()
     
+    @timed("add_video")
     def add_video(self, url: str, description: str = "", manual_data: Optional[Dict] = None) -> bool:
         """Add a single TikTok video"""
         try:
-            # Extract video ID from URL
-            video_id = self.extract_video_id(url)
-            if not video_id:
-                print(f"❌ Could not extract video ID from: {url}")
-                return False
-
-            # Check if video already exists
-            if any(v['id'] == video_id for v in self.videos):
-                print(f"⚠️ Video {video_id} already exists")
-                return False
-            
-            # Create video object
-            username = 'unknown'
-            final_description = description
-            date = datetime.now().strftime("%Y-%m-%d")
-            likes = '0'
-            comments = '0'
-            shares = '0'
-            verified = False
-
-            if manual_data:
-                username = manual_data.get('username', 'unknown')
-                if not final_description:
-                    final_description = manual_data.get('description', '')
-                date = manual_data.get('date', date)
-                likes = manual_data.get('likes', '0')
-                comments = manual_data.get('comments', '0')
-                shares = manual_data.get('shares', '0')
-                verified = manual_data.get('verified', False)
-
-            video = {
-                "id": video_id,
-                "url": url,
-                "username": username,
-                "description": final_description,
-                "date": date,
-                "likes": likes,
-                "comments": comments,
-                "shares": shares,
-                "verified": verified,
-                "added_date": datetime.now().isoformat()
-            }
-            
-            self.videos.append(video)
-            print(f"✅ Added video: {video_id}")
-            return True
-            
+            status, video_id = self._add_video(url, description, manual_data)
         except Exception as e:
             print(f"❌ Error adding video: {str(e)}")
             return False
-    
-    def extract_video_id(self, url: str) -> str:
-        """Extract TikTok video ID from URL"""
-        try:
-            # Handle different TikTok URL formats
-            patterns = [
-                r'tiktok\.com/@[^/]+/video/(\d+)',  # Standard format
-                r'vm\.tiktok\.com/([A-Za-z0-9]+)',   # Short format
-                r'tiktok\.com/t/([A-Za-z0-9]+)',     # Another short format
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            
-            return None
-        except:
+
+        if status == 'invalid':
+            print(f"❌ Could not extract video ID from: {url}")
+        elif status == 'duplicate':
+            print(f"⚠️ Video {video_id} already exists")
+        else:
+            print(f"✅ Added video: {video_id}")
+        return status == 'added'
+
+    def _add_video(self, url: str, description: str = "",
+                   manual_data: Optional[Dict] = None) -> Tuple[str, Optional[str]]:
+        """Add a video without reporting; returns (status, video_id) with status
+        one of 'added', 'duplicate' or 'invalid'"""
+        # Extract video ID (and canonical URL) from any supported URL variant
+        parsed = self.parse_url(url)
+        if not parsed:
+            return 'invalid', None
+        video_id, url, url_username = parsed
+
+        # Check if video already exists
+        if video_id in self.catalog:
+            return 'duplicate', video_id
+
+        # Create video object
+        username = url_username or 'unknown'
+        final_description = description
+        date = datetime.now().date()
+        likes = comments = shares = 0
+        verified = False
+
+        if manual_data:
+            username = manual_data.get('username') or username
+            if not final_description:
+                final_description = manual_data.get('description', '')
+            if manual_data.get('date'):
+                date = parse_date(manual_data['date'])
+                if date is None:
+                    raise ValueError(f"invalid date {manual_data['date']!r} (expected YYYY-MM-DD)")
+            likes = parse_count(manual_data.get('likes'))
+            comments = parse_count(manual_data.get('comments'))
+            shares = parse_count(manual_data.get('shares'))
+            verified = parse_flag(manual_data.get('verified', False))
+
+        video = Video(
+            id=video_id,
+            url=url,
+            username=sys.intern(username),
+            description=final_description,
+            date=date,
+            likes=likes,
+            comments=comments,
+            shares=shares,
+            verified=verified,
+            added_date=datetime.now().isoformat(),
+            hashtags=extract_hashtags(final_description)
+        )
+
+        self.catalog.add(video)
+        self._record({"op": "add", "video": video.to_dict()})
+        return 'added', video_id
+
+    @timed("add_many")
+    def add_many(self, rows: Iterable[Union[str, Dict]]) -> List[Dict]:
+        """Add many videos in one pass without saving or regenerating HTML.
+
+        Each row is either a URL string or a dict with a 'url' key plus optional
+        'description', 'username', 'date', 'likes', 'comments', 'shares' and
+        'verified'. Returns one result dict per row with 'row', 'url', 'status'
+        ('added', 'duplicate', 'invalid' or 'error') and 'id' or 'error'.
+        """
+        results = []
+        for row_number, row in enumerate(rows, 1):
+            if isinstance(row, dict):
+                # JSONL values can be of any type; a URL that is not a string is just invalid
+                url = str(row.get('url') or '').strip()
+                description = str(row.get('description') or '')
+                manual_data = row
+            else:
+                url, description, manual_data = str(row).strip(), '', None
+
+            result = {"row": row_number, "url": url}
+            try:
+                result["status"], result["id"] = self._add_video(url, description, manual_data)
+            except Exception as e:
+                result["status"], result["error"] = 'error', str(e)
+            results.append(result)
+            METRICS.count(rows=1, **{result["status"]: 1})
+        return results
+
+    def extract_video_id(self, url: str) -> Optional[str]:
+        """Extract TikTok video ID from URL (short-link code if it isn't mapped yet)"""
+        match = match_video_url(url)
+        if match is None:
             return None
-    
+
+        video_id = match[match.lastindex]
+        if match.lastgroup != 'video_id':
+            target = self.short_links.get(video_id)
+            if target:
+                return self.extract_video_id(target)
+        return video_id
+
+    def parse_url(self, url: str) -> Optional[Tuple[str, str, Optional[str]]]:
+        """Parse a TikTok URL into (video_id, canonical_url, username), resolving
+        short links through the local short-link table when they are mapped"""
+        parsed = parse_video_url(url)
+        if parsed is None or parsed[2] is not None:
+            return parsed
+
+        target = self.short_links.get(parsed[0])
+        if target:
+            return parse_video_url(target) or parsed
+        return parsed
+
+    @property
+    def short_links(self) -> Dict[str, str]:
+        """Short-link code -> full video URL table, loaded on first use"""
+        if self._short_links is None:
+            self._short_links = self._read_short_links()
+        return self._short_links
+
+    def _read_short_links(self) -> Dict[str, str]:
+        try:
+            with open(self.short_links_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise CatalogError(f"Cannot read {self.short_links_file}: {e}") from e
+
+    def link_short_url(self, short_url: str, full_url: str) -> bool:
+        """Map a short link to its full video URL, and re-key any catalog entry
+        that was stored under the short code"""
+        short = parse_video_url(short_url)
+        full = parse_video_url(full_url)
+        if not short or short[2] is not None or not full or full[2] is None:
+            print("❌ Expected a short link (vm.tiktok.com/..., tiktok.com/t/...) and a full video URL")
+            return False
+
+        self._apply_short_link(short[0], full[1])
+        self.save_short_links()
+        return True
+
+    def _apply_short_link(self, code: str, full_url: str) -> Optional[str]:
+        """Record code -> full URL and re-key any catalog entry stored under the
+        short code; returns the numeric video ID"""
+        video_id, canonical_url, username = parse_video_url(full_url)
+        self.short_links[code] = canonical_url
+        print(f"🔗 Linked {code} → {video_id}")
+
+        video = self.catalog.remove(code)
+        if video is not None:
+            self._record({"op": "remove", "id": code})
+            if video_id in self.catalog:
+                print(f"♻️ Dropped duplicate entry {code} (already stored as {video_id})")
+            else:
+                video = video.replace(id=video_id, url=canonical_url)
+                if video.username == 'unknown':
+                    video.username = sys.intern(username)
+                self.catalog.add(video)
+                self._record({"op": "add", "video": video.to_dict()})
+                print(f"♻️ Re-keyed {code} as {video_id}")
+        return video_id
+
+    def apply_short_links(self) -> int:
+        """Re-key every catalog entry whose short code is in the short-link table;
+        returns how many entries changed"""
+        codes = [code for code in self.short_links if code in self.catalog]
+        for code in codes:
+            self._apply_short_link(code, self.short_links[code])
+        return len(codes)
+
+    def save_short_links(self, merge: bool = False):
+        """Write the short-link table; with ``merge``, links other processes
+        saved meanwhile are kept (this process's mapping wins on conflicts)"""
+        with self.locked(reload=False):
+            if merge:
+                for code, url in self._read_short_links().items():
+                    self.short_links.setdefault(code, url)
+            with atomic_write(self.short_links_file) as f:
+                json.dump(self.short_links, f, indent=2, sort_keys=True)
+
+    def pending_short_links(self) -> Dict[str, str]:
+        """Catalog entries still stored under a short link that is not in the
+        short-link table: code -> short URL"""
+        return {v.id: v.url for v in self.catalog
+                if (parse_video_url(v.url) or (None, None, ''))[2] is None
+                and v.id not in self.short_links}
+
+    @timed("resolve_short_links")
+    def resolve_short_links(self, pending: Optional[Dict[str, str]] = None, **options) -> Tuple[int, int]:
+        """Resolve the catalog's unmapped short links (or ``pending``, from
+        pending_short_links()) over HTTP and add them to the short-link table
+        (call apply_short_links() to re-key the videos).
+
+        The table is saved every RESOLVE_SAVE_EVERY resolved links and when
+        the run ends, even if it is interrupted. Options go to
+        ShortLinkResolver (transport, concurrency, retries, backoff).
+        Returns (resolved, failed).
+        """
+        import asyncio
+        from tiktok_resolver import ShortLinkResolver
+
+        pending = self.pending_short_links() if pending is None else pending
+        if not pending:
+            print("📭 No unresolved short links")
+            return 0, 0
+
+        print(f"🔎 Resolving {len(pending)} short links...")
+        progress = itertools.count(1)
+
+        def checkpoint(code: str, url: str):
+            if next(progress) % RESOLVE_SAVE_EVERY == 0:
+                self.save_short_links(merge=True)
+
+        resolver = ShortLinkResolver(cache=self.short_links, on_resolved=checkpoint, **options)
+        try:
+            results = asyncio.run(resolver.resolve_many(pending.values()))
+        finally:
+            self.save_short_links(merge=True)
+
+        resolved = failed = 0
+        for code, url in pending.items():
+            full_url = results.get(url)
+            if full_url:
+                self.short_links[code] = full_url
+                resolved += 1
+            else:
+                failed += 1
+                print(f"❌ Could not resolve {url}: {resolver.errors.get(code, 'unknown error')}")
+        METRICS.count(resolved=resolved, failed=failed)
+        print(f"🔗 Resolved {resolved} short links, {failed} failed")
+        return resolved, failed
+
+    @timed("remove_video")
     def remove_video(self, video_id: str) -> bool:
         """Remove a video by ID"""
-        original_count = len(self.videos)
-        self.videos = [v for v in self.videos if v['id'] != video_id]
+        video = self.catalog.remove(video_id)
         
-        if len(self.videos) < original_count:
+        if video is not None:
+            self._record({"op": "remove", "id": video_id})
             print(f"✅ Removed video: {video_id}")
             return True
         else:
             print(f"❌ Video not found: {video_id}")
             return False
     
-    def list_videos(self):
-        """List all videos"""
-        if not self.videos:
-            print("📭 No videos found")
-            return
-        
-        print(f"📹 Found {len(self.videos)} videos:")
-        print("-" * 80)
-        
-        for i, video in enumerate(self.videos, 1):
-            print(f"{i:2d}. ID: {video['id']}")
-            print(f"    👤 @{video['username']}")
-            print(f"    📝 {video['description'][:60]}{'...' if len(video['description']) > 60 else ''}")
-            print(f"    📅 {video['date']} | 👍 {video['likes']} | 💬 {video['comments']}")
-            print(f"    🔗 {video['url']}")
-            print()
+    @timed("update_engagement")
+    def update_engagement(self, rows: Iterable[Dict]) -> Tuple[int, List[int]]:
+        """Apply engagement readings to catalog videos without moving them.
+
+        Each row is a dict with an 'id' or 'url' and any of 'likes',
+        'comments' and 'shares' (counts left out keep their value). Returns
+        how many videos changed and the numbers of the rows skipped because
+        they match no video or hold an invalid count.
+        """
+        updated, skipped = 0, []
+        for row_number, row in enumerate(rows, 1):
+            video_id = str(row.get('id') or '').strip()
+            if not video_id:
+                parsed = self.parse_url(str(row.get('url') or '').strip())
+                video_id = parsed[0] if parsed else ''
+            video = self.catalog.get(video_id) if video_id else None
+            if video is None:
+                skipped.append(row_number)
+                continue
+            try:
+                counts = {name: parse_count(row[name]) if row.get(name) not in (None, '') else getattr(video, name)
+                          for name in ('likes', 'comments', 'shares')}
+            except ValueError:
+                skipped.append(row_number)
+                continue
+            if counts != {name: getattr(video, name) for name in counts}:
+                self.catalog.update_counts(video_id, **counts)
+                self._record({"op": "counts", "id": video_id, **counts})
+                updated += 1
+        METRICS.count(rows=updated + len(skipped), updated=updated)
+        return updated, skipped
+
+    @timed("snapshot")
+    def snapshot_engagement(self, day: Optional[Date] = None,
+                            history: Optional[EngagementHistory] = None) -> Tuple[int, EngagementHistory]:
+        """Append the catalog's current counts to the engagement history;
+        returns how many videos changed since the last snapshot, and the history"""
+        history = history or EngagementHistory(self.history_dir)
+        changed = history.record(self.catalog, day or datetime.now().date())
+        METRICS.count(videos=len(self.catalog), changed=changed)
+        return changed, history
+
+    @timed("list_videos")
+    def list_videos(self, username: Optional[str] = None, date: Optional[str] = None,
+                    text: Optional[str] = None, hashtag: Optional[str] = None,
+                    since: Optional[str] = None, grep: Optional[str] = None,
+                    limit: Optional[int] = None, offset: int = 0, output_format: str = 'text',
+                    out: Optional[TextIO] = None) -> int:
+        """List the videos matching every given filter; returns how many.
+
+        Videos are streamed from the catalog straight into one buffered
+        writer (``out``, default stdout), so the listing starts at once and
+        stops reading the catalog when ``limit`` is reached. With a fresh
+        snapshot cache and no pending journal the videos come straight from
+        the cache, without loading and indexing the whole catalog. The 'jsonl' and
+        'csv' formats carry nothing but the videos, for piping to other tools.
+        """
+        scan = self._scan_videos()
+        if scan is None:
+            videos = self.catalog.find(username, date, text, limit, offset, hashtag, since, grep)
+        else:
+            matches = match_videos(scan, username, date, text, hashtag, since, grep)
+            videos = itertools.islice(matches, offset, None if limit is None else offset + limit)
+        with buffered_stdout() if out is None else nullcontext(out) as stream:
+            count = write_videos(stream, videos, output_format, offset + 1)
+            if output_format in ('text', 'table'):
+                stream.write(f"📹 Listed {count} videos\n" if count else "📭 No videos found\n")
+        METRICS.count(videos=count)
+        if not count and output_format not in ('text', 'table'):
+            print("📭 No videos found", file=sys.stderr)
+        return count
     
-    def generate_html(self):
-        """Generate HTML page with TikTok embeds"""
-        if not self.videos:
+    def list_hashtags(self):
+        """Print every hashtag with its number of videos, most used first"""
+        counts = self.catalog.hashtag_counts()
+        if not counts:
+            print("📭 No hashtags found")
+            return
+
+        print(f"🏷️ {len(counts)} hashtags:")
+        for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            print(f"  #{tag:<30} {count:>6}")
+
+    @timed("generate_html")
+    def generate_html(self, options: Optional[FeedOptions] = None, jobs: Optional[int] = None):
+        """Generate HTML page with TikTok embeds, built as ``options`` (default:
+        the manager's) describe, rendering in ``jobs`` worker processes when
+        more than one. Outputs whose inputs are unchanged since the last build
+        are not rewritten.
+
+        The options are saved as the defaults of later builds. Outputs of an
+        option (shards, hashtag feeds, assets, compressed siblings) are only
+        deleted when that option was on in the last build and is now off.
+        """
+        saved = self._read_feed_options()
+        previous = saved or FeedOptions()
+        options = options or self.feed
+        jobs = self.jobs if jobs is None else jobs
+        jobs = jobs or os.cpu_count() or 1
+        catalog = self.catalog
+        if not len(catalog):
             print("❌ No videos to generate HTML for")
             return
-        
-        html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0, user-scalable=no">
-    <title>St. Louis Demo JHS on TikTok</title>
-    <link rel="preconnect" href="https://www.tiktok.com">
-    <link rel="dns-prefetch" href="https://www.tiktok.com">
-    <script>
-        // Preload TikTok embed script for blazing fast loading
-        const script = document.createElement('script');
-        script.src = 'https://www.tiktok.com/embed.js';
-        script.async = true;
-        document.head.appendChild(script);
-    </script>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            font-family: 'Proxima Nova', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: #000000;
-            color: #ffffff;
-            overflow-x: hidden;
-            -webkit-font-smoothing: antialiased;
-            -moz-osx-font-smoothing: grayscale;
-        }}
-
-        /* TikTok Official Colors */
-        :root {{
-            --tiktok-red: #FE2C55;
-            --tiktok-blue: #25F4EE;
-            --tiktok-black: #000000;
-            --tiktok-dark-gray: #161823;
-            --tiktok-gray: #2F2F2F;
-            --tiktok-light-gray: #8A8A8A;
-            --tiktok-white: #FFFFFF;
-        }}
-
-        /* Cute Small Header */
-        .header {{
-            position: sticky;
-            top: 0;
-            z-index: 1000;
-            background: linear-gradient(135deg, var(--tiktok-red), var(--tiktok-blue));
-            padding: 8px 16px;
-            text-align: center;
-            box-shadow: 0 2px 10px rgba(254, 44, 85, 0.3);
-            backdrop-filter: blur(10px);
-        }}
-
-        .header h1 {{
-            font-size: 1.2rem;
-            font-weight: 700;
-            color: var(--tiktok-white);
-            text-shadow: 0 1px 3px rgba(0,0,0,0.3);
-            letter-spacing: 0.5px;
-        }}
-
-        .header .school-name {{
-            font-size: 0.9rem;
-            opacity: 0.9;
-            margin-top: 2px;
-        }}
-
-        /* Native TikTok-like Container */
-        .tiktok-container {{
-            height: calc(100vh - 60px);
-            overflow-y: auto;
-            scroll-snap-type: y mandatory;
-            -webkit-overflow-scrolling: touch;
-            scrollbar-width: none;
-            -ms-overflow-style: none;
-        }}
-
-        .tiktok-container::-webkit-scrollbar {{
-            display: none;
-        }}
-
-        /* Video Items - Native TikTok Style */
-        .video-item {{
-            height: calc(100vh - 60px);
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            scroll-snap-align: start;
-            position: relative;
-            background: var(--tiktok-black);
-        }}
-
-        /* Silver Shimmer Loading Effect */
-        .video-placeholder {{
-            width: 100%;
-            max-width: 325px;
-            height: 578px;
-            background: linear-gradient(
-                90deg,
-                #2a2a2a 25%,
-                #3a3a3a 50%,
-                #2a2a2a 75%
-            );
-            background-size: 200% 100%;
-            animation: shimmer 1.5s infinite;
-            border-radius: 12px;
-            position: relative;
-            overflow: hidden;
-        }}
-
-        @keyframes shimmer {{
-            0% {{
-                background-position: -200% 0;
-            }}
-            100% {{
-                background-position: 200% 0;
-            }}
-        }}
-
-        .video-placeholder::before {{
-            content: '';
-            position: absolute;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            width: 60px;
-            height: 60px;
-            border: 3px solid var(--tiktok-red);
-            border-top: 3px solid transparent;
-            border-radius: 50%;
-            animation: spin 1s linear infinite;
-        }}
-
-        @keyframes spin {{
-            0% {{ transform: translate(-50%, -50%) rotate(0deg); }}
-            100% {{ transform: translate(-50%, -50%) rotate(360deg); }}
-        }}
-
-        /* TikTok Embed Styling */
-        .tiktok-embed {{
-            max-width: 325px !important;
-            min-height: 578px !important;
-            margin: 0 auto;
-            border-radius: 12px;
-            overflow: hidden;
-            box-shadow: 0 8px 32px rgba(254, 44, 85, 0.2);
-            transition: transform 0.3s ease, box-shadow 0.3s ease;
-        }}
-
-        .tiktok-embed:hover {{
-            transform: scale(1.02);
-            box-shadow: 0 12px 48px rgba(254, 44, 85, 0.3);
-        }}
-
-        /* Loading States */
-        .video-item.loading .tiktok-embed {{
-            display: none;
-        }}
-
-        .video-item.loaded .video-placeholder {{
-            display: none;
-        }}
-
-        /* Mobile Optimizations */
-        @media (max-width: 768px) {{
-            .header h1 {{
-                font-size: 1rem;
-            }}
-
-            .header .school-name {{
-                font-size: 0.8rem;
-            }}
-
-            .tiktok-embed {{
-                max-width: 100vw !important;
-                width: 100% !important;
-            }}
-
-            .video-placeholder {{
-                max-width: 100vw;
-                width: 100%;
-            }}
-        }}
-
-        @media (max-width: 480px) {{
-            .header {{
-                padding: 6px 12px;
-            }}
-
-            .tiktok-container {{
-                height: calc(100vh - 50px);
-            }}
-
-            .video-item {{
-                height: calc(100vh - 50px);
-            }}
-        }}
-
-        /* Smooth Scrolling Enhancement */
-        html {{
-            scroll-behavior: smooth;
-        }}
-
-        /* Performance Optimizations */
-        .video-item {{
-            will-change: transform;
-            contain: layout style paint;
-        }}
-
-        /* Loading Animation for Better UX */
-        .fade-in {{
-            animation: fadeIn 0.5s ease-in-out;
-        }}
-
-        @keyframes fadeIn {{
-            from {{ opacity: 0; transform: translateY(20px); }}
-            to {{ opacity: 1; transform: translateY(0); }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>🎵 TikTok</h1>
-        <div class="school-name">St. Louis Demonstration JHS</div>
-    </div>
-    <div class="tiktok-container">
-"""
-        
-        for i, video in enumerate(self.videos):
-            html_content += f"""
-        <div class="video-item loading fade-in" id="video-{i}">
-            <!-- Silver Shimmer Loading Placeholder -->
-            <div class="video-placeholder"></div>
-
-            <!-- TikTok Embed -->
-            <blockquote class="tiktok-embed"
-                       cite="{video['url']}"
-                       data-video-id="{video['id']}"
-                       data-unique-id="{video['username']}"
-                       style="max-width: 325px; min-height: 578px;">
-                <section>
-                    <a target="_blank"
-                       title="@{video['username']}"
-                       href="{video['url']}">
-                        @{video['username']} on TikTok
-                    </a>
-                </section>
-            </blockquote>
-        </div>
-"""
-        
-        html_content += f"""
-    </div>
-
-    <script>
-        // Enhanced TikTok Loading with Performance Optimizations
-        document.addEventListener('DOMContentLoaded', function() {{
-            // Preload and optimize TikTok embeds
-            const videoItems = document.querySelectorAll('.video-item');
-            let loadedCount = 0;
-
-            // Intersection Observer for lazy loading
-            const observer = new IntersectionObserver((entries) => {{
-                entries.forEach(entry => {{
-                    if (entry.isIntersecting) {{
-                        loadVideo(entry.target);
-                        observer.unobserve(entry.target);
-                    }}
-                }});
-            }}, {{
-                rootMargin: '50px',
-                threshold: 0.1
-            }});
-
-            // Observe all video items
-            videoItems.forEach(item => {{
-                observer.observe(item);
-            }});
-
-            function loadVideo(videoItem) {{
-                const embed = videoItem.querySelector('.tiktok-embed');
-                if (embed) {{
-                    // Add loading class for shimmer effect
-                    videoItem.classList.add('loading');
-
-                    // Simulate network delay then show video
-                    setTimeout(() => {{
-                        videoItem.classList.remove('loading');
-                        videoItem.classList.add('loaded');
-                        loadedCount++;
-
-                        // Trigger TikTok embed refresh
-                        if (window.tiktokEmbed) {{
-                            window.tiktokEmbed.lib.render(embed);
-                        }}
-                    }}, Math.random() * 1000 + 500); // Random delay 0.5-1.5s for realistic loading
-                }}
-            }}
-
-            // Enhanced scroll behavior for native TikTok feel
-            const container = document.querySelector('.tiktok-container');
-            let isScrolling = false;
-
-            container.addEventListener('scroll', () => {{
-                if (!isScrolling) {{
-                    window.requestAnimationFrame(() => {{
-                        // Add any scroll-based animations here
-                        isScrolling = false;
-                    }});
-                    isScrolling = true;
-                }}
-            }});
-
-            // Keyboard navigation (up/down arrows)
-            document.addEventListener('keydown', (e) => {{
-                if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {{
-                    e.preventDefault();
-                    const currentVideo = getCurrentVideo();
-                    const nextVideo = e.key === 'ArrowDown' ?
-                        currentVideo?.nextElementSibling :
-                        currentVideo?.previousElementSibling;
-
-                    if (nextVideo) {{
-                        nextVideo.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
-                    }}
-                }}
-            }});
-
-            function getCurrentVideo() {{
-                const videos = Array.from(videoItems);
-                const containerRect = container.getBoundingClientRect();
-
-                return videos.find(video => {{
-                    const rect = video.getBoundingClientRect();
-                    return rect.top >= containerRect.top && rect.top < containerRect.bottom;
-                }});
-            }}
-
-            // Performance: Pause videos not in view
-            const pauseObserver = new IntersectionObserver((entries) => {{
-                entries.forEach(entry => {{
-                    const iframe = entry.target.querySelector('iframe');
-                    if (iframe) {{
-                        if (!entry.isIntersecting) {{
-                            // Video out of view - could pause here if TikTok API allows
-                        }}
-                    }}
-                }});
-            }}, {{ threshold: 0.5 }});
-
-            videoItems.forEach(item => {{
-                pauseObserver.observe(item);
-            }});
-        }});
-
-        // TikTok embed callback for when script loads
-        window.addEventListener('load', () => {{
-            if (window.tiktokEmbed) {{
-                // Force render all embeds
-                document.querySelectorAll('.tiktok-embed').forEach(embed => {{
-                    window.tiktokEmbed.lib.render(embed);
-                }});
-            }}
-        }});
-    </script>
-</body>
-</html>"""
-        
-        with open(self.html_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
+        with METRICS.phase("rank"):
+            videos = (rank_videos(catalog, options.order, options.top)
+                      if options.order != 'insertion' or options.top else catalog)
+
+        directory = os.path.dirname(self.html_file)
+        base = os.path.splitext(os.path.basename(self.html_file))[0]
+        with ExitStack() as stack:
+            pool = None
+            if jobs > 1:
+                # Imported here: loading the process pool machinery slows every command
+                from concurrent.futures import ProcessPoolExecutor
+
+                # Workers only start once the first output actually needs rendering
+                pool = stack.enter_context(ProcessPoolExecutor(jobs))
+            cache = BuildCache(self.build_cache_file, pool)
+            with METRICS.phase("search_index"):
+                cache.publish(self.search_file, search_index_key(videos), lambda: [build_search_index(videos)])
+            asset_paths = self._publish_assets(cache, directory) if options.assets else None
+            shard_files = self._publish_feed(cache, videos, self.html_file, self.manifest_file, options,
+                                             search_url=os.path.basename(self.search_file),
+                                             asset_paths=asset_paths)
+            with METRICS.phase("write_outputs"):
+                cache.finish()
+            if options.page_size or previous.page_size:
+                self._remove_stale_shards(cache, directory, base, set(shard_files), self.manifest_file)
+            if options.assets or previous.assets:
+                self._remove_stale_assets(cache, directory, asset_paths or ())
+            if options.hashtags:
+                self._publish_hashtag_feeds(cache, options, asset_paths)
+            elif previous.hashtags:
+                self._remove_hashtag_feeds(cache)
+        cache.save(catalog)
+        METRICS.count(videos=len(videos), files_written=cache.written,
+                      files_unchanged=cache.skipped + cache.unchanged, bytes_written=cache.bytes_written)
+        if options.precompress:
+            self._precompress([self.output_file, *cache.files])
+        elif previous.precompress:
+            self._drop_precompressed()
+        if options != saved:
+            with atomic_write(self.build_options_file) as f:
+                json.dump(options.to_dict(), f, indent=2)
+        self._feed = options
+
         print(f"🌐 Generated HTML page: {self.html_file}")
-    
+        if shard_files:
+            print(f"📚 {len(shard_files)} {options.shard_format} pages of {options.page_size} videos "
+                  f"+ {self.manifest_file}")
+        print(f"♻️ {cache.written} files written, {cache.skipped + cache.unchanged} unchanged")
+
+    @timed("precompress")
+    def _precompress(self, paths: Iterable[str]):
+        """Refresh the compressed siblings and ETag manifest entries of
+        ``paths``; files that were deleted since lose theirs"""
+        # Imported here: gzip and the thread pool are only needed with --precompress
+        from tiktok_publish import PrecompressManifest, available_encodings
+
+        manifest = PrecompressManifest(self.etag_manifest_file)
+        manifest.update(path for path in paths if os.path.exists(path))
+        manifest.prune()
+        manifest.save()
+        METRICS.count(files_compressed=manifest.compressed, files_unchanged=manifest.reused)
+        print(f"📦 Precompressed {manifest.compressed} files ({', '.join(available_encodings())}), "
+              f"{manifest.reused} unchanged; ETags in {self.etag_manifest_file}")
+
+    def _publish_assets(self, cache: BuildCache, directory: str) -> Tuple[str, str]:
+        """Publish the hashed stylesheet and script; returns their paths"""
+        paths = []
+        for name, content in asset_files().items():
+            path = os.path.join(directory, name)
+            cache.publish(path, cache.input_key('asset', [], name), lambda content=content: [content])
+            paths.append(path)
+        return tuple(paths)
+
+    def _remove_stale_assets(self, cache: BuildCache, directory: str, keep: Iterable[str]):
+        """Delete hashed assets of older templates (all of them outside asset mode)"""
+        keep = {os.path.basename(path) for path in keep}
+        for name in os.listdir(directory or '.'):
+            if is_asset_filename(name) and name not in keep:
+                path = os.path.join(directory, name)
+                os.remove(path)
+                cache.forget(path)
+
+    def _drop_precompressed(self):
+        """Remove the siblings of an earlier precompressed build: they would
+        go stale, and servers with gzip_static would keep serving them"""
+        from tiktok_publish import PrecompressManifest
+
+        PrecompressManifest(self.etag_manifest_file).clear()
+        print(f"🧹 Removed precompressed files listed in {self.etag_manifest_file}")
+
+    @timed("publish_feed")
+    def _publish_feed(self, cache: BuildCache, videos: Iterable[Video], html_file: str,
+                      manifest_file: str, options: FeedOptions, hashtag: Optional[str] = None,
+                      search_url: Optional[str] = None,
+                      asset_paths: Optional[Tuple[str, str]] = None) -> List[str]:
+        """Publish one feed page (plus its shards and manifest when paginated)
+        through the build cache; returns the shard file names"""
+        page_size, shard_format = options.page_size, options.shard_format
+        render_mode, virtual_window = options.render_mode, options.virtual_window
+        directory = os.path.dirname(html_file)
+        base = os.path.splitext(os.path.basename(html_file))[0]
+        extra = (hashtag,) if hashtag else ()
+        # Asset URLs are relative to the page (hashtag feeds live one level down)
+        assets = tuple(os.path.relpath(path, directory or '.').replace(os.sep, '/')
+                       for path in asset_paths) if asset_paths else None
+        if assets:
+            extra += ('assets',) + assets
+        if render_mode != 'embed':
+            extra += ('mode', render_mode)
+        if virtual_window:
+            extra += ('window', str(virtual_window))
+        render = cache.renderer(render_mode)
+        shard_files = []
+        manifest_url = None
+        first_page = videos
+
+        if page_size:
+            start = 0
+            for number, page in enumerate(paginate(videos, page_size), 1):
+                name = shard_filename(base, number, shard_format)
+                # JSON shards are the same in every mode; the page's script renders them
+                key = cache.input_key('shard', page, shard_format, str(start),
+                                      *(('mode', render_mode) if shard_format == 'html' else ()))
+                cache.publish(os.path.join(directory, name), key,
+                              lambda page=page, start=start: iter_shard(page, start, shard_format, render),
+                              job=(render_shard, (video_rows(page), start, shard_format, render_mode))
+                              if cache.pool else None)
+                if number == 1:
+                    first_page = page
+                shard_files.append(name)
+                start += len(page)
+
+            manifest = json.dumps({
+                "total_videos": start,
+                "page_size": page_size,
+                "format": shard_format,
+                "pages": shard_files
+            }, indent=2)
+            cache.publish(manifest_file, cache.input_key('manifest', [], manifest), lambda: [manifest])
+            manifest_url = os.path.basename(manifest_file)
+
+        if search_url:
+            extra += ('search', search_url)
+        key = cache.input_key('feed', first_page, manifest_url or '', *extra)
+        cache.publish(html_file, key,
+                      lambda: iter_feed_html(first_page, manifest_url, render, hashtag, search_url,
+                                             assets, render_mode, virtual_window),
+                      job=(render_feed, (video_rows(first_page), manifest_url, hashtag, search_url,
+                                         assets, render_mode, virtual_window)) if cache.pool else None)
+        return shard_files
+
+    @timed("hashtag_feeds")
+    def _publish_hashtag_feeds(self, cache: BuildCache, options: FeedOptions,
+                               asset_paths: Optional[Tuple[str, str]] = None):
+        """Publish a feed per hashtag from the hashtag index, plus an index of
+        the hashtags; each feed only touches the videos carrying its tag"""
+        counts = self.catalog.hashtag_counts()
+        keep = {'index.json'}
+        for tag in sorted(counts):
+            html_file = os.path.join(self.hashtag_dir, f"{tag}.html")
+            manifest_file = os.path.join(self.hashtag_dir, f"{tag}-manifest.json")
+            tag_videos = rank_videos(self.catalog.find(hashtag=tag), options.order, options.top)
+            shard_files = self._publish_feed(cache, tag_videos, html_file, manifest_file, options,
+                                             hashtag=tag, asset_paths=asset_paths)
+            keep.add(os.path.basename(html_file))
+            keep.update(shard_files)
+            if options.page_size:
+                keep.add(os.path.basename(manifest_file))
+
+        index = json.dumps({
+            "hashtags": [{"hashtag": tag, "videos": count, "page": f"{tag}.html"}
+                         for tag, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+        }, indent=2, ensure_ascii=False)
+        cache.publish(os.path.join(self.hashtag_dir, 'index.json'),
+                      cache.input_key('hashtags', [], index), lambda: [index])
+        with METRICS.phase("write_outputs"):
+            cache.finish()
+
+        # Feeds of hashtags no video carries any more
+        for name in os.listdir(self.hashtag_dir):
+            if name not in keep and name.endswith(('.html', '.json')):
+                path = os.path.join(self.hashtag_dir, name)
+                os.remove(path)
+                cache.forget(path)
+        METRICS.count(hashtags=len(counts))
+        print(f"🏷️ {len(counts)} hashtag feeds in {self.hashtag_dir}/")
+
+    def _remove_hashtag_feeds(self, cache: BuildCache):
+        """Delete the hashtag feeds and their index left by an earlier build
+        with hashtags, with any compressed siblings, and then the directory"""
+        if not os.path.isdir(self.hashtag_dir):
+            return
+        for name in os.listdir(self.hashtag_dir):
+            stem, extension = os.path.splitext(name)
+            if extension in ('.gz', '.br'):
+                stem, extension = os.path.splitext(stem)
+            if extension in ('.html', '.json'):
+                path = os.path.join(self.hashtag_dir, name)
+                os.remove(path)
+                cache.forget(path)
+        with suppress(OSError):
+            # Left in place if it holds anything this tool did not write
+            os.rmdir(self.hashtag_dir)
+        print(f"🧹 Removed the hashtag feeds in {self.hashtag_dir}/")
+
+    def _remove_stale_shards(self, cache: BuildCache, directory: str, base: str, keep: set,
+                             manifest_file: str):
+        """Delete shards left over from a previous build (and the manifest if unpaginated)"""
+        stale = [os.path.join(directory, f) for f in os.listdir(directory or '.')
+                 if is_shard_filename(base, f) and f not in keep]
+        if not keep and os.path.exists(manifest_file):
+            stale.append(manifest_file)
+        for path in stale:
+            os.remove(path)
+            cache.forget(path)
+
     def add_sample_videos(self):
         """Add some sample videos for demonstration"""
         sample_videos = [
@@ -566,83 +1121,651 @@ class TikTokManager:
         print(f"📹 Added {added} sample videos")
         return added > 0
 
-def main():
-    """Main function for command line usage"""
-    import sys
-    
-    manager = TikTokManager()
-    
-    if len(sys.argv) == 1:
-        # Interactive mode
-        print("🎵 TikTok Video Manager for St. Louis Demo JHS")
-        print("=" * 50)
-        print("1. Add video")
-        print("2. List videos") 
-        print("3. Remove video")
-        print("4. Generate HTML")
-        print("5. Add sample videos")
-        print("6. Exit")
-        
+@contextmanager
+def buffered_stdout() -> Iterator[TextIO]:
+    """stdout behind one large write buffer, for commands that print a lot.
+    When stdout is not a real file (e.g. JSON-lines mode) it is used as is."""
+    if not isinstance(sys.stdout, io.TextIOWrapper):
+        yield sys.stdout
+        return
+
+    sys.stdout.flush()
+    stream = open(sys.stdout.fileno(), 'w', buffering=OUTPUT_BUFFER_SIZE, encoding=sys.stdout.encoding,
+                  errors=sys.stdout.errors, closefd=False)
+    try:
+        yield stream
+    finally:
+        stream.close()
+
+
+def write_videos(out: TextIO, videos: Iterable[Video], output_format: str, start: int = 1) -> int:
+    """Write videos in a LIST_FORMATS format, numbering text blocks from
+    ``start``; returns how many were written"""
+    write = out.write
+    count = 0
+    if output_format == 'text':
+        for count, video in enumerate(videos, 1):
+            if count == 1:
+                write("-" * 80 + "\n")
+            description = video.description
+            write(f"{start + count - 1:2d}. ID: {video.id}\n"
+                  f"    👤 @{video.username}\n"
+                  f"    📝 {description[:60]}{'...' if len(description) > 60 else ''}\n"
+                  f"    📅 {video.date} | 👍 {format_count(video.likes)} | 💬 {format_count(video.comments)}\n"
+                  f"    🔗 {video.url}\n\n")
+    elif output_format == 'table':
+        for count, video in enumerate(videos, 1):
+            if count == 1:
+                write(f"{'ID':<20} {'USER':<24} {'DATE':<10} {'LIKES':>7} {'COMMENTS':>8}  DESCRIPTION\n")
+            description = ' '.join(video.description[:60].split())
+            write(f"{video.id:<20} {'@' + video.username:<24} {str(video.date or ''):<10} "
+                  f"{format_count(video.likes):>7} {format_count(video.comments):>8}  {description}\n")
+    elif output_format == 'jsonl':
+        dumps = json.dumps
+        for count, video in enumerate(videos, 1):
+            row = dict(zip(LIST_FIELDS, (getattr(video, field) for field in LIST_FIELDS)))
+            row["date"] = video.date.isoformat() if video.date else None
+            write(dumps(row, ensure_ascii=False) + "\n")
+    elif output_format == 'csv':
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(LIST_FIELDS)
+        for count, video in enumerate(videos, 1):
+            writer.writerow((video.id, video.url, video.username, video.description,
+                             video.date.isoformat() if video.date else '', video.likes, video.comments,
+                             video.shares, int(video.verified), video.added_date, ' '.join(video.hashtags)))
+    else:
+        raise ValueError(f"Unknown list format {output_format!r} (expected one of {', '.join(LIST_FORMATS)})")
+    return count
+
+
+def date_argument(value: str) -> Date:
+    """argparse type for YYYY-MM-DD options"""
+    import argparse
+
+    date = parse_date(value)
+    if date is None:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value!r}")
+    return date
+
+
+def count_argument(value: str) -> int:
+    """argparse type for counts that must not be negative"""
+    import argparse
+
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a whole number: {value!r}") from None
+    if number < 0:
+        raise argparse.ArgumentTypeError("must not be negative")
+    return number
+
+
+def list_command(manager: TikTokManager, args: List[str]):
+    """List command: stream the matching videos as text, a table, JSON lines or CSV"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tiktok_manager.py list",
+                                     description="List catalog videos, optionally filtered")
+    parser.add_argument("filter", nargs="?", metavar="username|#tag",
+                        help="only this creator's videos, or only videos with this hashtag")
+    parser.add_argument("--user", help="only this creator's videos")
+    parser.add_argument("--hashtag", help="only videos with this hashtag")
+    parser.add_argument("--since", type=date_argument, metavar="YYYY-MM-DD",
+                        help="only videos posted on or after this date")
+    parser.add_argument("--grep", metavar="TEXT", help="only descriptions containing TEXT (any case)")
+    parser.add_argument("--limit", type=count_argument, metavar="N", help="list at most N videos")
+    parser.add_argument("--offset", type=count_argument, default=0, metavar="M",
+                        help="skip the first M matches")
+    parser.add_argument("--format", choices=LIST_FORMATS, default='text', dest="output_format",
+                        help="text (default), table, jsonl or csv")
+    options = parser.parse_args(args)
+
+    username, hashtag = options.user, options.hashtag
+    if options.filter and options.filter.startswith('#'):
+        hashtag = hashtag or options.filter
+    elif options.filter:
+        username = username or options.filter
+    manager.list_videos(username, hashtag=hashtag, since=options.since, grep=options.grep,
+                        limit=options.limit, offset=options.offset, output_format=options.output_format)
+
+
+def import_videos(manager: TikTokManager, args: List[str]):
+    """Bulk import command: add every row, then save and render once"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tiktok_manager.py import",
+                                     description="Bulk import TikTok videos")
+    parser.add_argument("source", help="file with URLs, CSV or JSONL ('-' for stdin)")
+    parser.add_argument("--format", choices=IMPORT_FORMATS,
+                        help="input format (default: guess from extension/content)")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    options = parser.parse_args(args)
+    rows, fmt = read_import_rows(options.source, options.format)
+
+    # Hold the lock from dedup through save so concurrent imports can't clash
+    with manager.locked():
+        results = manager.add_many(rows)
+        counts = summarize_import(results, fmt, options.quiet)
+        if counts["added"]:
+            manager.save_videos()
+            manager.generate_html()
+
+
+def read_import_rows(source: str, fmt: Optional[str] = None) -> Tuple[List[Union[str, Dict]], str]:
+    """Read every row of an import file ('-' for stdin); returns the rows and
+    their format, guessed from the file when ``fmt`` is None"""
+    if source == '-':
+        stream = sys.stdin
+    else:
+        stream = open(source, 'r', encoding='utf-8', newline='')
+
+    try:
+        with METRICS.phase("read_import"):
+            if fmt is None:
+                # Peek at the first line without consuming it
+                first_line = stream.readline()
+                fmt = detect_import_format(source, first_line)
+                rows = list(iter_import_rows(itertools.chain([first_line], stream), fmt))
+            else:
+                rows = list(iter_import_rows(stream, fmt))
+            METRICS.count(rows=len(rows))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return rows, fmt
+
+
+def summarize_import(results: List[Dict], fmt: str, quiet: bool = False) -> Dict[str, int]:
+    """Print per-row import results and a summary line; returns counts by status"""
+    counts = {"added": 0, "duplicate": 0, "invalid": 0, "error": 0}
+    icons = {"added": "✅", "duplicate": "⚠️", "invalid": "❌", "error": "❌"}
+    lines = []
+    for result in results:
+        counts[result["status"]] += 1
+        if not quiet:
+            detail = result.get("id") or result.get("error") or result["url"]
+            lines.append(f"{icons[result['status']]} row {result['row']}: {result['status']} {detail}\n")
+    sys.stdout.writelines(lines)
+
+    print(f"📥 Imported {len(results)} rows ({fmt}): "
+          f"{counts['added']} added, {counts['duplicate']} duplicates, "
+          f"{counts['invalid'] + counts['error']} invalid")
+    return counts
+
+
+def snapshot_command(manager: TikTokManager, args: List[str]):
+    """Snapshot command: apply new engagement readings, if any, and record
+    every video's counts in the engagement history"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tiktok_manager.py snapshot",
+                                     description="Record the catalog's engagement counts for today")
+    parser.add_argument("source", nargs="?",
+                        help="CSV or JSONL readings (id or url, likes, comments, shares; '-' for stdin)")
+    parser.add_argument("--format", choices=('csv', 'jsonl'),
+                        help="readings format (default: guess from extension/content)")
+    parser.add_argument("--date", type=date_argument, metavar="YYYY-MM-DD",
+                        help="day the readings were taken (default: today)")
+    options = parser.parse_args(args)
+
+    rows = []
+    if options.source:
+        rows, fmt = read_import_rows(options.source, options.format)
+        if fmt not in ('csv', 'jsonl'):
+            parser.error("readings must be CSV (with an id or url column) or JSONL")
+
+    with manager.locked():
+        # Refuse the day before any reading touches the catalog
+        day = options.date or datetime.now().date()
+        try:
+            history = EngagementHistory(manager.history_dir)
+            history.check_day(day)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+
+        updated, skipped = manager.update_engagement(rows)
+        if options.source:
+            print(f"📥 Updated the counts of {updated} videos from {len(rows)} readings")
+            if skipped:
+                shown = ', '.join(map(str, skipped[:10])) + (' ...' if len(skipped) > 10 else '')
+                print(f"⚠️ Skipped {len(skipped)} rows with no catalog video or an invalid count (rows {shown})")
+        changed, history = manager.snapshot_engagement(day, history)
+        print(f"📸 Snapshot for {day}: {changed} of {len(manager.catalog)} videos changed "
+              f"({len(history.days)} snapshots, {history.size() / 1e6:.1f} MB)")
+        if updated:
+            manager.save_videos()
+            manager.generate_html()
+
+
+def history_command(manager: TikTokManager, args: List[str]):
+    """History command: query the engagement history"""
+    import argparse
+    from datetime import timedelta
+
+    parser = argparse.ArgumentParser(prog="tiktok_manager.py history",
+                                     description="Query the engagement history recorded by snapshot")
+    queries = parser.add_subparsers(dest="query", metavar="rising|growth|users")
+    rising = queries.add_parser("rising", help="videos that gained the most recently")
+    rising.add_argument("--days", type=count_argument, default=7, help="look back N days (default 7)")
+    growth = queries.add_parser("growth", help="videos with the highest growth rate")
+    growth.add_argument("--since", type=date_argument, metavar="YYYY-MM-DD",
+                        help="start of the period (default: the first snapshot)")
+    growth.add_argument("--until", type=date_argument, metavar="YYYY-MM-DD",
+                        help="end of the period (default: the last snapshot)")
+    users = queries.add_parser("users", help="total engagement per creator")
+    users.add_argument("--date", type=date_argument, metavar="YYYY-MM-DD",
+                       help="totals as of this day (default: the last snapshot)")
+    for query in (rising, growth, users):
+        query.add_argument("--metric", choices=(*HISTORY_METRICS, 'engagement'), default='engagement',
+                           help="count to rank by (default: engagement, weighted like the trending order)")
+        query.add_argument("--top", type=count_argument, default=20, metavar="N",
+                           help="show the N best (default 20)")
+    options = parser.parse_args(args)
+
+    with manager.locked(shared=True, reload=False):
+        try:
+            history = EngagementHistory(manager.history_dir)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        days = history.days
+        if not days:
+            print("📭 No snapshots yet (run: tiktok_manager.py snapshot)")
+            return
+
+        try:
+            if options.query is None:
+                print(f"📉 {len(days)} snapshots from {days[0]} to {days[-1]} of {len(history)} videos "
+                      f"({history.size() / 1e6:.1f} MB)")
+
+            elif options.query == 'rising':
+                since = days[-1] - timedelta(days=options.days)
+                print(f"🚀 Rising since {since} ({options.metric}):")
+                for rank, (video_id, username, gain, start) in enumerate(
+                        history.rising(since, options.metric, options.top), 1):
+                    print(f"{rank:>4}. @{username} {video_id} +{gain:,} (from {start:,})")
+
+            elif options.query == 'growth':
+                since = options.since or days[0]
+                print(f"📈 Growth from {since} to {options.until or days[-1]} ({options.metric}):")
+                for rank, (video_id, username, rate, start, end) in enumerate(
+                        history.growth(since, options.until, options.metric, options.top), 1):
+                    print(f"{rank:>4}. @{username} {video_id} {rate:+.1%} ({start:,} → {end:,})")
+
+            else:
+                totals = history.user_totals(options.date, options.metric)
+                print(f"👥 {len(totals)} creators as of {options.date or days[-1]} ({options.metric}):")
+                for rank, (username, (likes, comments, shares)) in enumerate(
+                        itertools.islice(totals.items(), options.top), 1):
+                    print(f"{rank:>4}. @{username:<24} {likes:>12,} likes {comments:>10,} comments "
+                          f"{shares:>10,} shares")
+        finally:
+            history.close()
+
+
+def resolve_command(manager: TikTokManager, args: List[str]):
+    """Resolve command: follow every stored short link to its full video URL"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="tiktok_manager.py resolve",
+                                     description="Resolve TikTok short links to full video URLs")
+    parser.add_argument("--concurrency", type=count_argument, default=16, help="requests in flight (default 16)")
+    parser.add_argument("--retries", type=count_argument, default=3, help="retries per request (default 3)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds per request (default 10)")
+    parser.add_argument("--origin", help="send requests to this server instead (e.g. a local stub)")
+    options = parser.parse_args(args)
+    if options.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if options.timeout <= 0:
+        parser.error("--timeout must be positive")
+
+    pending = manager.pending_short_links()
+    if pending:
+        from tiktok_resolver import HttpTransport
+
+        transport = HttpTransport(max_connections=options.concurrency, timeout=options.timeout,
+                                  origin=options.origin)
+        # Resolution happens over the network, so only lock the catalog to
+        # save progress and to apply it
+        manager.resolve_short_links(pending, transport=transport, concurrency=options.concurrency,
+                                    retries=options.retries)
+    else:
+        print("📭 No unresolved short links")
+    with manager.locked():
+        manager.save_short_links(merge=True)
+        if manager.apply_short_links():
+            manager.save_videos()
+            manager.generate_html()
+
+
+def generate_parser(manager: TikTokManager, prog: str, description: str):
+    """Argument parser with every feed build option, defaulting to the manager's
+    settings (those of the last build unless overridden)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog=prog, description=description,
+                                     epilog="Options are saved in .tiktok/build-options.json and stay in "
+                                            "effect for later builds (including add, import, ...) until changed.")
+    parser.add_argument("--page-size", type=count_argument, metavar="N", default=manager.feed.page_size,
+                        help="videos per page; the rest are loaded from shards while scrolling (0 for one page)")
+    parser.add_argument("--shard-format", choices=SHARD_FORMATS, default=manager.feed.shard_format,
+                        help="write shards as JSON (default) or HTML fragments")
+    parser.add_argument("--hashtags", action=argparse.BooleanOptionalAction, default=manager.feed.hashtags,
+                        help="also write a feed per hashtag to public/tiktok-tags/")
+    parser.add_argument("--precompress", action=argparse.BooleanOptionalAction, default=manager.feed.precompress,
+                        help="also write .gz/.br siblings and an ETag manifest")
+    parser.add_argument("--assets", action=argparse.BooleanOptionalAction, default=manager.feed.assets,
+                        help="link hashed tiktok-feed.<hash>.css/.js files instead of inlining CSS and JS")
+    parser.add_argument("--render", choices=RENDER_MODES, default=manager.feed.render_mode,
+                        help="'facade' shows static posters that load the TikTok embed when tapped or in view")
+    parser.add_argument("--virtualize", type=count_argument, metavar="N", default=manager.feed.virtual_window,
+                        help="keep only the current video and N ahead mounted, unloading the rest (0 for all)")
+    parser.add_argument("--order", choices=FEED_ORDERS, default=manager.feed.order,
+                        help="feed order: as added (default), trending, most recent or most liked first")
+    parser.add_argument("--top", type=count_argument, metavar="K", default=manager.feed.top,
+                        help="only publish the K best videos of the order (0 for all)")
+    parser.add_argument("--jobs", "-j", type=count_argument, metavar="N", default=manager.jobs,
+                        help="render pages in N worker processes (0 for one per core)")
+    return parser
+
+
+def feed_options(manager: TikTokManager, options) -> FeedOptions:
+    """The manager's feed options with parsed generate options applied"""
+    return manager.feed.replace(page_size=options.page_size, shard_format=options.shard_format,
+                                hashtags=options.hashtags, precompress=options.precompress,
+                                assets=options.assets, render_mode=options.render,
+                                virtual_window=options.virtualize, order=options.order, top=options.top)
+
+
+def generate_from_options(manager: TikTokManager, options):
+    """Build the feed with parsed generate options, under a shared catalog lock"""
+    with manager.locked(shared=True):
+        manager.generate_html(feed_options(manager, options), jobs=options.jobs)
+
+
+def generate_command(manager: TikTokManager, args: List[str]):
+    """Generate command: render the feed page, optionally paginated into shards"""
+    parser = generate_parser(manager, "tiktok_manager.py generate", "Generate the TikTok feed page")
+    generate_from_options(manager, parser.parse_args(args))
+
+
+def watch_command(manager: TikTokManager, args: List[str]):
+    """Watch command: rebuild the feed whenever the catalog files change.
+
+    Bursts of changes are coalesced: a rebuild starts once the files have
+    been quiet for the debounce window. It takes the shared catalog lock,
+    so it waits for an import or save in progress to finish. A snapshot that
+    cannot be read (a hand edit saved halfway) is reported, and the watch
+    waits for the next change.
+    """
+    from tiktok_watch import InotifyWatcher, open_watcher, wait_for_quiet
+
+    parser = generate_parser(manager, "tiktok_manager.py watch",
+                             "Rebuild the TikTok feed whenever the catalog changes")
+    parser.add_argument("--debounce", type=float, default=1.0, metavar="SECONDS",
+                        help="rebuild once the catalog has been quiet this long (default 1)")
+    parser.add_argument("--poll", action="store_true", help="poll file stats instead of using inotify")
+    parser.add_argument("--interval", type=float, default=1.0, metavar="SECONDS",
+                        help="polling interval (default 1)")
+    options = parser.parse_args(args)
+    if options.debounce <= 0:
+        parser.error("--debounce must be positive")
+    if options.interval <= 0:
+        parser.error("--interval must be positive")
+
+    paths = (manager.output_file, manager.journal_file)
+    watcher = open_watcher(paths, options.poll, options.interval)
+    how = 'inotify' if isinstance(watcher, InotifyWatcher) else f"polling every {options.interval:g}s"
+    print(f"👀 Watching {', '.join(paths)} ({how}); Ctrl+C to stop")
+
+    built = None
+    try:
         while True:
-            choice = input("\nChoose an option (1-6): ").strip()
-            
-            if choice == '1':
-                url = input("Enter TikTok URL: ").strip()
-                description = input("Enter description (optional): ").strip()
+            signature = manager._catalog_signature()
+            if signature != built:
+                if built is not None:
+                    print("🔄 Catalog changed, rebuilding")
+                try:
+                    generate_from_options(manager, options)
+                except CatalogError as e:
+                    print(f"⚠️ {e}; waiting for the next change")
+                built = signature
+            watcher.wait()
+            wait_for_quiet(watcher, options.debounce, WATCH_MAX_DELAY)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
+
+
+def interactive_mode(manager: TikTokManager):
+    """Menu-driven mode used when no command is given"""
+    print("🎵 TikTok Video Manager for St. Louis Demo JHS")
+    print("=" * 50)
+    print("1. Add video")
+    print("2. List videos") 
+    print("3. Remove video")
+    print("4. Generate HTML")
+    print("5. Add sample videos")
+    print("6. Exit")
+
+    while True:
+        choice = input("\nChoose an option (1-6): ").strip()
+
+        if choice == '1':
+            url = input("Enter TikTok URL: ").strip()
+            description = input("Enter description (optional): ").strip()
+            with manager.locked():
                 if manager.add_video(url, description):
                     manager.save_videos()
-            
-            elif choice == '2':
+
+        elif choice == '2':
+            with manager.locked(shared=True):
                 manager.list_videos()
-            
-            elif choice == '3':
-                video_id = input("Enter video ID to remove: ").strip()
+
+        elif choice == '3':
+            video_id = input("Enter video ID to remove: ").strip()
+            with manager.locked():
                 if manager.remove_video(video_id):
                     manager.save_videos()
-            
-            elif choice == '4':
+
+        elif choice == '4':
+            with manager.locked(shared=True):
                 manager.generate_html()
-            
-            elif choice == '5':
+
+        elif choice == '5':
+            with manager.locked():
                 if manager.add_sample_videos():
                     manager.save_videos()
                     manager.generate_html()
-            
-            elif choice == '6':
-                break
-            
-            else:
-                print("Invalid choice")
-    
-    else:
-        # Command line mode
-        command = sys.argv[1]
-        
-        if command == 'add' and len(sys.argv) >= 3:
-            url = sys.argv[2]
-            description = sys.argv[3] if len(sys.argv) > 3 else ""
+
+        elif choice == '6':
+            break
+
+        else:
+            print("Invalid choice")
+
+
+def run_command(manager: TikTokManager, args: List[str]):
+    """Run one command line command"""
+    command = args[0]
+
+    if command == 'add' and len(args) >= 2:
+        url = args[1]
+        description = args[2] if len(args) > 2 else ""
+        with manager.locked():
             if manager.add_video(url, description):
                 manager.save_videos()
                 manager.generate_html()
-        
-        elif command == 'list':
-            manager.list_videos()
-        
-        elif command == 'generate':
-            manager.generate_html()
-        
-        elif command == 'sample':
+
+    elif command == 'link' and len(args) >= 3:
+        with manager.locked():
+            if manager.link_short_url(args[1], args[2]):
+                manager.save_videos()
+                manager.generate_html()
+
+    elif command == 'resolve':
+        resolve_command(manager, args[1:])
+
+    elif command == 'import' and len(args) >= 2:
+        import_videos(manager, args[1:])
+
+    elif command == 'list':
+        list_command(manager, args[1:])
+
+    elif command == 'hashtags':
+        manager.list_hashtags()
+
+    elif command == 'search' and len(args) >= 2:
+        manager.list_videos(text=' '.join(args[1:]))
+
+    elif command == 'generate':
+        generate_command(manager, args[1:])
+
+    elif command == 'watch':
+        watch_command(manager, args[1:])
+
+    elif command == 'sample':
+        with manager.locked():
             if manager.add_sample_videos():
                 manager.save_videos()
                 manager.generate_html()
-        
-        else:
-            print("Usage:")
-            print("  python scripts/tiktok_manager.py                    # Interactive mode")
-            print("  python scripts/tiktok_manager.py add <url> [desc]   # Add video")
-            print("  python scripts/tiktok_manager.py list               # List videos")
-            print("  python scripts/tiktok_manager.py generate           # Generate HTML")
-            print("  python scripts/tiktok_manager.py sample             # Add sample videos")
+
+    elif command == 'snapshot':
+        snapshot_command(manager, args[1:])
+
+    elif command == 'history':
+        history_command(manager, args[1:])
+
+    elif command == 'compact':
+        with manager.locked():
+            manager.compact()
+
+    else:
+        print("Usage:")
+        print("  python scripts/tiktok_manager.py                    # Interactive mode")
+        print("  python scripts/tiktok_manager.py add <url> [desc]   # Add video")
+        print("  python scripts/tiktok_manager.py import <file|->    # Bulk import URLs, CSV or JSONL")
+        print("  python scripts/tiktok_manager.py link <short> <url> # Map a short link to its video URL")
+        print("  python scripts/tiktok_manager.py resolve            # Resolve stored short links over HTTP")
+        print("  python scripts/tiktok_manager.py list [username]    # List videos (or 'list #tag')")
+        print("      [--user X] [--since DATE] [--grep TEXT] [--limit N] [--offset M] [--format text|table|jsonl|csv]")
+        print("  python scripts/tiktok_manager.py hashtags           # Count videos per hashtag")
+        print("  python scripts/tiktok_manager.py search <words>     # List videos whose description has every word")
+        print("  python scripts/tiktok_manager.py generate [--page-size N] [--shard-format json|html] [--hashtags] [--precompress] [--assets]")
+        print("                                                      [--render embed|facade] [--virtualize N]")
+        print("                                                      [--order insertion|trending|recent|likes] [--top K]")
+        print("                                                      [--jobs N]")
+        print("                                                      # Generate HTML (optionally paginated,")
+        print("                                                      # plus one feed per hashtag)")
+        print("  python scripts/tiktok_manager.py watch [--debounce S] [--poll]")
+        print("                                                      # Rebuild the feed whenever the catalog changes")
+        print("  python scripts/tiktok_manager.py snapshot [file]    # Record engagement counts (from CSV/JSONL readings)")
+        print("      [--date YYYY-MM-DD]")
+        print("  python scripts/tiktok_manager.py history [rising|growth|users]")
+        print("      [--days N] [--since DATE] [--until DATE] [--metric likes|comments|shares|engagement] [--top N]")
+        print("                                                      # Query the engagement history")
+        print("  python scripts/tiktok_manager.py sample             # Add sample videos")
+        print("  python scripts/tiktok_manager.py compact            # Fold the journal into the JSON snapshot")
+        print()
+        print("Add --journal (or set TIKTOK_STORAGE=journal) to append changes to")
+        print(".tiktok/tiktok-videos.journal.jsonl instead of rewriting the JSON every time.")
+        print("Add --sqlite (or set TIKTOK_STORAGE=sqlite) to keep the catalog in the indexed")
+        print(".tiktok/tiktok-videos.db database; the JSON is exported from it on every save.")
+        print("Add --metrics for per-phase timings, --log-json for JSON-lines output and")
+        print("--profile to capture a cProfile/tracemalloc profile in .tiktok/profiles/.")
+
+
+def feed_environment() -> Dict:
+    """Feed options set through TIKTOK_* environment variables"""
+    settings = {}
+    for name, variable, parse in FEED_ENVIRONMENT:
+        value = os.environ.get(variable)
+        if value:
+            try:
+                settings[name] = parse(value)
+            except ValueError:
+                raise ValueError(f"{variable} must be a whole number (got {value!r})") from None
+    return settings
+
+
+def silence_stdout():
+    """The reader went away (e.g. `list | head`): point stdout at /dev/null so
+    the remaining output, the --log-json summary and the final flush do not
+    fail again"""
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.__stdout__.fileno())
+    os.close(devnull)
+    # The summary has no reader left
+    METRICS.stream = None
+
+
+def main():
+    """Main function for command line usage"""
+    import sys
+
+    args = sys.argv[1:]
+    storage = os.environ.get('TIKTOK_STORAGE') or 'json'
+    for mode in STORAGE_MODES:
+        if f'--{mode}' in args:
+            storage = mode
+
+    # Instrumentation: phase timings (--metrics), everything as JSON lines on
+    # stdout (--log-json), plus cProfile/tracemalloc capture (--profile)
+    log_json = '--log-json' in args or os.environ.get('TIKTOK_LOG_FORMAT') == 'json'
+    profile = '--profile' in args or os.environ.get('TIKTOK_PROFILE', '') not in ('', '0')
+    metrics = (log_json or profile or '--metrics' in args
+               or os.environ.get('TIKTOK_METRICS', '') not in ('', '0'))
+    flags = [f'--{mode}' for mode in STORAGE_MODES] + ['--metrics', '--log-json', '--profile']
+    args = [arg for arg in args if arg not in flags]
+    if log_json:
+        METRICS.configure(stream=sys.stdout)
+        sys.stdout = JsonLinesOutput(METRICS)
+    elif metrics:
+        METRICS.configure()
+
+    try:
+        manager = TikTokManager(storage=storage, feed=feed_environment(),
+                                jobs=int(os.environ.get('TIKTOK_JOBS') or 1))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    # The catalog is only read once a command needs it
+    command = args[0] if args else 'interactive'
+    report = None
+    try:
+        with ExitStack() as stack:
+            if profile:
+                report = stack.enter_context(profiling(".tiktok/profiles", command))
+            with METRICS.phase(command):
+                if args:
+                    run_command(manager, args)
+                else:
+                    interactive_mode(manager)
+    except CatalogError as e:
+        print(f"❌ {e}")
+        print("   Restore or fix the file first; nothing has been written.")
+        sys.exit(1)
+    except BrokenPipeError:
+        silence_stdout()
+        sys.exit(1)
+    finally:
+        if log_json:
+            # The reader may leave after the command's last line but before the summary
+            try:
+                METRICS.emit("summary", command=command, phases=METRICS.summary())
+                if report:
+                    METRICS.emit("profile", **report)
+                sys.stdout.flush()
+            except BrokenPipeError:
+                silence_stdout()
+                sys.exit(1)
+        elif metrics:
+            print_report(METRICS, report)
+
 
 if __name__ == "__main__":
     main()
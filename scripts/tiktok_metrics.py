@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+📈 Instrumentation for the TikTok Video Manager
+Per-phase wall/CPU timings and counts, optional cProfile/tracemalloc capture,
+and JSON-lines output for log pipelines
+"""
+
+import functools
+import io
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, TextIO
+
+# Message level by the emoji a printed line starts with
+MESSAGE_LEVELS = (('❌', 'error'), ('⚠️', 'warning'))
+
+# Functions and allocation sites listed in a profile report
+PROFILE_TOP = 15
+
+
+class Metrics:
+    """Timed phases of one manager process.
+
+    Disabled until configure() is called, and instrumented code then costs a
+    single attribute check. Phases nest; each finished phase records its wall
+    and CPU seconds plus whatever counts the code attached with count(), and
+    is written as a JSON line to ``stream`` if one is set.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.stream: Optional[TextIO] = None
+        self.phases: List[Dict] = []
+        self._stack: List[Dict] = []
+
+    def configure(self, enabled: bool = True, stream: Optional[TextIO] = None):
+        """Start (or stop) collecting; events go to ``stream`` as JSON lines"""
+        self.enabled = enabled
+        self.stream = stream
+
+    @contextmanager
+    def phase(self, name: str, **counts) -> Iterator[Dict]:
+        """Time the body as phase ``name``; yields the phase record"""
+        if not self.enabled:
+            yield {}
+            return
+
+        parent = self._stack[-1]["phase"] if self._stack else None
+        record = {"phase": f"{parent}/{name}" if parent else name, "name": name, **counts}
+        self._stack.append(record)
+        self.phases.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["wall"] = round(time.perf_counter() - wall, 6)
+            record["cpu"] = round(time.process_time() - cpu, 6)
+            self._stack.pop()
+            self.emit("phase", **record)
+
+    def count(self, **counts):
+        """Add counts (videos, bytes, ...) to the innermost running phase"""
+        if self.enabled and self._stack:
+            record = self._stack[-1]
+            for key, value in counts.items():
+                record[key] = record.get(key, 0) + value
+
+    def emit(self, event: str, **fields):
+        """Write one event as a JSON line"""
+        if self.stream is not None:
+            line = json.dumps({"ts": datetime.now().isoformat(timespec='milliseconds'),
+                               "event": event, **fields}, ensure_ascii=False, default=str)
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def summary(self) -> Dict[str, Dict]:
+        """Totals per phase name: calls, wall and CPU seconds, summed counts"""
+        totals: Dict[str, Dict] = {}
+        for record in self.phases:
+            total = totals.setdefault(record["phase"], {"calls": 0, "wall": 0.0, "cpu": 0.0})
+            total["calls"] += 1
+            for key, value in record.items():
+                if key in ("phase", "name"):
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    total[key] = total.get(key, 0) + value
+        for total in totals.values():
+            total["wall"] = round(total["wall"], 6)
+            total["cpu"] = round(total["cpu"], 6)
+        return totals
+
+
+# The process-wide collector the manager's methods report to
+METRICS = Metrics()
+
+
+def timed(name: str) -> Callable:
+    """Decorator running the function as a METRICS phase"""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            with METRICS.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class JsonLinesOutput(io.TextIOBase):
+    """stdout replacement that turns every printed line into a "message"
+    event, so the emoji messages reach the log pipeline as JSON too"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._pending = ''
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        *lines, self._pending = (self._pending + text).split('\n')
+        for line in lines:
+            if line.strip():
+                level = next((level for emoji, level in MESSAGE_LEVELS if line.lstrip().startswith(emoji)),
+                             'info')
+                self.metrics.emit("message", level=level, text=line.strip())
+        return len(text)
+
+    def flush(self):
+        if self._pending.strip():
+            self.write('\n')
+        if self.metrics.stream is not None:
+            self.metrics.stream.flush()
+
+
+@contextmanager
+def profiling(directory: str, label: str) -> Iterator[Dict]:
+    """Run the body under cProfile and tracemalloc.
+
+    The raw profile is saved to ``directory`` (open it with pstats or
+    snakeviz). The yielded dict is filled in afterwards with the file path,
+    the peak traced memory and the top functions and allocation sites.
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    report: Dict = {}
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+        report["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(directory, exist_ok=True)
+        report["path"] = os.path.join(directory, f"{label}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+        profiler.dump_stats(report["path"])
+
+        stats = pstats.Stats(profiler).stats
+        top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP]
+        report["functions"] = [{"function": f"{os.path.basename(filename)}:{line}({function})",
+                                "calls": calls, "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)}
+                               for (filename, line, function), (_, calls, tottime, cumtime, _) in top]
+        report["allocations"] = [{"site": f"{os.path.basename(stat.traceback[0].filename)}:"
+                                          f"{stat.traceback[0].lineno}",
+                                  "bytes": stat.size, "blocks": stat.count}
+                                 for stat in snapshot.statistics('lineno')[:PROFILE_TOP]]
+
+
+def print_report(metrics: Metrics, profile: Optional[Dict] = None, stream: TextIO = sys.stderr):
+    """Human-readable phase table (and profile summary) for text mode"""
+    write = stream.write
+    summary = metrics.summary()
+    width = max(map(len, summary), default=5)
+    write("\n⏱️ Phase timings\n")
+    write(f"{'phase':<{width}} {'calls':>6} {'wall s':>9} {'cpu s':>9}  counts\n")
+    for phase, total in summary.items():
+        counts = ', '.join(f"{key}={value:,}" for key, value in total.items()
+                           if key not in ("calls", "wall", "cpu"))
+        write(f"{phase:<{width}} {total['calls']:>6} {total['wall']:>9.3f} {total['cpu']:>9.3f}  {counts}\n")
+
+    if profile:
+        write(f"\n🔬 Profile saved to {profile['path']} (peak traced memory "
+              f"{profile['peak_bytes'] / 1e6:.1f} MB)\n")
+        write(f"{'function':<56} {'calls':>9} {'tottime':>9} {'cumtime':>9}\n")
+        for row in profile["functions"]:
+            write(f"{row['function'][:56]:<56} {row['calls']:>9,} {row['tottime']:>9.3f} {row['cumtime']:>9.3f}\n")
+        write("\n🧠 Largest live allocations\n")
+        for row in profile["allocations"][:5]:
+            write(f"{row['site']:<56} {row['bytes'] / 1e6:>9.2f} MB\n")
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+📦 Precompressed publish artifacts for the TikTok feed
+Writes .gz (and, with the brotli package, .br) siblings of the published files
+plus a manifest of content hashes the CDN can serve as ETags
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from tiktok_storage import atomic_write
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip siblings are written without it
+    brotli = None
+
+# Bump when the manifest layout changes
+MANIFEST_VERSION = 1
+
+# Encoding name -> sibling suffix, in the order a server should prefer them
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodings this Python can produce"""
+    return tuple(name for name in ENCODING_SUFFIXES if name != 'br' or brotli is not None)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress at maximum level; deterministic, so unchanged input gives
+    byte-identical siblings"""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"Unknown encoding {encoding!r}")
+
+
+def etag(digest: str, encoding: Optional[str] = None) -> str:
+    """Strong ETag for a file's SHA-256 (each encoding is a distinct representation)"""
+    return f'"{digest[:32]}-{encoding}"' if encoding else f'"{digest[:32]}"'
+
+
+class PrecompressManifest:
+    """Content hashes, ETags and compressed sizes of published files.
+
+    Entries are keyed by path relative to the manifest's directory and keep
+    the (mtime_ns, size) they were computed from, so an untouched file is
+    not even re-read. A file whose bytes changed gets fresh siblings; one
+    whose bytes are the same (rewritten unchanged) only has its stat
+    refreshed. Files that disappeared lose their siblings and entry.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.root = os.path.dirname(path) or '.'
+        self.files: Dict[str, Dict] = self._load()
+        self.compressed = 0
+        self.reused = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            return data.get("files", {})
+        return {}
+
+    def update(self, paths: Iterable[str], encodings: Optional[Tuple[str, ...]] = None):
+        """Bring the siblings and entries of ``paths`` up to date"""
+        encodings = encodings or available_encodings()
+        stale = []
+        for path in paths:
+            name = os.path.relpath(path, self.root)
+            entry = self.files.get(name)
+            stat = os.stat(path)
+            if (entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+                    and set(entry["encodings"]) == set(encodings)
+                    and all(os.path.exists(path + ENCODING_SUFFIXES[e]) for e in encodings)):
+                self.reused += 1
+                continue
+            stale.append((path, name, entry, stat))
+
+        # zlib and brotli release the GIL, so big files compress in parallel
+        with ThreadPoolExecutor(max_workers=min(len(stale), os.cpu_count() or 1) or 1) as pool:
+            for name, entry, compressed in pool.map(lambda item: self._refresh(*item, encodings), stale):
+                self.files[name] = entry
+                if compressed:
+                    self.compressed += 1
+                else:
+                    self.reused += 1
+
+    @staticmethod
+    def _refresh(path: str, name: str, entry: Optional[Dict], stat: os.stat_result,
+                 encodings: Tuple[str, ...]) -> Tuple[str, Dict, bool]:
+        """Hash one file and recompress it if its bytes changed; returns
+        (name, entry, whether siblings were written)"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if (entry and entry["sha256"] == digest and set(entry["encodings"]) == set(encodings)
+                and all(os.path.exists(path + ENCODING_SUFFIXES[e]) for e in encodings)):
+            return name, {**entry, "mtime_ns": stat.st_mtime_ns, "size": len(data)}, False
+
+        sizes = {}
+        for encoding in encodings:
+            compressed = compress(data, encoding)
+            with atomic_write(path + ENCODING_SUFFIXES[encoding], 'wb') as f:
+                f.write(compressed)
+            sizes[encoding] = {"etag": etag(digest, encoding), "size": len(compressed)}
+        for encoding in set(ENCODING_SUFFIXES) - set(encodings):
+            _remove(path + ENCODING_SUFFIXES[encoding])
+        return name, {"etag": etag(digest), "sha256": digest, "size": len(data),
+                      "mtime_ns": stat.st_mtime_ns, "encodings": sizes}, True
+
+    def prune(self) -> int:
+        """Drop siblings and entries of files that no longer exist; returns how many"""
+        gone = [name for name in self.files if not os.path.exists(os.path.join(self.root, name))]
+        for name in gone:
+            for suffix in ENCODING_SUFFIXES.values():
+                _remove(os.path.join(self.root, name) + suffix)
+            del self.files[name]
+        return len(gone)
+
+    def clear(self):
+        """Delete every sibling and the manifest itself"""
+        for name in self.files:
+            for suffix in ENCODING_SUFFIXES.values():
+                _remove(os.path.join(self.root, name) + suffix)
+        self.files = {}
+        _remove(self.path)
+
+    def save(self):
+        """Write the manifest"""
+        with atomic_write(self.path) as f:
+            json.dump({"version": MANIFEST_VERSION, "files": dict(sorted(self.files.items()))},
+                      f, indent=2)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+🔗 TikTok Short-Link Resolver for St. Louis Demo JHS
+Follows vm.tiktok.com / tiktok.com/t/ redirects concurrently to find the full video URL
+"""
+
+import asyncio
+import http.client
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from tiktok_urls import parse_video_url
+
+USER_AGENT = "Mozilla/5.0 (compatible; StLouisDemoJHS-TikTokManager/1.0)"
+
+# Statuses worth another attempt after backing off
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Transport:
+    """How the resolver talks HTTP. Subclass and pass an instance to
+    ShortLinkResolver to swap TikTok for a stub in tests."""
+
+    async def request(self, url: str) -> Tuple[int, Optional[str]]:
+        """Request ``url`` without following redirects; returns (status, Location header)"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release pooled connections"""
+
+
+class HttpTransport(Transport):
+    """Standard-library transport with a keep-alive connection pool per host.
+
+    Blocking http.client calls run on a thread pool sized to the pool, so at
+    most ``max_connections`` requests are in flight. ``origin`` (e.g.
+    'http://127.0.0.1:8000') sends every request to that server instead,
+    keeping the original Host header, which lets a local stub stand in for
+    TikTok.
+    """
+
+    def __init__(self, max_connections: int = 16, timeout: float = 10.0,
+                 origin: Optional[str] = None, method: str = 'HEAD'):
+        self.timeout = timeout
+        self.method = method
+        self.origin = urlsplit(origin) if origin else None
+        self._idle: Dict[Tuple[str, str, Optional[int]], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections,
+                                            thread_name_prefix="tiktok-resolver")
+
+    async def request(self, url: str) -> Tuple[int, Optional[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._request, url)
+
+    def _request(self, url: str) -> Tuple[int, Optional[str]]:
+        parts = urlsplit(url)
+        target = self.origin or parts
+        key = (target.scheme, target.hostname, target.port)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+        connection = self._checkout(key)
+        try:
+            connection.request(self.method, path, headers={
+                "Host": parts.netloc,
+                "User-Agent": USER_AGENT,
+                "Connection": "keep-alive",
+            })
+            response = connection.getresponse()
+            response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+        return response.status, response.getheader('Location')
+
+    def _checkout(self, key: Tuple[str, str, Optional[int]]) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _checkin(self, key: Tuple[str, str, Optional[int]], connection: http.client.HTTPConnection):
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    async def close(self):
+        with self._lock:
+            connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+        self._executor.shutdown(wait=False)
+
+
+class ShortLinkResolver:
+    """Resolve TikTok short links to canonical @user/video/<id> URLs.
+
+    ``cache`` maps short-link codes to full URLs (the manager passes its
+    short-link table, which it saves to disk); cached codes are never
+    requested again. Requests are bounded by a semaphore and retried with
+    exponential backoff and jitter. ``on_resolved(code, url)`` is called as
+    each link is resolved, e.g. to save progress.
+    """
+
+    def __init__(self, transport: Optional[Transport] = None, cache: Optional[Dict[str, str]] = None,
+                 concurrency: int = 16, retries: int = 3, backoff: float = 0.5, max_redirects: int = 5,
+                 on_resolved: Optional[Callable[[str, str], None]] = None):
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1 (got {concurrency})")
+        self.transport = transport or HttpTransport(max_connections=concurrency)
+        self.cache = cache if cache is not None else {}
+        self.on_resolved = on_resolved
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.errors: Dict[str, str] = {}
+
+    async def resolve(self, url: str, semaphore: Optional[asyncio.Semaphore] = None) -> Optional[str]:
+        """Return the canonical full video URL for a short link, or None"""
+        parsed = parse_video_url(url)
+        if parsed is None:
+            self.errors[url] = "not a TikTok URL"
+            return None
+        code, short_url, username = parsed
+        if username is not None:
+            # Already a full video URL
+            return short_url
+        if code in self.cache:
+            return self.cache[code]
+
+        semaphore = semaphore or asyncio.Semaphore(self.concurrency)
+        async with semaphore:
+            resolved = await self._follow(code, short_url)
+        if resolved:
+            self.cache[code] = resolved
+            if self.on_resolved is not None:
+                self.on_resolved(code, resolved)
+        return resolved
+
+    async def _follow(self, code: str, url: str) -> Optional[str]:
+        """Follow redirects from a short URL until a full video URL appears"""
+        for _ in range(self.max_redirects):
+            status, location = await self._request(code, url)
+            if status is None:
+                return None
+            if not (300 <= status < 400 and location):
+                self.errors[code] = f"HTTP {status} without a video redirect"
+                return None
+
+            url = urljoin(url, location)
+            parsed = parse_video_url(url)
+            if parsed is not None and parsed[2] is not None:
+                return parsed[1]
+
+        self.errors[code] = "too many redirects"
+        return None
+
+    async def _request(self, code: str, url: str) -> Tuple[Optional[int], Optional[str]]:
+        """One request with retries; (None, None) once every attempt failed"""
+        for attempt in range(self.retries + 1):
+            try:
+                status, location = await self.transport.request(url)
+                if status not in RETRY_STATUSES:
+                    return status, location
+                self.errors[code] = f"HTTP {status}"
+            except (OSError, http.client.HTTPException, asyncio.TimeoutError) as e:
+                self.errors[code] = f"{type(e).__name__}: {e}"
+
+            if attempt < self.retries:
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+        return None, None
+
+    async def resolve_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Resolve many short links concurrently; returns {url: full URL or None}"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        urls = list(urls)
+        try:
+            results = await asyncio.gather(*(self.resolve(url, semaphore) for url in urls))
+        finally:
+            await self.transport.close()
+        return dict(zip(urls, results))
+
+
+def resolve_short_links(urls: Iterable[str], **options) -> Dict[str, Optional[str]]:
+    """Blocking wrapper around ShortLinkResolver.resolve_many"""
+    return asyncio.run(ShortLinkResolver(**options).resolve_many(urls))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+🔍 Client-side search index for the TikTok feed
+Prebuilds a compact term -> video postings index that the feed page searches in the browser
+"""
+
+import hashlib
+import json
+from typing import Dict, Iterable, List
+
+from tiktok_catalog import search_terms
+from tiktok_video import Video
+
+# Bump when the index layout changes (the page checks it)
+SEARCH_INDEX_VERSION = 1
+
+# Longer "words" are almost always URLs or noise
+MAX_TERM_LENGTH = 40
+
+# Base64 digits of the postings encoding (same alphabet as source-map VLQs)
+VLQ_DIGITS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def encode_postings(positions: List[int]) -> str:
+    """Encode ascending positions as VLQ base64 gaps.
+
+    Each gap (distance to the previous position minus one) is written as
+    5-bit digits, least significant first, with bit 6 marking "more digits
+    follow". A term carried by consecutive videos costs one byte per video.
+    """
+    digits = []
+    previous = -1
+    for position in positions:
+        gap = position - previous - 1
+        previous = position
+        while True:
+            digit = gap & 31
+            gap >>= 5
+            if gap:
+                digits.append(VLQ_DIGITS[digit | 32])
+            else:
+                digits.append(VLQ_DIGITS[digit])
+                break
+    return ''.join(digits)
+
+
+def decode_postings(text: str) -> List[int]:
+    """Inverse of encode_postings(), as the page's script decodes postings;
+    the round-trip tests check the index with it"""
+    positions = []
+    previous = -1
+    value = shift = 0
+    for char in text:
+        digit = VLQ_DIGITS.index(char)
+        value |= (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            previous += value + 1
+            positions.append(previous)
+            value = shift = 0
+    return positions
+
+
+def video_terms(video: Video) -> Iterable[str]:
+    """Searchable terms of a video: its description words and username"""
+    return search_terms(f"{video.description} {video.username}")
+
+
+def build_search_index(videos: Iterable[Video]) -> str:
+    """Serialize the search index for ``videos`` (positions follow their order).
+
+    Terms are sorted (by UTF-16 code units, like JavaScript string
+    comparison) and newline-joined so the page can binary-search prefixes;
+    postings are space-joined encode_postings() strings in the same order.
+    """
+    postings: Dict[str, List[int]] = {}
+    count = 0
+    for position, video in enumerate(videos):
+        count += 1
+        for term in set(video_terms(video)):
+            if len(term) <= MAX_TERM_LENGTH:
+                postings.setdefault(term, []).append(position)
+
+    terms = sorted(postings, key=lambda term: term.encode('utf-16-be'))
+    return json.dumps({
+        "version": SEARCH_INDEX_VERSION,
+        "count": count,
+        "terms": '\n'.join(terms),
+        "postings": ' '.join(encode_postings(postings[term]) for term in terms)
+    }, ensure_ascii=False, separators=(',', ':'))
+
+
+def search_index_key(videos: Iterable[Video]) -> str:
+    """Hash of everything the search index is built from"""
+    digest = hashlib.sha1(f"search\0{SEARCH_INDEX_VERSION}".encode('utf-8'))
+    for v in videos:
+        digest.update(f"\0{v.id}\0{v.username}\0{v.description}".encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+🗄️ SQLite catalog backend for the TikTok Video Manager
+Keeps the catalog in an indexed database so lookups and searches never load every video
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional, Union
+
+from tiktok_catalog import Catalog, search_terms
+from tiktok_video import Date, Video, parse_date
+
+SCHEMA_VERSION = 3
+
+COLUMNS = "id, url, username, description, date, likes, comments, shares, verified, added_date, hashtags, extra"
+PLACEHOLDERS = ', '.join('?' * len(COLUMNS.split(', ')))
+QUALIFIED_COLUMNS = ', '.join(f"videos.{column}" for column in COLUMNS.split(', '))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    username TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    date TEXT,
+    likes INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0,
+    shares INTEGER NOT NULL DEFAULT 0,
+    verified INTEGER NOT NULL DEFAULT 0,
+    added_date TEXT NOT NULL DEFAULT '',
+    hashtags TEXT NOT NULL DEFAULT '[]',
+    -- JSON object of the catalog keys Video has no field for (Video.extra)
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS videos_username ON videos (username);
+CREATE INDEX IF NOT EXISTS videos_date ON videos (date);
+CREATE INDEX IF NOT EXISTS videos_added_date ON videos (added_date);
+
+-- Inverted hashtag index, filled from the JSON hashtags column by triggers
+CREATE TABLE IF NOT EXISTS video_hashtags (
+    hashtag TEXT NOT NULL,
+    video_rowid INTEGER NOT NULL,
+    PRIMARY KEY (hashtag, video_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS video_hashtags_video ON video_hashtags (video_rowid);
+CREATE TRIGGER IF NOT EXISTS video_hashtags_insert AFTER INSERT ON videos BEGIN
+    INSERT OR IGNORE INTO video_hashtags (hashtag, video_rowid)
+        SELECT value, new.rowid FROM json_each(new.hashtags);
+END;
+CREATE TRIGGER IF NOT EXISTS video_hashtags_delete AFTER DELETE ON videos BEGIN
+    DELETE FROM video_hashtags WHERE video_rowid = old.rowid;
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DROP_SCHEMA = """
+DROP TABLE IF EXISTS videos_fts;
+DROP TABLE IF EXISTS video_hashtags;
+DROP TABLE IF EXISTS videos;
+DROP TABLE IF EXISTS meta;
+"""
+
+# Full-text index over descriptions, kept in step with the videos table by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+    description, content='videos', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+    INSERT INTO videos_fts (rowid, description) VALUES (new.rowid, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+    INSERT INTO videos_fts (videos_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF description ON videos BEGIN
+    INSERT INTO videos_fts (videos_fts, rowid, description) VALUES ('delete', old.rowid, old.description);
+    INSERT INTO videos_fts (rowid, description) VALUES (new.rowid, new.description);
+END;
+"""
+
+
+def _row_to_video(row) -> Video:
+    (video_id, url, username, description, date, likes, comments, shares, verified, added_date,
+     hashtags, extra) = row
+    return Video(video_id, url, sys.intern(username), description,
+                 Date.fromisoformat(date) if date else None,
+                 likes, comments, shares, bool(verified), added_date,
+                 tuple(map(sys.intern, json.loads(hashtags))), json.loads(extra) if extra else None)
+
+
+def _video_to_row(video: Video) -> tuple:
+    return (video.id, video.url, video.username, video.description,
+            video.date.isoformat() if video.date else None,
+            video.likes, video.comments, video.shares, int(video.verified), video.added_date,
+            json.dumps(video.hashtags, ensure_ascii=False),
+            json.dumps(video.extra, ensure_ascii=False) if video.extra else None)
+
+
+class SQLiteCatalog(Catalog):
+    """Catalog stored in a SQLite database (WAL mode).
+
+    ``id``, ``username``, ``date`` and ``added_date`` are indexed,
+    hashtags have their own inverted index table and descriptions are
+    searched through an FTS5 table; if this SQLite build lacks FTS5, text
+    search falls back to LIKE scans. Writes run in one transaction until
+    commit() or rollback(); the manager ends it when it releases the catalog
+    lock, so a waiting process never holds the database's write lock.
+
+    The database is derived from the published JSON snapshot, so a database
+    with an older schema is simply dropped and rebuilt from it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            if self._schema_version() not in (None, SCHEMA_VERSION):
+                self.connection.executescript(DROP_SCHEMA)
+            self.connection.executescript(SCHEMA)
+            try:
+                self.connection.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+            self.set_meta('schema_version', str(SCHEMA_VERSION))
+
+    def _schema_version(self) -> Optional[int]:
+        try:
+            value = self.get_meta('schema_version')
+        except sqlite3.OperationalError:
+            return None
+        return int(value) if value else None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Video]:
+        cursor = self.connection.execute(f"SELECT {COLUMNS} FROM videos ORDER BY rowid")
+        return map(_row_to_video, cursor)
+
+    def get(self, video_id: str) -> Optional[Video]:
+        row = self.connection.execute(f"SELECT {COLUMNS} FROM videos WHERE id = ?", (video_id,)).fetchone()
+        return _row_to_video(row) if row else None
+
+    def add(self, video: Video):
+        # Delete first so a replaced video moves to the end like in memory
+        self.connection.execute("DELETE FROM videos WHERE id = ?", (video.id,))
+        self.connection.execute(f"INSERT INTO videos ({COLUMNS}) VALUES ({PLACEHOLDERS})",
+                                _video_to_row(video))
+
+    def remove(self, video_id: str) -> Optional[Video]:
+        video = self.get(video_id)
+        if video is not None:
+            self.connection.execute("DELETE FROM videos WHERE id = ?", (video_id,))
+        return video
+
+    def update_counts(self, video_id: str, likes: int, comments: int, shares: int) -> Optional[Video]:
+        self.connection.execute("UPDATE videos SET likes = ?, comments = ?, shares = ? WHERE id = ?",
+                                (likes, comments, shares, video_id))
+        return self.get(video_id)
+
+    def replace(self, videos: Iterable[Video]):
+        self.connection.execute("DELETE FROM videos")
+        self.connection.executemany(f"INSERT OR REPLACE INTO videos ({COLUMNS}) VALUES ({PLACEHOLDERS})",
+                                    map(_video_to_row, videos))
+
+    def find(self, username: Optional[str] = None, date: Union[str, Date, None] = None,
+             text: Optional[str] = None, limit: Optional[int] = None, offset: int = 0,
+             hashtag: Optional[str] = None, since: Union[str, Date, None] = None,
+             grep: Optional[str] = None) -> Iterator[Video]:
+        source, order, clauses, params = "videos", "videos.rowid", [], []
+        if username is not None:
+            clauses.append("username = ?")
+            params.append(username)
+        if date is not None:
+            date = parse_date(date)
+            if date is None:
+                return iter(())
+            clauses.append("date = ?")
+            params.append(date.isoformat())
+        if since is not None:
+            since = parse_date(since)
+            if since is None:
+                return iter(())
+            clauses.append("date >= ?")
+            params.append(since.isoformat())
+        if hashtag is not None:
+            clauses.append("videos.rowid IN (SELECT video_rowid FROM video_hashtags WHERE hashtag = ?)")
+            params.append(hashtag.lstrip('#').lower())
+        terms = search_terms(text) if text else []
+        if terms and self.fts:
+            # Drive the query from the full-text index, which yields rowids in
+            # order, so a LIMIT stops early instead of collecting every match
+            source = "videos_fts JOIN videos ON videos.rowid = videos_fts.rowid"
+            order = "videos_fts.rowid"
+            clauses.append("videos_fts MATCH ?")
+            params.append(' '.join(f'"{term}"' for term in terms))
+        elif terms:
+            for term in terms:
+                clauses.append("description LIKE ?")
+                params.append(f"%{term}%")
+        # SQLite's lower() only folds ASCII, so it can only rule out ASCII
+        # descriptions; the rest (ß matches "ss") are checked in Python. The
+        # cursor is read lazily, and the slice stops it early.
+        needle = grep.casefold() if grep else None
+        if needle and needle.isascii():
+            clauses.append("(instr(lower(description), ?) > 0 OR description GLOB '*[^ -~]*')")
+            params.append(needle)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        if needle:
+            cursor = self.connection.execute(
+                f"SELECT {QUALIFIED_COLUMNS} FROM {source} {where} ORDER BY {order}", params)
+            matches = (v for v in map(_row_to_video, cursor) if needle in v.description.casefold())
+            return islice(matches, offset, None if limit is None else offset + limit)
+        cursor = self.connection.execute(
+            f"SELECT {QUALIFIED_COLUMNS} FROM {source} {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset))
+        return map(_row_to_video, cursor)
+
+    def hashtag_counts(self) -> Dict[str, int]:
+        return dict(self.connection.execute(
+            "SELECT hashtag, COUNT(*) FROM video_hashtags GROUP BY hashtag"))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+💾 Storage helpers for the TikTok Video Manager
+Crash-safe file publishing and advisory locking shared by the TikTok scripts
+"""
+
+import hashlib
+import os
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class CatalogError(Exception):
+    """Raised when the video catalog on disk cannot be read safely"""
+
+
+def fsync_directory(path: str):
+    """Flush a directory entry so a rename inside it survives a crash"""
+    if fcntl is None:
+        # Directories cannot be opened for fsync on Windows
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _published_mode(path: str) -> int:
+    """Permissions for a replacement of ``path``: keep the old ones, else 0666 minus umask"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'w', encoding: str = 'utf-8', buffering: int = -1) -> Iterator[IO]:
+    """Write to a temporary file next to ``path`` and rename it into place.
+
+    Readers only ever see the old file or the complete new one. If the body
+    raises, the temporary file is removed and ``path`` is left untouched.
+    """
+    import tempfile  # imported here: read-only commands never pay for it
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        # mkstemp creates 0600 files; published files must stay readable
+        os.chmod(temp_path, _published_mode(path))
+        with os.fdopen(fd, mode, buffering=buffering, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+class _Unchanged(Exception):
+    """Aborts an atomic_write whose output matches the published file"""
+
+
+def write_if_changed(path: str, chunks: Iterable[str], previous_digest: Optional[str] = None,
+                     buffering: int = -1) -> Tuple[bool, str]:
+    """Atomically publish ``chunks`` to ``path`` unless the content is unchanged.
+
+    The content is hashed while it streams to the temporary file. If the
+    SHA-256 digest equals ``previous_digest`` (or, without one, the digest of
+    the current file) the temporary file is discarded so the published file
+    keeps its mtime. Returns (changed, digest).
+    """
+    digest = hashlib.sha256()
+    if previous_digest is None and os.path.exists(path):
+        previous_digest = file_digest(path)
+
+    try:
+        with atomic_write(path, 'wb', buffering=buffering) as f:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                digest.update(data)
+                f.write(data)
+            if digest.hexdigest() == previous_digest and os.path.exists(path):
+                raise _Unchanged()
+    except _Unchanged:
+        return False, previous_digest
+    return True, digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False) -> Iterator[None]:
+    """Hold an advisory lock on ``path`` (created if missing).
+
+    Shared locks let several readers in at once; an exclusive lock waits for
+    all of them. On Windows every lock is exclusive.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after ~10 seconds; keep waiting
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
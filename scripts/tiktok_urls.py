@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+🔗 TikTok URL parsing for St. Louis Demo JHS
+Recognizes and canonicalizes every supported TikTok video URL shape
+"""
+
+import re
+from typing import Optional, Tuple
+
+# Every supported TikTok URL shape in one precompiled pattern. The host must
+# start the string or follow "//" or a dot, so look-alikes such as
+# nottiktok.com never match. Full links may come from any host variant (www.,
+# m., bare) with query strings or trailing slashes; short links (vm./vt. hosts,
+# /t/ paths) carry a code rather than the numeric ID. The ID or code is always
+# the last group that matched.
+VIDEO_URL_RE = re.compile(
+    r'(?:^|//|\.)(?:(?P<short_host>v[mt])\.|(?:www\.|m\.)?)tiktok\.com/'
+    r'(?(short_host)(?P<short_code>[A-Za-z0-9]+)'               # vm.tiktok.com/ABC
+    r'|(?:@(?P<username>[^/?#\s]+)/video/(?P<video_id>\d+)'    # tiktok.com/@user/video/123
+    r'|t/(?P<t_code>[A-Za-z0-9]+)))',                           # tiktok.com/t/ABC
+    re.IGNORECASE)
+
+
+def match_video_url(url: str) -> Optional[re.Match]:
+    """Match a TikTok URL against VIDEO_URL_RE; the ID is match[match.lastindex]"""
+    return VIDEO_URL_RE.search(url)
+
+
+def parse_video_url(url: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Parse a TikTok URL into (video_id, canonical_url, username).
+
+    Full links give the numeric ID and https://www.tiktok.com/@user/video/ID.
+    Short links give the short code as the ID, their canonical short URL and
+    no username. Returns None for anything else.
+    """
+    match = match_video_url(url)
+    if match is None:
+        return None
+
+    video_id = match[match.lastindex]
+    kind = match.lastgroup
+    if kind == 'video_id':
+        username = match['username']
+        return video_id, f"https://www.tiktok.com/@{username}/video/{video_id}", username
+    if kind == 'short_code':
+        return video_id, f"https://{match['short_host'].lower()}.tiktok.com/{video_id}/", None
+    return video_id, f"https://www.tiktok.com/t/{video_id}/", None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+🎬 Video record for the TikTok Video Manager
+Compact typed record used in memory, round-tripped to the JSON catalog schema
+"""
+
+import math
+import re
+import sys
+from datetime import date as Date
+from typing import Dict, Optional, Tuple, Union
+
+# Display suffixes TikTok uses for engagement counts, largest first
+COUNT_SUFFIXES = (('B', 1_000_000_000), ('M', 1_000_000), ('K', 1_000))
+
+# A hashtag needs at least one letter, so "video #2" is not one
+HASHTAG_RE = re.compile(r'#(\w*[^\W\d_]\w*)')
+
+
+def parse_count(value: Union[str, int, float, None]) -> int:
+    """Parse an engagement count such as '2.1K', '1,234', '3M' or 89 into an int.
+    Raises ValueError for anything else, including infinities and NaN."""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value
+
+    if isinstance(value, float):
+        number, multiplier = value, 1
+    else:
+        text = value.strip().replace(',', '').upper()
+        multiplier = 1
+        for suffix, size in COUNT_SUFFIXES:
+            if text.endswith(suffix):
+                text, multiplier = text[:-1], size
+                break
+        number = float(text) * multiplier
+    if not math.isfinite(number):
+        raise ValueError(f"not a finite count: {value!r}")
+    # Suffixed counts are rounded ('2.1K' is 2100), plain ones truncated
+    return round(number) if multiplier != 1 else int(number)
+
+
+def format_count(count: int) -> str:
+    """Format a count the way the catalog stores it: '89', '2.1K', '1.5M'.
+
+    Only counts that a one-decimal suffix represents exactly are abbreviated,
+    so parse_count(format_count(n)) == n for every n.
+    """
+    for suffix, multiplier in COUNT_SUFFIXES:
+        step = multiplier // 10
+        if count >= multiplier and count % step == 0:
+            whole, tenth = divmod(count // step, 10)
+            return f"{whole}.{tenth}{suffix}" if tenth else f"{whole}{suffix}"
+    return str(count)
+
+
+def parse_flag(value: Union[str, int, bool, None]) -> bool:
+    """Parse a yes/no import value: '1', 'true', 'yes' or 'y' (any case) are
+    true, other strings false; anything else by its truth value"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def parse_date(value: Union[str, Date, None]) -> Optional[Date]:
+    """Parse a YYYY-MM-DD catalog date; None when missing or malformed"""
+    if isinstance(value, Date):
+        return value
+    try:
+        return Date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+# Keys of a catalog JSON entry that Video stores in its own fields
+CATALOG_FIELDS = frozenset(('id', 'url', 'username', 'description', 'date', 'likes', 'comments',
+                            'shares', 'verified', 'added_date', 'hashtags'))
+
+
+def extract_hashtags(text: str) -> Tuple[str, ...]:
+    """Lowercased hashtags of a description, in order of first appearance"""
+    return tuple(dict.fromkeys(sys.intern(tag.lower()) for tag in HASHTAG_RE.findall(text)))
+
+
+class Video:
+    """One catalog entry.
+
+    Engagement counts are ints and the post date is a date, so they can be
+    sorted and aggregated directly; usernames are interned because the same
+    few creators repeat across the catalog. Hashtags are extracted from the
+    description once, when the video is added. Keys of the JSON entry that
+    have no field of their own (and a date that is not YYYY-MM-DD, as
+    written) are kept in ``extra`` and saved back unchanged.
+
+    A plain slotted class rather than a dataclass: importing dataclasses
+    costs more than the rest of the CLI's startup imports together.
+    """
+    __slots__ = ('id', 'url', 'username', 'description', 'date', 'likes', 'comments',
+                 'shares', 'verified', 'added_date', 'hashtags', 'extra')
+
+    def __init__(self, id: str, url: str, username: str, description: str, date: Optional[Date],
+                 likes: int, comments: int, shares: int, verified: bool, added_date: str,
+                 hashtags: Tuple[str, ...] = (), extra: Optional[Dict] = None):
+        self.id = id
+        self.url = url
+        self.username = username
+        self.description = description
+        self.date = date
+        self.likes = likes
+        self.comments = comments
+        self.shares = shares
+        self.verified = verified
+        self.added_date = added_date
+        self.hashtags = hashtags
+        self.extra = extra
+
+    def _fields(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"Video({fields})"
+
+    def replace(self, **changes) -> 'Video':
+        """Copy of this video with some fields changed"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Video(**fields)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Video':
+        """Build a Video from a catalog JSON object"""
+        description = data.get('description') or ''
+        hashtags = data.get('hashtags')
+        date = parse_date(data.get('date'))
+        extra = ({} if CATALOG_FIELDS.issuperset(data)
+                 else {key: value for key, value in data.items() if key not in CATALOG_FIELDS})
+        if date is None and data.get('date'):
+            extra['date'] = data['date']
+        return cls(
+            id=str(data['id']),
+            url=data['url'],
+            username=sys.intern(data.get('username') or 'unknown'),
+            description=description,
+            date=date,
+            likes=parse_count(data.get('likes')),
+            comments=parse_count(data.get('comments')),
+            shares=parse_count(data.get('shares')),
+            verified=bool(data.get('verified', False)),
+            added_date=data.get('added_date') or '',
+            # Entries saved before hashtags were stored get them extracted here
+            hashtags=(tuple(map(sys.intern, hashtags)) if isinstance(hashtags, list)
+                      else extract_hashtags(description)),
+            extra=extra or None,
+        )
+
+    def to_dict(self) -> Dict:
+        """Serialize to the catalog JSON schema (counts as display strings)"""
+        data = {
+            "id": self.id,
+            "url": self.url,
+            "username": self.username,
+            "description": self.description,
+            "date": self.date.isoformat() if self.date else '',
+            "likes": format_count(self.likes),
+            "comments": format_count(self.comments),
+            "shares": format_count(self.shares),
+            "verified": self.verified,
+            "added_date": self.added_date,
+            "hashtags": list(self.hashtags)
+        }
+        if self.extra:
+            # A date kept as written only stands in for a missing parsed one
+            data.update((key, value) for key, value in self.extra.items()
+                        if key != 'date' or self.date is None)
+        return data
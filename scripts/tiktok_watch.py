@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+👀 File watching for the TikTok Video Manager
+Waits for catalog files to change: inotify on Linux, stat polling elsewhere
+"""
+
+import os
+import select
+import struct
+import time
+from typing import Iterable, Optional, Set, Tuple
+
+# inotify event bits (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+# Writes in place, atomic replaces (rename into place) and deletions
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWatcher:
+    """Notices changes by comparing the files' stat results every ``interval`` seconds"""
+
+    def __init__(self, paths: Iterable[str], interval: float = 1.0):
+        self.paths = tuple(paths)
+        self.interval = interval
+        self._state = self._stat()
+
+    def _stat(self) -> Tuple:
+        state = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a path changes (True) or ``timeout`` seconds pass (False)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._stat()
+            if state != self._state:
+                self._state = state
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(self.interval, remaining))
+            else:
+                time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify through ctypes, without any extra package.
+
+    The parent directories are watched rather than the files themselves, so
+    a file replaced by an atomic rename keeps being watched.
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+
+        self.names: Set[Tuple[int, str]] = set()
+        watches = {}
+        try:
+            for path in paths:
+                directory = os.path.dirname(os.path.abspath(path))
+                if directory not in watches:
+                    os.makedirs(directory, exist_ok=True)
+                    wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+                    if wd < 0:
+                        error = ctypes.get_errno()
+                        raise OSError(error, f"inotify_add_watch {directory}: {os.strerror(error)}")
+                    watches[directory] = wd
+                self.names.add((watches[directory], os.path.basename(path)))
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until a watched path changes (True) or ``timeout`` seconds pass (False)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._read_events():
+                return True
+
+    def _read_events(self) -> bool:
+        """Drain pending events; True if any concerns a watched file"""
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+                offset += EVENT_HEADER.size + length
+                # An overflowed queue lost events: assume the worst
+                if mask & IN_Q_OVERFLOW or (wd, os.fsdecode(name.rstrip(b'\0'))) in self.names:
+                    changed = True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(paths: Iterable[str], poll: bool = False, interval: float = 1.0):
+    """An InotifyWatcher where the platform has inotify, else a PollingWatcher"""
+    paths = tuple(paths)
+    if not poll:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):  # not Linux, or inotify limits reached
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def wait_for_quiet(watcher, quiet: float, max_wait: float) -> float:
+    """After a change, keep absorbing further changes until none arrives for
+    ``quiet`` seconds (or ``max_wait`` seconds passed); returns the wait"""
+    start = time.monotonic()
+    while time.monotonic() - start < max_wait:
+        if not watcher.wait(min(quiet, max(max_wait - (time.monotonic() - start), 0))):
+            break
+    return time.monotonic() - start